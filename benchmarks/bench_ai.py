@@ -0,0 +1,89 @@
+# Update time against crowd size: level 6 filled with N extra mobs scattered over its open tiles, the player
+# standing still and immortal. Game.update, and the AI scheduler's share of it, are timed per tick with every
+# mob thinking every tick, with the level-of-detail tiers of the scheduler, with the tiers and AI_THINKS as a cap
+# on thinks off screen, and with the cap and the mobs in a MobBatch. The cap stops the thinking from growing with
+# the crowd; the movement of plain mobs still does, the batch's hardly.
+# Usage: python benchmarks/bench_ai.py [ticks]
+import math
+import sys
+import time
+from os import path
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import shooter
+from shooter import *
+from bench_suite import free_tiles
+
+LEVEL = 5
+TICKS = 600
+MOBS = (50, 100, 200, 400, 800)
+# name -> (tiers, thinks off screen per tick, mob batch)
+MODES = {
+    'every tick': (((None, 1),), None, False),
+    'tiers': (AI_TIERS, None, False),
+    'tiers+cap': (AI_TIERS, AI_THINKS, False),
+    'cap+batch': (AI_TIERS, AI_THINKS, True),
+}
+
+
+class CrowdGame(Game):
+    def __init__(self, count, tiers, limit, ticks):
+        super().__init__(headless=True, seed=1, controls=idle_controls)
+        self.count = count
+        self.mode = tiers, limit
+        self.max_ticks = ticks
+        self.times = []
+        self.ai_times = []
+        self.thinks = []
+
+    def run(self):
+        tiles = free_tiles(self)
+        for _ in range(self.count):
+            self.spawn(MOB_SPAWN, *self.rng.choice(tiles))
+        self.grid.sync(self.all_sprites)
+        self.ai.tiers, self.ai.limit = self.mode
+        think = self.ai.update
+
+        def timed_think():
+            start = time.perf_counter()
+            think()
+            self.ai_times.append(time.perf_counter() - start)
+        self.ai.update = timed_think
+
+        self.playing = True
+        while self.playing and self.ticks < self.max_ticks:
+            self.player.health = math.inf
+            self.dt = self.clock.tick(FPS) / 1000
+            self.events()
+            start = time.perf_counter()
+            self.update()
+            self.times.append(time.perf_counter() - start)
+            self.thinks.append(self.ai.thinks)
+            self.ticks += 1
+        self.running = False
+
+
+def main():
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else TICKS
+    print(f"level{LEVEL + 1}, {ticks} ticks, Game.update and its AI part in ms, thinks per tick")
+    print(f"{'mobs':>5s} " + ' '.join(f'{name:>35s}' for name in MODES))
+    print(f"{'':5s} " + ' '.join(f"{'median':>8s} {'p99':>8s} {'AI':>8s} {'thinks':>8s}" for _ in MODES))
+    for count in MOBS:
+        cells = []
+        for tiers, limit, batch in MODES.values():
+            shooter.MOB_BATCH = batch
+            game = CrowdGame(count, tiers, limit, ticks)
+            game.level = LEVEL
+            game.new()
+            times = sorted(game.times)
+            median = times[len(times) // 2] * 1e3
+            p99 = times[min(len(times) - 1, int(len(times) * 0.99))] * 1e3
+            ai = sorted(game.ai_times)[len(game.ai_times) // 2] * 1e3
+            cells.append(f'{median:8.3f} {p99:8.3f} {ai:8.3f} {sum(game.thinks) / len(game.thinks):8.1f}')
+        print(f'{count:5d} ' + ' '.join(cells))
+
+
+if __name__ == '__main__':
+    main()
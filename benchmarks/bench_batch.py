@@ -0,0 +1,67 @@
+# Plain mobs against the mob batch: level 6 filled with N extra mobs scattered over its open tiles, the player
+# standing still and immortal. Each tick's events (bullet hits) and Game.update are timed together, the part of
+# a frame that grows with the crowd; drawing is culled to the view and left out. Plain mobs think on the scheduler's
+# level-of-detail tiers, batched mobs all look out for the player every tick.
+# Usage: python benchmarks/bench_batch.py [ticks]
+import math
+import sys
+import time
+from os import path
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import shooter
+from shooter import *
+from bench_suite import free_tiles
+
+LEVEL = 5
+TICKS = 600
+MOBS = (250, 500, 1000, 2000, 4000)
+
+
+class CrowdGame(Game):
+    def __init__(self, count, ticks):
+        super().__init__(headless=True, seed=1, controls=idle_controls)
+        self.count = count
+        self.max_ticks = ticks
+        self.times = []
+
+    def run(self):
+        tiles = free_tiles(self)
+        kind = Mob if self.batch is None else BatchedMob
+        for _ in range(self.count):
+            kind(self, *self.rng.choice(tiles))
+        self.grid.sync(self.all_sprites, () if self.batch is None else self.batch.filed)
+
+        self.playing = True
+        while self.playing and self.ticks < self.max_ticks:
+            self.player.health = math.inf
+            self.dt = self.clock.tick(FPS) / 1000
+            start = time.perf_counter()
+            self.events()
+            self.update()
+            self.times.append(time.perf_counter() - start)
+            self.ticks += 1
+        self.running = False
+
+
+def main():
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else TICKS
+    print(f"level{LEVEL + 1}, {ticks} ticks, events + update in ms, frame budget {1000 / FPS:.1f} ms")
+    print(f"{'mobs':>5s} {'plain':>17s} {'batch':>17s}")
+    print(f"{'':5s} " + ' '.join(f"{'median':>8s} {'p99':>8s}" for _ in range(2)))
+    for count in MOBS:
+        cells = []
+        for batch in (False, True):
+            shooter.MOB_BATCH = batch
+            game = CrowdGame(count, ticks)
+            game.level = LEVEL
+            game.new()
+            times = sorted(game.times)
+            cells.append(f'{times[len(times) // 2] * 1e3:8.3f} {times[min(len(times) - 1, int(len(times) * 0.99))] * 1e3:8.3f}')
+        print(f'{count:5d} ' + ' '.join(cells))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# Cost of one bullet tick (move, expire, wall test, hits, draw) for K live bullets.
+# Usage: python benchmarks/bench_bullets.py
+import os
+import sys
+import timeit
+from os import path
+from random import Random
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bullets import *
+from simulation import *
+from timers import *
+from tilemap import *
+
+REPEAT = 50
+
+
+class Bench:
+    def __init__(self, level):
+        self.map = Map(path.join(ROOT, 'levels', f'level{level}.png'))
+        self.dt = 1 / FPS
+        self.clock = SimClock()
+        self.timers = TimerWheel(self.clock.get_ticks())
+        self.bullet_imgs = {}
+        for name, color in (('GREEN', GREEN), ('RED', RED), ('PURPLE', PURPLE)):
+            self.bullet_imgs[name] = pg.Surface((6, 6), pg.SRCALPHA)
+            pg.draw.circle(self.bullet_imgs[name], color, (3, 3), 3, 0)
+
+
+def main():
+    pg.init()
+    screen = pg.display.set_mode((WIDTH, HEIGHT))
+    game = Bench(6)
+    rng = Random(1)
+    targets = []
+    for _ in range(50):
+        target = pg.sprite.Sprite()
+        target.hit_rect = pg.Rect(rng.randrange(game.map.width), rng.randrange(game.map.height), 20, 20)
+        targets.append(target)
+
+    print(f"{'bullets':>8} {'tick ms':>8} {'draw ms':>8}")
+    for count in (100, 1000, 5000, 10000):
+        pool = BulletPool(game)
+
+        def refill():
+            while len(pool) < count:
+                direction = vec(1, 0).rotate(rng.uniform(0, 360))
+                pool.spawn((rng.uniform(0, game.map.width), rng.uniform(0, game.map.height)),
+                           direction * 0.001, rng.choice(pool.colors))
+
+        def tick():
+            refill()
+            pool.collide(targets)
+            pool.update()
+
+        refill()
+        t_tick = timeit.timeit(tick, number=REPEAT) / REPEAT
+        refill()
+        t_draw = timeit.timeit(lambda: pool.draw(screen, (0, 0)), number=REPEAT) / REPEAT
+        print(f"{count:>8} {t_tick * 1000:>8.3f} {t_draw * 1000:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# Full redraw + flip vs. DirtyRenderer with a still camera: frame time and pixels pushed to the display.
+# The dummy video driver makes presents nearly free, so the pixel count is the figure that carries over
+# to software and remote displays.
+# Usage: python benchmarks/bench_dirty.py
+import os
+import sys
+import time
+from os import path
+from random import Random
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bullets import *
+from simulation import *
+from timers import *
+from render import *
+
+LEVEL = 6
+FRAMES = 600
+SPRITES = 12
+BULLETS = 40
+
+
+class Bench:
+    def __init__(self, screen):
+        self.screen = screen
+        self.map = Map(path.join(ROOT, 'levels', f'level{LEVEL}.png'))
+        self.layer = MapLayer(self.map)
+        self.camera = Camera(self.map.width, self.map.height)
+        self.dt = 1 / FPS
+        self.clock = SimClock()
+        self.timers = TimerWheel(self.clock.get_ticks())
+        self.bullet_imgs = {}
+        for name, color in (('GREEN', GREEN), ('RED', RED), ('PURPLE', PURPLE)):
+            self.bullet_imgs[name] = pg.Surface((6, 6), pg.SRCALPHA)
+            pg.draw.circle(self.bullet_imgs[name], color, (3, 3), 3, 0)
+        self.bullets = BulletPool(self)
+        self.all_sprites = pg.sprite.LayeredUpdates()
+        self.player = pg.sprite.Sprite(self.all_sprites)
+        self.player.health = 100
+        self.hud_rect = pg.Rect(10, 10, 100, 20)
+
+        image = pg.transform.scale(pg.image.load(path.join(ROOT, 'img', 'mob.png')).convert_alpha(), (30, 15))
+        self.player.image = image
+        self.player.rect = image.get_rect(center=(self.map.width // 2, self.map.height // 2))
+        self.camera.update(self.player)
+        rng = Random(1)
+        view = self.camera.view()
+        for _ in range(SPRITES):
+            sprite = pg.sprite.Sprite(self.all_sprites)
+            sprite.image = image
+            sprite.rect = image.get_rect(center=(rng.randrange(view.left, view.right),
+                                                 rng.randrange(view.top, view.bottom)))
+
+    def visible_sprites(self):
+        return self.all_sprites.sprites()
+
+    def draw_sprites(self, sprites):
+        x, y = self.camera.camera.topleft
+        self.screen.blits([(sprite.image, (sprite.rect.x + x, sprite.rect.y + y)) for sprite in sprites], False)
+        self.bullets.draw(self.screen, (x, y))
+
+    def draw_hud(self):
+        pg.draw.rect(self.screen, GREEN, self.hud_rect)
+
+    def draw(self):
+        self.layer.draw(self.screen, self.camera)
+        self.draw_sprites(self.visible_sprites())
+        self.draw_hud()
+
+
+def simulate(game, frame, rng):
+    for sprite in game.all_sprites.sprites()[1:]:
+        sprite.rect.move_ip(rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1)))
+    while len(game.bullets) < BULLETS:
+        game.bullets.spawn(game.player.rect.center, vec(1, 0).rotate(rng.uniform(0, 360)), 'GREEN')
+    game.bullets.update()
+    if frame % 60 == 0:
+        game.player.health -= 1
+
+
+def main():
+    pg.init()
+    screen = pg.display.set_mode((WIDTH, HEIGHT))
+    results = []
+    for mode in ('full', 'dirty'):
+        game = Bench(screen)
+        renderer = DirtyRenderer(game)
+        pushed = 0
+        original = pg.display.update
+
+        def counted(rects):
+            nonlocal pushed
+            pushed += sum(rect.width * rect.height for rect in rects)
+            return original(rects)
+
+        pg.display.update = counted
+        rng = Random(2)
+        times = []
+        for frame in range(FRAMES):
+            simulate(game, frame, rng)
+            start = time.perf_counter()
+            if mode == 'full' or not renderer.update():
+                game.draw()
+                renderer.present()
+                pushed += WIDTH * HEIGHT
+            times.append(time.perf_counter() - start)
+        pg.display.update = original
+        times.sort()
+        results.append((mode, times[len(times) // 2], pushed / FRAMES))
+
+    print(f"level{LEVEL}, still camera, {SPRITES} moving sprites, {BULLETS} bullets")
+    for mode, median, pixels in results:
+        print(f"  {mode:6s} median {median * 1e3:6.3f} ms, {pixels:9.0f} px presented per frame")
+
+
+if __name__ == '__main__':
+    main()
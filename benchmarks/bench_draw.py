@@ -0,0 +1,91 @@
+# Sprite pass of Game.draw as the population grows, on level 6 and on empty maps that grow with it at the
+# same density: a blit per sprite in the group vs. the sprites culled to the view through the spatial hash
+# and submitted with one blits call per layer.
+# Usage: python benchmarks/bench_draw.py
+import os
+import sys
+import time
+from itertools import groupby
+from operator import attrgetter
+from os import path
+from random import Random
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from spatial import *
+from render import *
+
+LEVEL = 6
+FRAMES = 300
+POPULATIONS = (100, 1000, 10000)
+DENSITY = 100 / (64 * 48 * TILESIZE * TILESIZE)  # 100 sprites on a level 6 sized map
+
+
+class Bench:
+    def __init__(self, screen, population, game_map):
+        self.screen = screen
+        self.map = game_map
+        self.camera = Camera(self.map.width, self.map.height)
+        self.all_sprites = pg.sprite.LayeredUpdates()
+        self.grid = SpatialHash()
+        unit = pg.transform.scale(pg.image.load(path.join(ROOT, 'img', 'mob.png')).convert_alpha(), (30, 15))
+        mine = pg.Surface((10, 10), pg.SRCALPHA)
+        pg.draw.circle(mine, RED, (5, 5), 5)
+        rng = Random(1)
+        for index in range(population):
+            sprite = pg.sprite.Sprite()
+            sprite._layer = MINE_LAYER if index % 10 == 0 else UNIT_LAYER
+            sprite.image = mine if sprite._layer == MINE_LAYER else unit
+            sprite.rect = sprite.image.get_rect(center=(rng.randrange(self.map.width),
+                                                        rng.randrange(self.map.height)))
+            self.all_sprites.add(sprite)
+        self.grid.sync(self.all_sprites)
+
+    def draw_all(self):
+        for sprite in self.all_sprites:
+            self.screen.blit(sprite.image, self.camera.apply(sprite))
+
+    def draw_culled(self):
+        view = self.camera.view()
+        view = pg.Rect(view.x - DRAW_MARGIN, view.y - DRAW_MARGIN, view.width + DRAW_MARGIN, view.height + DRAW_MARGIN)
+        sprites = self.grid.query_rect(view, self.all_sprites)
+        order = self.grid.order
+        sprites.sort(key=lambda sprite: (sprite.layer, order[sprite]))
+        x, y = self.camera.camera.topleft
+        for layer, group in groupby(sprites, attrgetter('layer')):
+            self.screen.blits([(sprite.image, (sprite.rect.x + x, sprite.rect.y + y)) for sprite in group], False)
+
+
+def sweep(game, draw):
+    # camera panning across the map
+    target = pg.sprite.Sprite()
+    target.rect = pg.Rect(0, 0, 1, 1)
+    times = []
+    for frame in range(FRAMES):
+        target.rect.center = (game.map.width * frame // FRAMES, game.map.height // 2)
+        game.camera.update(target)
+        start = time.perf_counter()
+        draw()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def main():
+    screen = pg.display.set_mode((WIDTH, HEIGHT))
+    level = Map(path.join(ROOT, 'levels', f'level{LEVEL}.png'))
+    print(f"{FRAMES} frames panning across the map, median sprite pass")
+    for population in POPULATIONS:
+        side = int((population / DENSITY) ** 0.5)
+        for name, game_map in ((f'level{LEVEL}', level), (f'{side}x{side} px', pg.Rect(0, 0, side, side))):
+            game = Bench(screen, population, game_map)
+            full = sweep(game, game.draw_all)
+            culled = sweep(game, game.draw_culled)
+            print(f"  {population:6d} sprites on {name:15s} blit each {full * 1e3:7.3f} ms, "
+                  f"culled + blits {culled * 1e3:7.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# Per-frame navigation cost for N bosses chasing a moving player on the largest level:
+# one A* search per boss every 3 * FPS frames vs. one shared flow field.
+# Usage: python benchmarks/bench_flowfield.py
+import sys
+import time
+from os import path
+from random import Random
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pathfinding import *
+
+LEVEL = 6
+FRAMES = 6 * FPS
+
+
+def player_walk(graph, obstacles, rng):
+    # the player crosses a tile every 4 frames
+    free = sorted(node for node in graph.tiles() if node not in obstacles)
+    tile = rng.choice(free)
+    walk = []
+    for frame in range(FRAMES):
+        if frame % 4 == 0 and graph[tile]:
+            tile = rng.choice(graph[tile])
+        walk.append(tile)
+    return free, walk
+
+
+def run(mode, count, graph, obstacles, free, walk, rng):
+    bosses = [rng.choice(free) for _ in range(count)]
+    finder = Pathfinder(graph, obstacles, manhattan_distance, PathCache())
+    field = FlowField(graph)
+    frames = []
+    for frame, target in enumerate(walk):
+        start = time.perf_counter()
+        if mode == 'astar':
+            # bosses spawn on the same frame, so their re-plans line up too
+            if frame % (3 * FPS) == 0:
+                for boss in bosses:
+                    finder.search(boss, target)
+        else:
+            field.update(target, frame * 1000 / FPS)
+            for boss in bosses:
+                field.step(boss)
+        frames.append(time.perf_counter() - start)
+    return sum(frames) / len(frames), max(frames)
+
+
+def main():
+    game_map = Map(path.join(ROOT, 'levels', f'level{LEVEL}.png'))
+    graph = NavGrid.from_map(game_map)
+    obstacles = graph.obstacles
+    free, walk = player_walk(graph, obstacles, Random(1))
+    print(f"level{LEVEL}, {FRAMES} frames, player changes tile every 4 frames")
+    print(f"{'bosses':>6} {'A* mean ms':>11} {'A* worst ms':>12} {'flow mean ms':>13} {'flow worst ms':>14}")
+    for count in (1, 10, 50, 200):
+        astar = run('astar', count, graph, obstacles, free, walk, Random(count))
+        flow = run('flow', count, graph, obstacles, free, walk, Random(count))
+        print(f"{count:>6} {astar[0] * 1000:>11.3f} {astar[1] * 1000:>12.2f} "
+              f"{flow[0] * 1000:>13.3f} {flow[1] * 1000:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
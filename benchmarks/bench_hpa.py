@@ -0,0 +1,84 @@
+# Hierarchical A* vs. plain A* on synthetic random-wall maps much larger than the shipped levels.
+# Usage: python benchmarks/bench_hpa.py
+import sys
+import time
+from os import path
+from random import Random
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from hpa import *
+
+SIZES = (512, 2048)
+DENSITY = 0.25
+QUERIES = 20
+WALL_CHANGES = 100
+
+
+def random_nav(size, rng):
+    solid = bytearray(1 if rng.random() < DENSITY else 0 for _ in range(size * size))
+    return NavGrid(size, size, solid)
+
+
+def open_tile(nav, rng):
+    while True:
+        x, y = rng.randrange(nav.width), rng.randrange(nav.height)
+        if (x, y) not in nav.obstacles:
+            return x, y
+
+
+def full_path(path):
+    while path.refine():
+        pass
+    return path
+
+
+def main():
+    for size in SIZES:
+        rng = Random(size)
+        nav = random_nav(size, rng)
+
+        start = time.perf_counter()
+        finder = HierarchicalPathfinder(nav)
+        entrances = time.perf_counter() - start
+        print(f"{size}x{size}, {DENSITY:.0%} walls, clusters of {HPA_CLUSTER_SIZE}")
+        print(f"  entrances                    {entrances * 1e3:9.1f} ms")
+        if size <= 512:
+            start = time.perf_counter()
+            finder.precompute()
+            print(f"  eager intra-cluster costs    {(time.perf_counter() - start) * 1e3:9.1f} ms")
+
+        astar = Pathfinder(nav, nav.obstacles, manhattan_distance)
+        pairs = [(open_tile(nav, rng), open_tile(nav, rng)) for _ in range(QUERIES)]
+        hpa_time = astar_time = 0
+        ratios = []
+        for a, b in pairs:
+            begin = time.perf_counter()
+            path = full_path(finder.search(a, b))
+            hpa_time += time.perf_counter() - begin
+            begin = time.perf_counter()
+            exact = astar.search(a, b, size * size)
+            astar_time += time.perf_counter() - begin
+            if path and len(exact) > 1:
+                ratios.append((len(path) - 1) / (len(exact) - 1))
+        start = time.perf_counter()
+        for a, b in pairs:
+            full_path(finder.search(a, b))
+        warm = time.perf_counter() - start
+        print(f"  hierarchical query, refined  {hpa_time / QUERIES * 1e3:9.1f} ms")
+        print(f"  same queries, clusters warm  {warm / QUERIES * 1e3:9.1f} ms")
+        print(f"  A* query                     {astar_time / QUERIES * 1e3:9.1f} ms")
+        if ratios:
+            print(f"  path length vs. A*           {sum(ratios) / len(ratios):9.3f} avg, {max(ratios):.3f} worst")
+
+        walls = [open_tile(nav, rng) for _ in range(WALL_CHANGES)]
+        start = time.perf_counter()
+        for tile in walls:
+            nav.add_obstacle(tile)
+            finder.search(*pairs[0])
+        print(f"  wall added + next search     {(time.perf_counter() - start) / WALL_CHANGES * 1e3:9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# Level loading from compiled packs vs. scanning the PNGs with getpixel, per level and at startup.
+# Usage: python benchmarks/bench_levels.py
+import subprocess
+import sys
+import time
+import timeit
+from os import path
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pathfinding import *
+
+LEVELS = 7
+STARTUP_RUNS = 5
+
+
+def level_file(level):
+    return path.join(ROOT, 'levels', f'level{level}.png')
+
+
+def legacy_load(filename):
+    # Map.__init__, the spawn scan in Game.new and the nav build as they were before level packs
+    from PIL import Image
+    data = Image.open(filename)
+    walls = bytearray(data.width * data.height)
+    for row in range(data.height):
+        for col in range(data.width):
+            if data.getpixel((col, row)) == BLACK:
+                walls[row * data.width + col] = 1
+    spawns = []
+    for row in range(data.height):
+        for col in range(data.width):
+            pixel = data.getpixel((col, row))
+            if pixel in (GREY, RED, PURPLE):
+                spawns.append((pixel, col, row))
+    return NavGrid(data.width, data.height, walls), spawns
+
+
+def packed_load(filename):
+    game_map = Map(filename)
+    return NavGrid.from_map(game_map), game_map.spawns
+
+
+def startup(mode):
+    # what the game did before its first frame: every level up front, or only the first one
+    if mode == 'legacy':
+        from PIL import Image
+        for level in range(1, LEVELS + 1):
+            legacy_load(level_file(level))
+    else:
+        packed_load(level_file(1))
+
+
+def cold_start(mode):
+    times = []
+    for _ in range(STARTUP_RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, __file__, '--startup', mode], check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    print("level   size     getpixel    compile    from pack")
+    for level in range(1, LEVELS + 1):
+        filename = level_file(level)
+        load_level(filename)
+        legacy = timeit.timeit(lambda: legacy_load(filename), number=10) / 10
+        compiled = timeit.timeit(lambda: compile_level(filename), number=10) / 10
+        packed = timeit.timeit(lambda: packed_load(filename), number=100) / 100
+        game_map = Map(filename)
+        print(f"{level:5d} {game_map.tilewidth:3d}x{game_map.tileheight:<3d} {legacy * 1e3:9.2f} ms "
+              f"{compiled * 1e3:7.2f} ms {packed * 1e3:9.3f} ms")
+
+    print(f"cold start, all levels via getpixel  {cold_start('legacy') * 1e3:8.1f} ms")
+    print(f"cold start, first level from pack    {cold_start('packs') * 1e3:8.1f} ms")
+
+
+if __name__ == '__main__':
+    if '--startup' in sys.argv:
+        startup(sys.argv[-1])
+    else:
+        main()
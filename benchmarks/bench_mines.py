@@ -0,0 +1,92 @@
+# A chain reaction of N armed mines packed around the player on level 6, with live bullets and mobs about:
+# the recursive Mine.boom it replaced vs. the breadth-first blast waves. Both run on identically seeded games,
+# the outcome (health left, walls, bullets, mines gone off) has to match.
+# Usage: python benchmarks/bench_mines.py
+import sys
+import time
+from os import path
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from shooter import *
+from bench_suite import free_tiles
+
+LEVEL = 5
+MINES = (50, 200, 500)
+BULLETS = 2000
+
+
+def legacy_boom(self):
+    # Mine.boom before the blast waves: one recursive call per mine
+    self.sprite.mines += 1
+    self.detonated = True
+    self.game.all_sprites.change_layer(self, EFFECT_LAYER)
+    self.game.destroy_walls(self.game.map.walls_near(self.pos, BLAST_RADIUS / 2))
+    self.game.bullets.clear_radius(self.pos, BLAST_RADIUS)
+
+    for hit in self.game.grid.query_radius(self.pos, BLAST_RADIUS, self.game.all_sprites):
+        if hit == self:
+            continue
+
+        distance = (self.pos - hit.pos).length()
+
+        if distance <= BLAST_RADIUS:
+            if isinstance(hit, Mine):
+                if not hit.detonated:
+                    legacy_boom(hit)
+            else:
+                damage = self.game.player_health_bar * (1 - (distance / BLAST_RADIUS) ** 2)
+                hit.health -= damage
+
+    self.disarm()
+    explosion(self)
+    explode(self)
+
+
+class MineGame(Game):
+    def __init__(self, count, boom):
+        super().__init__(headless=True, seed=1)
+        self.count = count
+        self.boom = boom
+
+    def run(self):
+        tiles = sorted(free_tiles(self), key=lambda tile: (vec(tile) * TILESIZE - self.player.pos).length_squared())
+        mines = []
+        for col, row in tiles[1:self.count + 1]:
+            mine = Mine(self, self.player, (col + 0.5) * TILESIZE, (row + 0.5) * TILESIZE)
+            mine.armed = True
+            mines.append(mine)
+        for _ in range(BULLETS):
+            col, row = self.rng.choice(tiles)
+            self.bullets.spawn(vec(col + 0.5, row + 0.5) * TILESIZE, vec(1, 0).rotate(self.rng.uniform(0, 360)), 'RED')
+        self.grid.sync(self.all_sprites)
+
+        start = time.perf_counter()
+        self.boom(mines[-1])
+        self.elapsed = time.perf_counter() - start
+        self.outcome = (sum(mine.detonated for mine in mines), len(self.bullets), sum(self.map.walls),
+                        [round(sprite.health, 6) for sprite in self.all_sprites if not isinstance(sprite, Mine)])
+        self.running = False
+
+
+def main():
+    print(f"level{LEVEL + 1}, {BULLETS} bullets, frame budget {1000 / FPS:.1f} ms")
+    # one untimed chain first, numpy sets itself up on first use
+    warmup = MineGame(MINES[0], Mine.boom)
+    warmup.level = LEVEL
+    warmup.new()
+    for count in MINES:
+        results = []
+        for boom in (legacy_boom, Mine.boom):
+            game = MineGame(count, boom)
+            game.level = LEVEL
+            game.new()
+            results.append(game)
+        legacy, waves = results
+        print(f"  {count:4d} mines: recursive {legacy.elapsed * 1e3:7.2f} ms, waves {waves.elapsed * 1e3:7.2f} ms, "
+              f"{waves.outcome[0]} went off, same outcome: {legacy.outcome == waves.outcome}")
+
+
+if __name__ == '__main__':
+    main()
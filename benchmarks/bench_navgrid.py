@@ -0,0 +1,71 @@
+# Cost of opening one wall in the nav grid (with a path cache and a flow field listening)
+# vs. rebuilding the whole graph the way create_graph did, on the largest level.
+# Usage: python benchmarks/bench_navgrid.py
+import sys
+import time
+import timeit
+from os import path
+from random import Random
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pathfinding import *
+from PIL import Image
+
+LEVEL = 6
+
+
+def legacy_create_graph(map_data):
+    # the getpixel-per-tile graph build Game.new used to run
+    graph = {}
+    obstacles = []
+    for y in range(map_data.height):
+        for x in range(map_data.width):
+            graph[(x, y)] = []
+    for y in range(map_data.height):
+        for x in range(map_data.width):
+            if map_data.getpixel((x, y)) == (0, 0, 0):
+                obstacles.append((x, y))
+            for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+                if 0 <= x + dx < map_data.width and 0 <= y + dy < map_data.height:
+                    neighbor = (x + dx, y + dy)
+                    if map_data.getpixel(neighbor) != (0, 0, 0):
+                        graph[(x, y)].append(neighbor)
+    return graph, obstacles
+
+
+def main():
+    game_map = Map(path.join(ROOT, 'levels', f'level{LEVEL}.png'))
+    rng = Random(1)
+    nav = NavGrid.from_map(game_map)
+    cache = PathCache()
+    field = FlowField(nav)
+    nav.listeners += [cache, field]
+    free = [tile for tile in nav.tiles() if tile not in nav.obstacles]
+    finder = Pathfinder(nav, nav.obstacles, manhattan_distance, cache)
+    field.build(rng.choice(free))
+    for _ in range(PATH_CACHE_SIZE):
+        finder.search(rng.choice(free), rng.choice(free))
+
+    walls = sorted(nav.obstacles)
+    rng.shuffle(walls)
+    times = []
+    for tile in walls[:200]:
+        start = time.perf_counter()
+        nav.remove_obstacle(tile)
+        times.append(time.perf_counter() - start)
+    times.sort()
+
+    image = Image.open(path.join(ROOT, 'levels', f'level{LEVEL}.png'))
+    legacy = timeit.timeit(lambda: legacy_create_graph(image), number=3) / 3
+    build = timeit.timeit(lambda: NavGrid.from_map(game_map), number=20) / 20
+    print(f"level{LEVEL}: {game_map.tilewidth}x{game_map.tileheight} tiles")
+    print(f"remove_obstacle + listeners  median {times[len(times) // 2] * 1e6:8.1f} us, "
+          f"worst {times[-1] * 1e6:8.1f} us")
+    print(f"NavGrid.from_map             {build * 1e3:8.2f} ms")
+    print(f"legacy create_graph          {legacy * 1e3:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# A* vs. the previous Pathfinder.search on the largest shipped level.
+# Usage: python benchmarks/bench_pathfinding.py
+import heapq
+import sys
+import timeit
+from os import path
+from random import Random
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pathfinding import *
+
+LEVEL = 6
+QUERIES = 50
+
+
+def legacy_search(graph, obstacles, heuristic, start, end, max_size=100):
+    # Pathfinder.search as it was before the A* rewrite
+    queue = [(0, start, [start])]
+    visited = set()
+    while queue:
+        cost, node, path = heapq.heappop(queue)
+        visited.add(node)
+        if node == end or len(path) >= max_size:
+            return path
+        for neighbor in graph[node]:
+            if neighbor not in visited and neighbor not in obstacles:
+                heuristic_value = heuristic(neighbor, end)
+                heapq.heappush(queue, (heuristic_value + 0.5 * len(path), neighbor, path + [neighbor]))
+    return []
+
+
+def main():
+    game_map = Map(path.join(ROOT, 'levels', f'level{LEVEL}.png'))
+    graph = NavGrid.from_map(game_map)
+    obstacles = graph.obstacles
+    legacy_obstacles = list(obstacles)
+    # the legacy search never terminates in reasonable time on unreachable goals, so both
+    # ends are drawn from the largest connected area
+    free = sorted(node for node in graph.tiles() if node not in obstacles)
+    areas = []
+    seen = set()
+    for node in free:
+        if node in seen:
+            continue
+        area, frontier = [node], [node]
+        seen.add(node)
+        while frontier:
+            for neighbor in graph[frontier.pop()]:
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    area.append(neighbor)
+                    frontier.append(neighbor)
+        areas.append(area)
+    free = sorted(max(areas, key=len))
+    rng = Random(1)
+    queries = [(rng.choice(free), rng.choice(free)) for _ in range(QUERIES)]
+
+    finder = Pathfinder(graph, obstacles, manhattan_distance)
+    shared = Pathfinder(graph, obstacles, manhattan_distance, PathCache())
+
+    t_legacy = timeit.timeit(lambda: [legacy_search(graph, legacy_obstacles, manhattan_distance, a, b)
+                                      for a, b in queries], number=1)
+    t_astar = timeit.timeit(lambda: [finder.search(a, b) for a, b in queries], number=1)
+    [shared.search(a, b) for a, b in queries]
+    t_cached = timeit.timeit(lambda: [shared.search(a, b) for a, b in queries], number=1)
+
+    legacy = [legacy_search(graph, legacy_obstacles, manhattan_distance, a, b) for a, b in queries]
+    astar = [finder.search(a, b) for a, b in queries]
+    found = [(old, new) for old, new in zip(legacy, astar) if old and old[-1] == new[-1:][0]]
+    shorter = sum(len(new) < len(old) for old, new in found)
+    longer = sum(len(new) > len(old) for old, new in found)
+
+    print(f"level{LEVEL}: {game_map.tilewidth}x{game_map.tileheight} tiles, {QUERIES} random queries")
+    print(f"legacy search   {t_legacy / QUERIES * 1000:8.3f} ms/query")
+    print(f"A*              {t_astar / QUERIES * 1000:8.3f} ms/query")
+    print(f"A* cached       {t_cached / QUERIES * 1000:8.3f} ms/query")
+    print(f"path length vs legacy on {len(found)} common goals: {shorter} shorter, {longer} longer, "
+          f"mean {sum(len(o) for o, _ in found) / len(found):.1f} -> {sum(len(n) for _, n in found) / len(found):.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# Boss path searches in the main loop vs. on the worker pool: level 6 with N extra bosses chasing an immortal
+# player that shoots the nearest mob. Game.update is timed per tick; Boss.find_path (the search itself when
+# synchronous, handing the request over when pooled) in CPU time of the game's thread, worst call and total, so
+# workers sharing a core with the game do not count against it. Paths is how many got applied.
+# Usage: python benchmarks/bench_paths.py [ticks]
+import math
+import sys
+import time
+from os import path
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from shooter import *
+from bench_suite import free_tiles, aim_at_nearest
+
+LEVEL = 5
+TICKS = 900
+BOSSES = (5, 20, 50)
+
+
+class ChaseGame(Game):
+    def __init__(self, count, pool, ticks):
+        super().__init__(headless=True, seed=1, controls=aim_at_nearest)
+        self.count = count
+        self.pool = pool
+        self.max_ticks = ticks
+        self.times = []
+        self.find_times = []
+        self.searches = 0
+
+    def run(self):
+        tiles = free_tiles(self)
+        for _ in range(self.count):
+            Boss(self, *self.rng.choice(tiles))
+        self.grid.sync(self.all_sprites)
+        if self.pool is not None:
+            self.pool.attach(self.nav, self.danger, self.path_cache)
+            self.paths = self.pool
+        find = Boss.find_path
+
+        def timed_find(boss):
+            start = time.thread_time()
+            find(boss)
+            self.find_times.append(time.thread_time() - start)
+        Boss.find_path = timed_find
+
+        self.playing = True
+        try:
+            while self.playing and self.ticks < self.max_ticks:
+                self.player.health = math.inf
+                self.dt = self.clock.tick(FPS) / 1000
+                self.events()
+                start = time.perf_counter()
+                self.update()
+                self.times.append(time.perf_counter() - start)
+                self.ticks += 1
+        finally:
+            Boss.find_path = find
+        self.searches = self.pool.served if self.pool is not None else len(self.find_times)
+        self.running = False
+
+
+def main():
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else TICKS
+    pool = PathPool()
+    # start the workers and let them import the game before timing
+    probe = ChaseGame(1, pool, 60)
+    probe.level = LEVEL
+    probe.new()
+    print(f"level{LEVEL + 1}, {ticks} ticks, {PATH_WORKERS} workers, Game.update and find_path in ms, paths applied")
+    print(f"{'bosses':>6s} {'':8s} {'median':>8s} {'p99':>8s} {'max':>8s} {'find':>8s} {'total':>8s} {'paths':>7s}")
+    try:
+        for count in BOSSES:
+            for name, workers in (('main', None), ('pool', pool)):
+                game = ChaseGame(count, workers, ticks)
+                game.level = LEVEL
+                game.new()
+                times = sorted(game.times)
+                finds = sorted(game.find_times) or [0]
+                print(f"{count:6d} {name:8s} {times[len(times) // 2] * 1e3:8.3f} "
+                      f"{times[min(len(times) - 1, int(len(times) * 0.99))] * 1e3:8.3f} {times[-1] * 1e3:8.3f} "
+                      f"{finds[-1] * 1e3:8.3f} {sum(finds) * 1e3:8.1f} {game.searches:7d}")
+    finally:
+        pool.close()
+
+
+if __name__ == '__main__':
+    main()
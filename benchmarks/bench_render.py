@@ -0,0 +1,72 @@
+# Frame time of the wall pass: pre-rendered MapLayer vs. filling every visible wall tile, on the largest level.
+# Usage: python benchmarks/bench_render.py
+import math
+import os
+import sys
+import time
+from os import path
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from render import *
+
+LEVEL = 6
+FRAMES = 2000
+BLAST_EVERY = 100
+
+
+def legacy_draw(screen, game_map, camera):
+    # Game.draw's wall pass before the map layer
+    screen.fill(BGCOLOR)
+    for rect in game_map.wall_rects(camera.view()):
+        screen.fill(BLACK, camera.apply_rect(rect))
+
+
+def layer_draw(screen, layer, camera):
+    layer.draw(screen, camera)
+
+
+def sweep(draw, game_map, camera, screen, on_blast):
+    # camera circling the map, with a few walls blown away now and then
+    target = pg.sprite.Sprite()
+    target.rect = pg.Rect(0, 0, 1, 1)
+    times = []
+    for frame in range(FRAMES):
+        target.rect.center = (game_map.width / 2 + game_map.width / 3 * math.cos(frame / 100),
+                              game_map.height / 2 + game_map.height / 3 * math.sin(frame / 100))
+        camera.update(target)
+        if frame % BLAST_EVERY == 0:
+            tiles = [tile for tile in game_map.walls_near(target.rect.center, BLAST_RADIUS / 2)
+                     if game_map.remove_wall(*tile)]
+            on_blast(tiles)
+        start = time.perf_counter()
+        draw(screen, camera)
+        times.append(time.perf_counter() - start)
+    return sorted(times)
+
+
+def main():
+    screen = pg.display.set_mode((WIDTH, HEIGHT))
+    filename = path.join(ROOT, 'levels', f'level{LEVEL}.png')
+
+    game_map = Map(filename)
+    camera = Camera(game_map.width, game_map.height)
+    legacy = sweep(lambda screen, camera: legacy_draw(screen, game_map, camera), game_map, camera, screen,
+                   lambda tiles: None)
+
+    game_map = Map(filename)
+    camera = Camera(game_map.width, game_map.height)
+    layer = MapLayer(game_map)
+    layered = sweep(lambda screen, camera: layer_draw(screen, layer, camera), game_map, camera, screen,
+                    layer.walls_removed)
+
+    print(f"level{LEVEL}: {game_map.tilewidth}x{game_map.tileheight} tiles, {FRAMES} frames")
+    for name, times in (('fill per wall tile', legacy), ('pre-rendered layer', layered)):
+        print(f"  {name:20s} median {times[len(times) // 2] * 1e3:6.3f} ms, "
+              f"p99 {times[int(len(times) * 0.99)] * 1e3:6.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# Rotating sprite images every frame vs. the RotationCache, with free-aim angles drifting every frame.
+# Usage: python benchmarks/bench_rotation.py
+import os
+import sys
+import time
+from os import path
+from random import Random
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from render import *
+
+SPRITES = 200
+FRAMES = 600
+
+
+def run(rotate, images):
+    # returns the time per frame and the surfaces allocated by rotation in the second half of the run
+    rng = Random(1)
+    angles = [rng.uniform(0, 360) for _ in range(SPRITES)]
+    allocated = 0
+    original = pg.transform.rotate
+
+    def counted(image, angle):
+        nonlocal allocated
+        allocated += 1
+        return original(image, angle)
+
+    start = time.perf_counter()
+    for frame in range(FRAMES):
+        if frame == FRAMES // 2:
+            pg.transform.rotate = counted
+        for sprite in range(SPRITES):
+            angles[sprite] += rng.uniform(-3, 3)
+            rotate(images[sprite % len(images)], angles[sprite])
+    pg.transform.rotate = original
+    return (time.perf_counter() - start) / FRAMES, allocated
+
+
+def main():
+    pg.display.set_mode((WIDTH, HEIGHT))
+    images = []
+    for name in ('player.png', 'mob.png', 'boss.png'):
+        image = pg.image.load(path.join(ROOT, 'img', name)).convert_alpha()
+        images.append(pg.transform.scale(image, (30, 15)))
+
+    cache = RotationCache()
+    for image in images:
+        cache.add(image)
+
+    print(f"{SPRITES} sprites, {FRAMES} frames, rotations every {ROTATION_STEP} degrees")
+    for name, rotate in (('pg.transform.rotate', lambda image, angle: pg.transform.rotate(image, angle)),
+                         ('RotationCache.get', cache.get)):
+        frame, allocated = run(rotate, images)
+        print(f"  {name:20s} {frame * 1e3:7.3f} ms per frame, "
+              f"{allocated / (FRAMES - FRAMES // 2):7.1f} surfaces per frame once warm")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# Broad-phase scaling: pg.sprite.groupcollide vs SpatialHash for mob/bullet hits.
+# Usage: python benchmarks/bench_spatial.py
+import sys
+import timeit
+from os import path
+from random import Random
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from spatial import *
+
+WORLD = 64 * TILESIZE
+REPEAT = 20
+
+
+class Dummy(pg.sprite.Sprite):
+    def __init__(self, groups, x, y, size):
+        pg.sprite.Sprite.__init__(self, groups)
+        self.pos = vec(x, y)
+        self.rect = pg.Rect(0, 0, size, size)
+        self.rect.center = self.pos
+        self.hit_rect = self.rect.copy()
+
+
+def collide_hit_rect(one, two):
+    return one.hit_rect.colliderect(two.rect)
+
+
+def scenario(count, seed=1):
+    rng = Random(seed)
+    everything = pg.sprite.Group()
+    mobs = pg.sprite.Group()
+    bullets = pg.sprite.Group()
+    for _ in range(count // 10):
+        Dummy((everything, mobs), rng.uniform(0, WORLD), rng.uniform(0, WORLD), 20)
+    for _ in range(count - count // 10):
+        Dummy((everything, bullets), rng.uniform(0, WORLD), rng.uniform(0, WORLD), 6)
+    return everything, mobs, bullets
+
+
+def brute(everything, mobs, bullets):
+    pg.sprite.groupcollide(mobs, bullets, False, False, collide_hit_rect)
+    for mine in list(mobs)[:10]:
+        pg.sprite.spritecollide(mine, everything, False)
+
+
+def hashed(grid, everything, mobs, bullets):
+    grid.sync(everything)
+    for mob in mobs:
+        grid.spritecollide(mob, bullets, False, collide_hit_rect, mob.hit_rect)
+    for mine in list(mobs)[:10]:
+        grid.spritecollide(mine, everything, False)
+
+
+def main():
+    print(f"{'entities':>8} {'groupcollide ms':>16} {'spatial hash ms':>16} {'speedup':>8}")
+    for count in (100, 200, 400, 800, 1600, 3200):
+        everything, mobs, bullets = scenario(count)
+        grid = SpatialHash()
+        grid.sync(everything)
+        t_brute = timeit.timeit(lambda: brute(everything, mobs, bullets), number=REPEAT) / REPEAT
+        t_hash = timeit.timeit(lambda: hashed(grid, everything, mobs, bullets), number=REPEAT) / REPEAT
+        print(f"{count:>8} {t_brute * 1000:>16.3f} {t_hash * 1000:>16.3f} {t_brute / t_hash:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+# Scenario suite for the game loop: every shipped level plus stress scenarios, run headless for a fixed number
+# of ticks with a scripted, immortal player. Reports median and p99 milliseconds for the events pass (bullet hits
+# and level checks), all_sprites.update with the AI scheduler's thinking, Pathfinder.search (per call), building
+# the NavGrid and draw.
+# Results are saved as JSON; compare flags phases whose median got slower than the threshold.
+# Usage: python benchmarks/bench_suite.py run [out.json] [ticks] [scenario ...]
+#        python benchmarks/bench_suite.py compare <base.json> <new.json> [threshold]
+import json
+import math
+import subprocess
+import sys
+import time
+from os import path
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from shooter import *
+
+TICKS = 600
+SEED = 1
+NAV_BUILDS = 20
+THRESHOLD = 0.1
+# differences below this many milliseconds are timer noise, never a regression
+NOISE_MS = 0.05
+PHASES = ('events', 'update', 'search', 'nav_build', 'draw')
+# the mine chain skips this many of the free tiles closest to the player, then takes every MINE_STRIDE-th one
+MINE_SKIP = 4
+MINE_STRIDE = 3
+
+
+def free_tiles(game):
+    return [(col, row) for row in range(1, game.map.tileheight - 1) for col in range(1, game.map.tilewidth - 1)
+            if not game.map.is_wall(col, row)]
+
+
+def add_mobs(kind, count):
+    def setup(game):
+        tiles = free_tiles(game)
+        for _ in range(count):
+            kind(game, *game.rng.choice(tiles))
+    return setup
+
+
+def keep_bullets(count):
+    # refilled from random free tiles before every tick, flying in random directions; the mobs they hit
+    # are healed so the level keeps its population
+    def setup(game):
+        tiles = free_tiles(game)
+
+        def refill(game):
+            for mob in game.mobs:
+                mob.health = MOB_HEALTH
+            while len(game.bullets) < count:
+                col, row = game.rng.choice(tiles)
+                direction = vec(1, 0).rotate(game.rng.uniform(0, 360))
+                game.bullets.spawn(vec(col + 0.5, row + 0.5) * TILESIZE, direction, 'RED')
+        game.before_tick = refill
+    return setup
+
+
+def mine_chain(count):
+    # armed mines strung along the open tiles around the player, the first one goes off on the first tick
+    def setup(game):
+        tiles = sorted(free_tiles(game), key=lambda tile: (vec(tile) * TILESIZE - game.player.pos).length_squared())
+        mines = []
+        for col, row in tiles[MINE_SKIP:MINE_SKIP + MINE_STRIDE * count:MINE_STRIDE]:
+            mine = Mine(game, game.player, (col + 0.5) * TILESIZE, (row + 0.5) * TILESIZE)
+            mine.armed = True
+            mines.append(mine)
+
+        def detonate(game):
+            if game.ticks == 0:
+                mines[0].boom()
+        game.before_tick = detonate
+    return setup
+
+
+# name -> (level index, setup run after the level is spawned)
+SCENARIOS = {f'level{level + 1}': (level, None) for level in range(7)}
+SCENARIOS.update({
+    'mobs-200': (5, add_mobs(Mob, 200)),
+    'bosses-20': (5, add_mobs(Boss, 20)),
+    'bullets-2000': (5, keep_bullets(2000)),
+    'mines-40': (5, mine_chain(40)),
+})
+
+
+def aim_at_nearest(game):
+    # face the closest mob and fire every other tick
+    aim = game.offset
+    if game.mobs:
+        target = min(game.mobs, key=lambda mob: (mob.pos - game.player.pos).length_squared())
+        distance = target.pos - game.player.pos
+        if distance.length_squared() > 0:
+            distance.scale_to_length(100)
+            aim = (game.offset[0] + distance.x, game.offset[1] + distance.y)
+    return Controls(aim, game.ticks % 2 == 0, False)
+
+
+class SuiteGame(Game):
+    def __init__(self, setup, ticks):
+        super().__init__(headless=True, seed=SEED, controls=aim_at_nearest)
+        self.setup = setup
+        self.max_ticks = ticks
+        self.before_tick = None
+        self.times = {phase: [] for phase in PHASES}
+
+    def run(self):
+        # the game loop with every phase timed, drawing included
+        times = self.times
+        for _ in range(NAV_BUILDS):
+            start = time.perf_counter()
+            NavGrid.from_map(self.map)
+            times['nav_build'].append(time.perf_counter() - start)
+        if self.setup:
+            self.setup(self)
+        self.grid.sync(self.all_sprites)
+
+        update = self.all_sprites.update
+        think = self.ai.update
+        thinking = [0.0]
+
+        def timed_think():
+            start = time.perf_counter()
+            think()
+            thinking[0] = time.perf_counter() - start
+        self.ai.update = timed_think
+
+        def timed_update(*args):
+            start = time.perf_counter()
+            update(*args)
+            times['update'].append(time.perf_counter() - start + thinking[0])
+        self.all_sprites.update = timed_update
+
+        self.playing = True
+        while self.playing and self.ticks < self.max_ticks:
+            self.player.health = math.inf
+            if self.before_tick:
+                self.before_tick(self)
+            self.dt = self.clock.tick(FPS) / 1000
+            start = time.perf_counter()
+            self.events()
+            times['events'].append(time.perf_counter() - start)
+            if not self.playing:
+                break
+            self.update()
+            start = time.perf_counter()
+            self.draw()
+            times['draw'].append(time.perf_counter() - start)
+            self.ticks += 1
+        self.playing = False
+        self.running = False
+
+
+def stats(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {'median': None, 'p99': None, 'count': 0}
+    return {'median': samples[len(samples) // 2] * 1e3,
+            'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e3,
+            'count': len(samples)}
+
+
+def run_scenario(name, ticks):
+    level, setup = SCENARIOS[name]
+    game = SuiteGame(setup, ticks)
+    game.level = level
+    searches = game.times['search']
+    search = Pathfinder.search
+
+    def timed_search(self, *args, **kwargs):
+        start = time.perf_counter()
+        found = search(self, *args, **kwargs)
+        searches.append(time.perf_counter() - start)
+        return found
+    Pathfinder.search = timed_search
+    try:
+        game.new()
+    finally:
+        Pathfinder.search = search
+    result = {phase: stats(samples) for phase, samples in game.times.items()}
+    result['ticks'] = game.ticks
+    return result
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(out, ticks, names):
+    results = {'commit': commit(), 'ticks': ticks, 'seed': SEED, 'scenarios': {}}
+    print(f"{'scenario':14s} {'ticks':>5s} " + ' '.join(f'{phase:>17s}' for phase in PHASES))
+    print(f"{'':20s} " + ' '.join(f"{'median':>8s} {'p99':>8s}" for _ in PHASES))
+    for name in names:
+        result = results['scenarios'][name] = run_scenario(name, ticks)
+        cells = []
+        for phase in PHASES:
+            median, p99 = result[phase]['median'], result[phase]['p99']
+            cells.append('        -         -' if median is None else f'{median:8.3f} {p99:8.3f}')
+        print(f"{name:14s} {result['ticks']:5d} " + ' '.join(cells))
+    with open(out, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f'saved {out}')
+
+
+def compare(base_file, new_file, threshold):
+    with open(base_file) as file:
+        base = json.load(file)
+    with open(new_file) as file:
+        new = json.load(file)
+    print(f"{base.get('commit')} -> {new.get('commit')}, medians in ms, regressions beyond {threshold:.0%}")
+    regressions = 0
+    for name, result in new['scenarios'].items():
+        old = base['scenarios'].get(name)
+        if old is None:
+            continue
+        for phase in PHASES:
+            before, after = old[phase]['median'], result[phase]['median']
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before else 0.0
+            slower = after > before * (1 + threshold) and after - before > NOISE_MS
+            regressions += slower
+            print(f"  {name:14s} {phase:10s} {before:8.3f} {after:8.3f} {change:+8.1%}" + ('  REGRESSION' if slower else ''))
+    print(f'{regressions} regressions')
+    return regressions
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'compare':
+        threshold = float(sys.argv[4]) if len(sys.argv) > 4 else THRESHOLD
+        sys.exit(1 if compare(sys.argv[2], sys.argv[3], threshold) else 0)
+    out = sys.argv[2] if len(sys.argv) > 2 else 'bench_suite.json'
+    ticks = int(sys.argv[3]) if len(sys.argv) > 3 else TICKS
+    run(out, ticks, sys.argv[4:] or list(SCENARIOS))
+
+
+if __name__ == '__main__':
+    main()
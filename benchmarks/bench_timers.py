@@ -0,0 +1,74 @@
+# The game's timer wheel against polling: N live timers, each re-armed 20 to 120 s out when it fires like a
+# fresh mine fuse, on a simulated clock stepping a frame per tick. Polling looks at every deadline every tick,
+# as Mine.update and the bullets used to; the wheel walks the milliseconds of the tick and fires what is due.
+# Per tick in ms, median and worst, and the timers fired over the run.
+# Usage: python benchmarks/bench_timers.py [ticks]
+import sys
+import time
+from os import path
+from random import Random
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from simulation import *
+from timers import *
+
+TICKS = 3600
+TIMERS = (100, 1000, 10000, 100000)
+
+
+class Polled:
+    # deadlines in a list, every one compared with the clock every tick
+    def __init__(self):
+        self.timers = []
+
+    def at(self, due, callback, *args):
+        timer = Timer(due, callback, args)
+        self.timers.append(timer)
+        return timer
+
+    def update(self, now):
+        due = [timer for timer in self.timers if now >= timer.due]
+        if due:
+            self.timers = [timer for timer in self.timers if now < timer.due]
+            for timer in due:
+                timer.callback(*timer.args)
+
+
+def run(timers, count, ticks):
+    clock = SimClock()
+    rng = Random(1)
+    fired = [0]
+
+    def fuse():
+        fired[0] += 1
+        timers.at(clock.get_ticks() + rng.randrange(20000, 120000), fuse)
+
+    for _ in range(count):
+        timers.at(rng.randrange(120000), fuse)
+    times = []
+    for _ in range(ticks):
+        clock.tick(FPS)
+        start = time.perf_counter()
+        timers.update(clock.get_ticks())
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2] * 1e3, times[-1] * 1e3, fired[0]
+
+
+def main():
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else TICKS
+    print(f"{ticks} ticks at {FPS} fps, ms per tick")
+    print(f"{'timers':>7s} {'fired':>7s} {'polled':>17s} {'wheel':>17s}")
+    print(f"{'':15s} " + ' '.join(f"{'median':>8s} {'max':>8s}" for _ in range(2)))
+    for count in TIMERS:
+        cells = []
+        for timers in (Polled(), TimerWheel()):
+            median, worst, fired = run(timers, count, ticks)
+            cells.append(f'{median:8.3f} {worst:8.3f}')
+        print(f'{count:7d} {fired:7d} ' + ' '.join(cells))
+
+
+if __name__ == '__main__':
+    main()
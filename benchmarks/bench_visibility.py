@@ -0,0 +1,54 @@
+# Build time and memory of the precomputed visibility sets for each shipped level,
+# with the cost of a lookup vs. an exact walk and of a local rebuild after a mine blast.
+# Usage: python benchmarks/bench_visibility.py
+import sys
+import timeit
+from os import path
+from random import Random
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from visibility import *
+
+SAMPLES = 5000
+
+
+def sightings(game_map, rng):
+    free = [(col, row) for row in range(game_map.tileheight) for col in range(game_map.tilewidth)
+            if not game_map.is_wall(col, row)]
+    pairs = []
+    for _ in range(SAMPLES):
+        start = vec(rng.choice(free)) * TILESIZE + vec(rng.uniform(6, 26), rng.uniform(6, 26))
+        end = start + vec(rng.uniform(0, DETECT_RADIUS), 0).rotate(rng.uniform(0, 360))
+        pairs.append((start, end))
+    return pairs
+
+
+def main():
+    rng = Random(1)
+    print(f"{'level':>5} {'tiles':>6} {'build ms':>9} {'memory KiB':>11} {'bytes/tile':>10} "
+          f"{'agree %':>8} {'lookup us':>10} {'walk us':>8} {'blast ms':>9}")
+    for level in range(1, 8):
+        game_map = Map(path.join(ROOT, 'levels', f'level{level}.png'))
+        build = timeit.timeit(lambda: VisibilityMap(game_map), number=3) / 3
+        visibility = VisibilityMap(game_map)
+
+        pairs = sightings(game_map, rng)
+        agree = sum(visibility.line_of_sight(a, b) == game_map.line_of_sight(a, b) for a, b in pairs)
+        lookup = timeit.timeit(lambda: [visibility.line_of_sight(a, b) for a, b in pairs], number=1)
+        walk = timeit.timeit(lambda: [game_map.line_of_sight(a, b) for a, b in pairs], number=1)
+
+        # a blast in the middle of the map clears a few tiles
+        col, row = game_map.tilewidth // 2, game_map.tileheight // 2
+        blast = [(col + dc, row + dr) for dc in (-1, 0, 1) for dr in (-1, 0, 1)]
+        rebuild = timeit.timeit(lambda: visibility.walls_removed(blast), number=3) / 3
+
+        tiles = game_map.tilewidth * game_map.tileheight
+        print(f"{level:>5} {tiles:>6} {build * 1000:>9.1f} {visibility.bits.nbytes / 1024:>11.1f} "
+              f"{visibility.nbytes:>10} {100 * agree / SAMPLES:>8.1f} {lookup / SAMPLES * 1e6:>10.2f} "
+              f"{walk / SAMPLES * 1e6:>8.2f} {rebuild * 1000:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# Per-frame map work and resident chunk memory while walking across streamed worlds of growing size.
+# Usage: python benchmarks/bench_world.py
+import sys
+import tempfile
+import time
+from os import path
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from world import *
+
+SIZES = (512, 2048, 10000)
+FRAMES = 600
+BULLETS = 256
+SPEED = 6
+
+
+def walk(world):
+    # the map queries of one frame: the wall layer under the camera, bullet hits and the chunks kept warm
+    rng = np.random.default_rng(1)
+    view = pg.Rect(0, 0, WIDTH, HEIGHT)
+    pos = vec(world.spawns[0][1:]) * TILESIZE
+    direction = vec(SPEED, SPEED * 0.6)
+    times = []
+    for _ in range(FRAMES):
+        start = time.perf_counter()
+        pos += direction
+        if not (0 < pos.x < world.width and 0 < pos.y < world.height):
+            direction = -direction
+        view.center = pos
+        world.wall_rects(view)
+        points = rng.integers(-WIDTH // 2, WIDTH // 2, (2, BULLETS)) + np.array([[int(pos.x)], [int(pos.y)]])
+        world.walls_at(points[0] // TILESIZE, points[1] // TILESIZE)
+        cx, cy = world.chunk_of(pos)
+        for y in range(max(0, cy - ACTIVE_CHUNKS), min(world.chunk_rows, cy + ACTIVE_CHUNKS + 1)):
+            for x in range(max(0, cx - ACTIVE_CHUNKS), min(world.chunk_cols, cx + ACTIVE_CHUNKS + 1)):
+                world.chunk(x, y)
+        times.append(time.perf_counter() - start)
+    return sorted(times)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        for size in SIZES:
+            filename = path.join(folder, f'{size}.world')
+            start = time.perf_counter()
+            generate_world(filename, size, size)
+            generate = time.perf_counter() - start
+
+            start = time.perf_counter()
+            world = World(filename)
+            opened = time.perf_counter() - start
+            times = walk(world)
+            resident = len(world.chunks) * world.chunk_size ** 2
+            print(f"{size}x{size}: file {path.getsize(filename) / 1e6:6.1f} MB, generated in {generate:5.2f} s, "
+                  f"opened in {opened * 1e3:.2f} ms")
+            print(f"  frame median {times[len(times) // 2] * 1e3:6.3f} ms, worst {times[-1] * 1e3:6.2f} ms, "
+                  f"{world.loads} chunk loads, {resident / 1e6:.2f} MB of chunks resident")
+            world.close()
+
+
+if __name__ == '__main__':
+    main()
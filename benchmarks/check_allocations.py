@@ -0,0 +1,145 @@
+# Allocation budget for the game loop: level 6 played headless by the scripted player of the scenario suite,
+# drawing every tick, profiled with the AllocationProfiler after a warm-up. A first run checks the loop as a
+# whole against budgets for memory kept per tick, the per-tick peak and garbage collections. A second run
+# brackets every bullet, mob, mine/timer and render step with tracemalloc snapshots and checks the snapshot
+# diffs summed per subsystem against the subsystem's budget; the snapshots allocate and collect too much
+# themselves to share a run with the loop checks. Fails (exit status 1) when anything is over budget and
+# lists the top allocation sites of what is.
+# Usage: python benchmarks/check_allocations.py
+import math
+import sys
+import tracemalloc
+from itertools import groupby
+from os import path
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import profiler as profiling
+import shooter
+from shooter import *
+from bench_suite import aim_at_nearest
+
+LEVEL = 5
+WARMUP = 120
+TICKS = 600
+# mean KB left allocated per tick, p99 of the per-tick peak in KB, collections per 1000 ticks
+BUDGET_TICK_KB = 1.0
+BUDGET_PEAK_KB = 32
+BUDGET_GC = 5
+# profiler section -> the subsystem it is charged to, the other sections only count for the loop
+SUBSYSTEMS = {'Bullet': 'bullets',
+              'AI': 'mobs', 'MobBatch': 'mobs', 'Mob': 'mobs', 'BatchedMob': 'mobs', 'Boss': 'mobs',
+              'Mine': 'mines/timers', 'Timers': 'mines/timers',
+              'draw': 'render'}
+# mean KB per tick a subsystem may leave allocated, from the snapshot diffs over its steps
+BUDGET_SUBSYSTEM_KB = {'bullets': 0.25, 'mobs': 0.5, 'mines/timers': 0.25, 'render': 0.5}
+# the bookkeeping of tracemalloc, the profiler and this check is no subsystem's
+IGNORE = (tracemalloc.__file__, profiling.__file__, __file__, '<frozen importlib._bootstrap')
+
+
+class SubsystemProfiler(AllocationProfiler):
+    # the AllocationProfiler, with a snapshot taken before and after every subsystem section; the diffs are
+    # summed per subsystem and allocation site
+    def __init__(self, font_name=None, frames=PROFILE_FRAMES):
+        super().__init__(font_name, frames)
+        # subsystem -> allocation site -> [bytes, blocks]
+        self.kept = {subsystem: {} for subsystem in BUDGET_SUBSYSTEM_KB}
+
+    def call(self, name, function, *args):
+        subsystem = SUBSYSTEMS.get(name)
+        if not self.enabled or subsystem is None:
+            return super().call(name, function, *args)
+        before = tracemalloc.take_snapshot()
+        result = super().call(name, function, *args)
+        sites = self.kept[subsystem]
+        # sites are skipped after the diff, filtering the snapshots themselves costs more than the sections
+        for stat in tracemalloc.take_snapshot().compare_to(before, 'lineno'):
+            if (stat.size_diff or stat.count_diff) and not stat.traceback[0].filename.startswith(IGNORE):
+                site = sites.setdefault(str(stat.traceback[0]), [0, 0])
+                site[0] += stat.size_diff
+                site[1] += stat.count_diff
+        return result
+
+    def update_sprites(self, group):
+        # in the group's order, each run of sprites of one class is one section
+        for name, sprites in groupby(group.sprites(), lambda sprite: type(sprite).__name__):
+            self.call(name, update_all, list(sprites))
+
+    def subsystem_sites(self, subsystem, limit=ALLOC_SITES):
+        sites = sorted(self.kept[subsystem].items(), key=lambda item: -item[1][0])
+        return [{'site': site, 'KB': size / 1024, 'blocks': blocks} for site, (size, blocks) in sites[:limit]]
+
+
+def update_all(sprites):
+    for sprite in sprites:
+        sprite.update()
+
+
+class BudgetGame(Game):
+    def __init__(self, profiler_kind):
+        super().__init__(headless=True, seed=1, controls=aim_at_nearest, max_ticks=WARMUP + TICKS)
+        # dummy display, but draw every tick like the windowed game
+        self.headless = False
+        self.profiler = profiler_kind(self.font_name, TICKS)
+        self.profiler.overlay = False
+
+    def update(self):
+        self.player.health = math.inf
+        if self.ticks == WARMUP:
+            self.profiler.toggle()
+        super().update()
+
+
+def play(profiler_kind):
+    # the game played to the end with the profiler still on
+    game = BudgetGame(profiler_kind)
+    game.level = LEVEL
+    game.new()
+    return game.profiler
+
+
+def main():
+    # drawing makes Game.new start path workers and a wall-clock thinking budget, both outside the loop's
+    # allocations and both timing-dependent; the headless game's clock steps a fixed time every tick
+    shooter.ASYNC_PATHS = False
+    shooter.AI_BUDGET_MS = None
+    profiler = play(AllocationProfiler)
+    # sites first, the statistics import parts of numpy on first use
+    sites = profiler.sites()
+    stats = profiler.stats()
+    profiler.toggle()
+    subsystems = play(SubsystemProfiler)
+    subsystems.toggle()
+
+    checks = [('KB kept per tick (mean)', stats['tick']['mean'], BUDGET_TICK_KB),
+              ('KB peak per tick (p99)', stats['peak']['p99'], BUDGET_PEAK_KB),
+              ('collections per 1000 ticks', stats['gc']['mean'] * 1000, BUDGET_GC)]
+    for subsystem, budget in BUDGET_SUBSYSTEM_KB.items():
+        kept = sum(size for size, _ in subsystems.kept[subsystem].values()) / 1024 / subsystems.frames
+        checks.append((f'KB kept per tick by {subsystem}', kept, budget))
+    print(f"level{LEVEL + 1}, {profiler.frames} ticks after {WARMUP} warm-up ticks")
+    for name, stat in stats.items():
+        unit = 'collections' if name == 'gc' else profiler.unit
+        print(f"  {name:10s} mean {stat['mean']:8.3f} p99 {stat['p99']:8.3f} max {stat['max']:8.3f} {unit}")
+    print('top allocation sites:')
+    print_sites(sites)
+    failed = 0
+    for name, value, budget in checks:
+        over = value > budget
+        failed += over
+        print(f"{'OVER' if over else 'ok':4s}  {name:34s} {value:8.3f} (budget {budget})")
+    for (name, value, budget), subsystem in zip(checks[3:], BUDGET_SUBSYSTEM_KB):
+        if value > budget:
+            print(f'top allocation sites of {subsystem}:')
+            print_sites(subsystems.subsystem_sites(subsystem))
+    sys.exit(1 if failed else 0)
+
+
+def print_sites(sites):
+    for site in sites:
+        print(f"  {site['KB']:8.1f} KB {site['blocks']:6d} blocks  {site['site']}")
+
+
+if __name__ == '__main__':
+    main()
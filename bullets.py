@@ -0,0 +1,230 @@
+import numpy as np
+from tilemap import *
+
+# a cell and its eight neighbours, the cell itself first
+NEIGHBOURS = sorted(((dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1)), key=lambda offset: offset != (0, 0))
+
+
+class BulletPool:
+    def __init__(self, game, capacity=256):
+        self.game = game
+        self.colors = list(game.bullet_imgs)
+        self.color_index = {color: i for i, color in enumerate(self.colors)}
+        self.half = vec(game.bullet_imgs[self.colors[0]].get_size()) // 2
+
+        # live bullets are kept packed in [0, count), oldest first
+        self.count = 0
+        self.pos = np.zeros((capacity, 2))
+        self.vel = np.zeros((capacity, 2))
+        self.color = np.zeros(capacity, np.int8)
+        self.owner = np.empty(capacity, object)
+        self.spawn_time = np.zeros(capacity, np.int64)
+        # timer on the game's wheel for the oldest bullet running out, None with no bullets
+        self.expiry = None
+
+    def __len__(self):
+        return self.count
+
+    def spawn(self, pos, direction, color, owner=None):
+        if self.count == len(self.pos):
+            self._grow()
+        i = self.count
+        self.pos[i] = pos
+        self.vel[i] = direction * BULLET_SPEED
+        self.color[i] = self.color_index[color]
+        self.owner[i] = owner
+        self.spawn_time[i] = self.game.clock.get_ticks()
+        self.count += 1
+        if self.expiry is None:
+            self._expire_after(int(self.spawn_time[0]))
+
+    def update(self):
+        n = self.count
+        if n == 0:
+            return
+        pos = self.pos[:n]
+        pos += self.vel[:n] * self.game.dt
+
+        keep = np.ones(n, bool)
+        left, top, right, bottom = self._rects()
+        game_map = self.game.map
+        for x in (left, right - 1):
+            for y in (top, bottom - 1):
+                keep &= ~game_map.walls_at(x // TILESIZE, y // TILESIZE)
+        self._compact(keep)
+
+    def expire(self):
+        # the bullets older than BULLET_LIFETIME are all at the front, spawn times only grow along the pool
+        self.expiry = None
+        n = self.count
+        old = int(np.searchsorted(self.spawn_time[:n], self.game.timers.time - BULLET_LIFETIME, 'left'))
+        if old:
+            self._compact(np.arange(n) >= old)
+        if self.count:
+            self._expire_after(int(self.spawn_time[0]))
+
+    def collide(self, sprites):
+        # bullets hitting each sprite's hit_rect are consumed; a bullet overlapping several
+        # sprites goes to the first one, like pg.sprite.groupcollide
+        if self.count == 0 or not sprites:
+            return np.zeros(len(sprites), np.int64)
+        return self.collide_rects(np.array([sprite.hit_rect for sprite in sprites], np.int64))
+
+    def collide_rects(self, targets):
+        # collide for an array of (x, y, w, h) rows, bullets hitting each row counted
+        hits = np.zeros(len(targets), np.int64)
+        if self.count == 0 or len(targets) == 0:
+            return hits
+        first = self._first_overlap(targets)
+        hit = first >= 0
+        if hit.any():
+            hits = np.bincount(first[hit], minlength=len(targets))
+            self._compact(~hit)
+        return hits
+
+    def any_in_rect(self, rect):
+        if self.count == 0:
+            return False
+        left, top, right, bottom = self._rects()
+        return bool(np.any((left < rect.right) & (rect.left < right) &
+                           (top < rect.bottom) & (rect.top < bottom)))
+
+    def clear_radius(self, pos, radius):
+        self.clear_radii([pos], radius)
+
+    def clear_radii(self, points, radius):
+        # drop the bullets within radius of any of the points; both are bucketed in cells radius wide,
+        # so a bullet is only measured against the points in the 3x3 cells around its own
+        n = self.count
+        if n == 0 or not points:
+            return
+        centres = np.array([(x, y) for x, y in points], float)
+        # only the bullets inside the box around all the points need bucketing
+        low, high = centres.min(axis=0) - radius, centres.max(axis=0) + radius
+        candidates = np.flatnonzero(((self.pos[:n] >= low) & (self.pos[:n] <= high)).all(axis=1))
+        if len(candidates) == 0:
+            return
+        pos = self.pos[candidates]
+        cells = np.floor(pos / radius).astype(np.int64)
+        keys = self._key(*np.floor(centres / radius).astype(np.int64).T)
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        # every bullet against the points of its own cell first, then of the neighbours for the bullets still clear
+        hit = np.zeros(n, bool)
+        for dx, dy in NEIGHBOURS:
+            query = self._key(cells[:, 0] + dx, cells[:, 1] + dy)
+            first = np.searchsorted(keys, query, 'left')
+            counts = np.searchsorted(keys, query, 'right') - first
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            bullets = np.repeat(np.arange(len(candidates)), counts)
+            near = order[np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(total)]
+            d = pos[bullets] - centres[near]
+            caught = np.zeros(len(candidates), bool)
+            caught[bullets[np.einsum('ij,ij->i', d, d) <= radius * radius]] = True
+            hit[candidates[caught]] = True
+            candidates, pos, cells = candidates[~caught], pos[~caught], cells[~caught]
+            if len(candidates) == 0:
+                break
+        self._compact(~hit)
+
+    def clear(self):
+        self.owner[:self.count] = None
+        self.count = 0
+
+    def draw(self, surface, offset):
+        n = self.count
+        if n == 0:
+            return
+        topleft = self.pos[:n] - self.half + offset
+        for i, color in enumerate(self.colors):
+            image = self.game.bullet_imgs[color]
+            dests = topleft[self.color[:n] == i].tolist()
+            if dests:
+                surface.blits([(image, dest) for dest in dests], False)
+
+    def screen_rects(self, offset):
+        # areas the bullets are drawn in as (left, top, right, bottom) arrays, a pixel wider
+        # on each side for the rounding of float positions in blits
+        left, top, right, bottom = self._rects()
+        return left + offset[0] - 1, top + offset[1] - 1, right + offset[0] + 1, bottom + offset[1] + 1
+
+    def _rects(self):
+        # integer rects of the live bullets, as the old per-bullet Rects had them centred on pos
+        topleft = whole_pixels(self.pos[:self.count]) - (int(self.half.x), int(self.half.y))
+        left, top = topleft[:, 0], topleft[:, 1]
+        return left, top, left + 2 * int(self.half.x), top + 2 * int(self.half.y)
+
+    def _first_overlap(self, targets):
+        # index of the first target rect (x, y, w, h) overlapping each bullet, -1 for none.
+        # Targets are binned per cell and matched against the bullet's cell so the cost is
+        # O((bullets + targets) log) rather than bullets * targets.
+        left, top, right, bottom = self._rects()
+        cell = SPATIAL_CELL
+        t_left = targets[:, 0]
+        t_top = targets[:, 1]
+        t_right = t_left + targets[:, 2]
+        t_bottom = t_top + targets[:, 3]
+
+        # cells covered by each target grown by a bullet's half size
+        half_w, half_h = int(self.half.x), int(self.half.y)
+        c0, c1 = (t_left - half_w) // cell, (t_right + half_w) // cell
+        r0, r1 = (t_top - half_h) // cell, (t_bottom + half_h) // cell
+        width = c1 - c0 + 1
+        spans = width * (r1 - r0 + 1)
+        owner = np.repeat(np.arange(len(targets)), spans)
+        local = np.arange(len(owner)) - np.repeat(np.cumsum(spans) - spans, spans)
+        keys = self._key(c0[owner] + local % width[owner], r0[owner] + local // width[owner])
+        order = np.argsort(keys, kind='stable')
+        keys, owner = keys[order], owner[order]
+
+        centers = whole_pixels(self.pos[:self.count])
+        b_keys = self._key(centers[:, 0] // cell, centers[:, 1] // cell)
+        start = np.searchsorted(keys, b_keys, 'left')
+        stop = np.searchsorted(keys, b_keys, 'right')
+        counts = stop - start
+
+        first = np.full(self.count, -1)
+        if not counts.any():
+            return first
+        bullet = np.repeat(np.arange(self.count), counts)
+        pair = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + start[bullet]
+        target = owner[pair]
+        overlap = ((left[bullet] < t_right[target]) & (t_left[target] < right[bullet]) &
+                   (top[bullet] < t_bottom[target]) & (t_top[target] < bottom[bullet]))
+        # several overlapping targets: the first one in order takes the bullet
+        first[:] = len(targets)
+        np.minimum.at(first, bullet[overlap], target[overlap])
+        first[first == len(targets)] = -1
+        return first
+
+    @staticmethod
+    def _key(cols, rows):
+        return rows * (1 << 32) + cols
+
+    def _expire_after(self, spawn_time):
+        # a bullet lives BULLET_LIFETIME ms and is gone the millisecond after
+        self.expiry = self.game.timers.at(spawn_time + BULLET_LIFETIME + 1, self.expire)
+
+    def _compact(self, keep):
+        n = self.count
+        if keep.all():
+            return
+        m = int(keep.sum())
+        self.pos[:m] = self.pos[:n][keep]
+        self.vel[:m] = self.vel[:n][keep]
+        self.color[:m] = self.color[:n][keep]
+        self.owner[:m] = self.owner[:n][keep]
+        self.spawn_time[:m] = self.spawn_time[:n][keep]
+        self.owner[m:n] = None
+        self.count = m
+
+    def _grow(self):
+        capacity = 2 * len(self.pos)
+        for name in ('pos', 'vel', 'color', 'owner', 'spawn_time'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], old.dtype) if old.dtype != object \
+                else np.empty(capacity, object)
+            new[:len(old)] = old
+            setattr(self, name, new)
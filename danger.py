@@ -0,0 +1,100 @@
+from pathfinding import *
+
+
+def wall_kernel(reach=DANGER_WALL_REACH):
+    # danger a wall adds to the tiles around it, its own tile included
+    span = np.arange(-reach, reach + 1)
+    kernel = DANGER_WALL / np.maximum(span[None, :] ** 2 + span[:, None] ** 2, 1)
+    kernel[reach, reach] = 2 * DANGER_WALL
+    return kernel
+
+
+class DangerField:
+    # danger of every tile of a level: the push of the walls, worked out once and patched as walls go, plus
+    # the blast footprint of every armed mine, stamped when it arms and erased when it goes off or is removed.
+    # Bosses dodging a mine follow its gradient, A* pays the mine part as extra step cost.
+    def __init__(self, game_map, cache=None):
+        self.width = width = game_map.tilewidth
+        self.height = height = game_map.tileheight
+        # objects with an area_changed(left, top, right, bottom) method, told about every stamp and erase;
+        # paths through a changed footprint are dropped from the cache
+        self.listeners = [] if cache is None else [cache]
+        # per tile index like the nav grid, grid and blast are (rows, cols) views of the same memory
+        self.field = array('d', bytes(8 * width * height))
+        self.grid = np.frombuffer(self.field, np.float64).reshape(height, width)
+        # the mine part alone, and how many footprints cover each tile
+        self.cost = array('d', bytes(8 * width * height))
+        self.blast = np.frombuffer(self.cost, np.float64).reshape(height, width)
+        self.covered = np.zeros((height, width), np.int32)
+        # mine -> rows, cols and danger of its footprint
+        self.stamps = {}
+
+        self.kernel = wall_kernel()
+        reach = DANGER_WALL_REACH
+        solid = np.pad(game_map.wall_grid == 1, reach)
+        for dy in range(2 * reach + 1):
+            for dx in range(2 * reach + 1):
+                self.grid += self.kernel[dy, dx] * solid[dy:dy + height, dx:dx + width]
+
+    def nav_changed(self, tile, blocked):
+        # a wall came or went: add or take off its push around it
+        col, row = tile
+        reach = DANGER_WALL_REACH
+        top, left = max(0, row - reach), max(0, col - reach)
+        bottom, right = min(self.height, row + reach + 1), min(self.width, col + reach + 1)
+        kernel = self.kernel[top - row + reach:bottom - row + reach, left - col + reach:right - col + reach]
+        self.grid[top:bottom, left:right] += kernel if blocked else -kernel
+
+    def stamp(self, mine):
+        # the blast falloff of an armed mine over the tiles whose centre it reaches
+        if mine in self.stamps:
+            return
+        x, y = mine.pos
+        reach = int(BLAST_RADIUS // TILESIZE) + 1
+        col, row = int(x // TILESIZE), int(y // TILESIZE)
+        left, top = max(0, col - reach), max(0, row - reach)
+        cols = np.arange(left, min(self.width, col + reach + 1))
+        rows = np.arange(top, min(self.height, row + reach + 1))[:, None]
+        dx = (cols + 0.5) * TILESIZE - x
+        dy = (rows + 0.5) * TILESIZE - y
+        falloff = 1 - (dx * dx + dy * dy) / BLAST_RADIUS ** 2
+        rows, cols = np.nonzero(falloff > 0)
+        values = DANGER_MINE * falloff[rows, cols]
+        rows += top
+        cols += left
+        self.stamps[mine] = rows, cols, values
+        self._apply(rows, cols, values, 1)
+
+    def erase(self, mine):
+        stamp = self.stamps.pop(mine, None)
+        if stamp is not None:
+            rows, cols, values = stamp
+            self._apply(rows, cols, -values, -1)
+
+    def _apply(self, rows, cols, values, count):
+        if len(rows) == 0:
+            return
+        self.grid[rows, cols] += values
+        self.blast[rows, cols] += values
+        self.covered[rows, cols] += count
+        for listener in self.listeners:
+            listener.area_changed(int(cols.min()), int(rows.min()), int(cols.max()), int(rows.max()))
+
+    def in_blast(self, tile):
+        col, row = int(tile[0]), int(tile[1])
+        return 0 <= col < self.width and 0 <= row < self.height and self.covered[row, col] > 0
+
+    def blast_at(self, tile):
+        return float(self.blast[int(tile[1]), int(tile[0])]) if self.in_blast(tile) else 0.0
+
+    def gradient(self, tile):
+        # central differences around the tile, one-sided at the map edges
+        col = min(max(int(tile[0]), 0), self.width - 1)
+        row = min(max(int(tile[1]), 0), self.height - 1)
+        field, width = self.field, self.width
+        index = row * width + col
+        left = index - 1 if col > 0 else index
+        right = index + 1 if col < self.width - 1 else index
+        up = index - width if row > 0 else index
+        down = index + width if row < self.height - 1 else index
+        return vec(field[right] - field[left], field[down] - field[up]) / 2
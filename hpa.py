@@ -0,0 +1,321 @@
+from math import ceil
+from pathfinding import *
+
+
+class LazyPath(list):
+    # tiles of the legs refined so far; the rest of the route is kept as abstract waypoints
+    # and refined one leg at a time as the walker gets there
+    def __init__(self, finder, start, waypoints):
+        super().__init__([start])
+        self.finder = finder
+        self.waypoints = list(waypoints)
+        self.last = start
+
+    def refine(self):
+        if not self.waypoints:
+            return False
+        target = self.waypoints.pop(0)
+        leg = self.finder.refine(self.last, target)
+        if not leg:
+            # the map changed under the plan, the walker will have to ask again
+            self.waypoints.clear()
+            return False
+        self.extend(leg)
+        self.last = target
+        return True
+
+
+class HierarchicalPathfinder:
+    def __init__(self, nav, heuristic=manhattan_distance, cache=None, cluster_size=HPA_CLUSTER_SIZE):
+        self.nav = nav
+        self.heuristic = heuristic
+        self.cache = cache
+        self.size = cluster_size
+        self.cols = ceil(nav.width / cluster_size)
+        self.rows = ceil(nav.height / cluster_size)
+
+        # (cluster, 'R' or 'D') -> entrance pairs (a, b) across the border to the right or below,
+        # a inside the cluster and b in its neighbour
+        self.borders = {}
+        # abstract node -> nodes across a border (cost 1)
+        self.inter = {}
+        # cluster -> its abstract nodes
+        self.nodes = {}
+        # cluster -> {node: [(other, cost)]} inside the cluster, worked out on first use
+        self.intra = {}
+        # cluster -> (left, top, width, adjacency masks cut at the cluster edges, offsets)
+        self.local = {}
+        # clusters touched by nav changes since the last search
+        self.dirty = set()
+
+        for cluster in range(self.cols * self.rows):
+            self._build_border(cluster, 'R')
+            self._build_border(cluster, 'D')
+        for cluster in range(self.cols * self.rows):
+            self._collect_nodes(cluster)
+        nav.listeners.append(self)
+
+    def cluster_of(self, index):
+        width = self.nav.width
+        return (index // width // self.size) * self.cols + index % width // self.size
+
+    def bounds(self, cluster):
+        left = cluster % self.cols * self.size
+        top = cluster // self.cols * self.size
+        return left, top, min(left + self.size, self.nav.width) - 1, min(top + self.size, self.nav.height) - 1
+
+    def precompute(self):
+        # fill in every intra-cluster cost up front instead of on first use
+        for cluster in range(self.cols * self.rows):
+            self._intra(cluster)
+
+    def search(self, start, end, max_size=None):
+        # max_size is accepted for compatibility with Pathfinder; routes are never cut short
+        nav = self.nav
+        start = (int(start[0]), int(start[1]))
+        end = (int(end[0]), int(end[1]))
+        if start not in nav or end not in nav:
+            return []
+        self._refresh()
+
+        key = (start, end, 'hpa')
+        waypoints = self.cache.get(key) if self.cache is not None else None
+        if waypoints is None:
+            waypoints = self.plan(start, end)
+            if waypoints is None:
+                return []
+            if self.cache is not None:
+                self.cache.put(key, waypoints)
+
+        path = LazyPath(self, start, waypoints)
+        if waypoints and not path.refine():
+            return []
+        return path
+
+    def plan(self, start, end):
+        # abstract route from start to end as a list of waypoint tiles, None if unreachable
+        width = self.nav.width
+        source = start[1] * width + start[0]
+        goal = end[1] * width + end[0]
+        if source == goal:
+            return []
+        start_cluster = self.cluster_of(source)
+        goal_cluster = self.cluster_of(goal)
+
+        distance = self._flood(source, start_cluster)[0]
+        if start_cluster == goal_cluster and distance[self._index(goal)] >= 0:
+            return [end]
+        start_links = self._links(distance, start_cluster)
+        goal_links = self._links(self._flood(goal, goal_cluster)[0], goal_cluster)
+
+        heuristic = self.heuristic
+        g_score = {source: 0}
+        parent = {source: -1}
+        closed = set()
+        queue = [(heuristic(start, end), 0, source)]
+        while queue:
+            node = heapq.heappop(queue)[2]
+            if node in closed:
+                continue
+            closed.add(node)
+            if node == goal:
+                route = []
+                while node != source:
+                    route.append((node % width, node // width))
+                    node = parent[node]
+                route.reverse()
+                return route
+
+            cost = g_score[node]
+            if node == source:
+                edges = list(start_links.items())
+            else:
+                edges = list(self._intra(self.cluster_of(node)).get(node, ()))
+            edges.extend((other, 1) for other in self.inter.get(node, ()))
+            if node in goal_links:
+                edges.append((goal, goal_links[node]))
+
+            for other, step in edges:
+                if other in closed:
+                    continue
+                new_cost = cost + step
+                if new_cost < g_score.get(other, new_cost + 1):
+                    g_score[other] = new_cost
+                    parent[other] = node
+                    f = new_cost + heuristic((other % width, other // width), end)
+                    heapq.heappush(queue, (f, -new_cost, other))
+        return None
+
+    def refine(self, start, end):
+        # tiles after start up to end; consecutive waypoints always share a cluster or a border
+        nav = self.nav
+        width = nav.width
+        source = start[1] * width + start[0]
+        goal = end[1] * width + end[0]
+        if goal - source in nav.offsets[nav.mask[source]]:
+            return [end]
+        cluster = self.cluster_of(source)
+        if cluster != self.cluster_of(goal):
+            return []
+        distance, parent = self._flood(source, cluster, goal)
+        node = self._index(goal)
+        if distance[node] < 0:
+            return []
+        left, top, w = self.local[cluster][:3]
+        leg = []
+        while parent[node] >= 0:
+            leg.append((left + node % w, top + node // w))
+            node = parent[node]
+        leg.reverse()
+        return leg
+
+    def nav_changed(self, tile, blocked):
+        self.dirty.add(self.cluster_of(tile[1] * self.nav.width + tile[0]))
+
+    def _refresh(self):
+        # rebuild the borders of the touched clusters and forget the intra costs around them
+        if not self.dirty:
+            return
+        touched = set()
+        for cluster in self.dirty:
+            cx, cy = cluster % self.cols, cluster // self.cols
+            self._build_border(cluster, 'R')
+            self._build_border(cluster, 'D')
+            touched.add(cluster)
+            if cx + 1 < self.cols:
+                touched.add(cluster + 1)
+            if cy + 1 < self.rows:
+                touched.add(cluster + self.cols)
+            if cx > 0:
+                self._build_border(cluster - 1, 'R')
+                touched.add(cluster - 1)
+            if cy > 0:
+                self._build_border(cluster - self.cols, 'D')
+                touched.add(cluster - self.cols)
+        for cluster in touched:
+            self._collect_nodes(cluster)
+        self.dirty.clear()
+
+    def _build_border(self, cluster, side):
+        inter = self.inter
+        for a, b in self.borders.pop((cluster, side), ()):
+            inter[a].discard(b)
+            inter[b].discard(a)
+
+        nav = self.nav
+        width = nav.width
+        mask = nav.mask
+        left, top, right, bottom = self.bounds(cluster)
+        if side == 'R':
+            if cluster % self.cols + 1 >= self.cols:
+                return
+            # a on the right edge of the cluster, b just across it
+            tiles = [y * width + right for y in range(top, bottom + 1)]
+            step, out_bit, in_bit = 1, 1, 2
+        else:
+            if cluster // self.cols + 1 >= self.rows:
+                return
+            tiles = [bottom * width + x for x in range(left, right + 1)]
+            step, out_bit, in_bit = width, 4, 8
+
+        # one entrance in the middle of every open run, two at the ends of long runs
+        pairs = []
+        run = []
+        for a in tiles + [-1]:
+            if a >= 0 and mask[a] & out_bit and mask[a + step] & in_bit:
+                run.append(a)
+                continue
+            if run:
+                ends = (run[0], run[-1]) if len(run) >= HPA_SPLIT else (run[len(run) // 2],)
+                pairs.extend((tile, tile + step) for tile in ends)
+                run = []
+        for a, b in pairs:
+            inter.setdefault(a, set()).add(b)
+            inter.setdefault(b, set()).add(a)
+        self.borders[(cluster, side)] = pairs
+
+    def _collect_nodes(self, cluster):
+        cx, cy = cluster % self.cols, cluster // self.cols
+        nodes = {a for a, b in self.borders.get((cluster, 'R'), ())}
+        nodes.update(a for a, b in self.borders.get((cluster, 'D'), ()))
+        if cx > 0:
+            nodes.update(b for a, b in self.borders.get((cluster - 1, 'R'), ()))
+        if cy > 0:
+            nodes.update(b for a, b in self.borders.get((cluster - self.cols, 'D'), ()))
+        self.nodes[cluster] = sorted(nodes)
+        self.intra.pop(cluster, None)
+        self.local.pop(cluster, None)
+
+    def _intra(self, cluster):
+        edges = self.intra.get(cluster)
+        if edges is None:
+            nodes = self.nodes[cluster]
+            indices = [self._index(node) for node in nodes]
+            edges = {}
+            for node in nodes:
+                distance = self._flood(node, cluster)[0]
+                edges[node] = [(other, distance[index]) for other, index in zip(nodes, indices)
+                               if other != node and distance[index] >= 0]
+            self.intra[cluster] = edges
+        return edges
+
+    def _links(self, distance, cluster):
+        # costs from a flooded tile to the abstract nodes of its cluster
+        links = {}
+        for node in self.nodes[cluster]:
+            cost = distance[self._index(node)]
+            if cost >= 0:
+                links[node] = cost
+        return links
+
+    def _index(self, index):
+        # flat map index -> index inside its cluster
+        width = self.nav.width
+        left, top, w = self._local(self.cluster_of(index))[:3]
+        return (index // width - top) * w + index % width - left
+
+    def _local(self, cluster):
+        local = self.local.get(cluster)
+        if local is None:
+            nav = self.nav
+            left, top, right, bottom = self.bounds(cluster)
+            w = right - left + 1
+            mask = bytearray()
+            for y in range(top, bottom + 1):
+                row = bytearray(nav.mask[y * nav.width + left:y * nav.width + right + 1])
+                row[0] &= ~2
+                row[-1] &= ~1
+                if y == top:
+                    row = bytearray(bit & ~8 for bit in row)
+                if y == bottom:
+                    row = bytearray(bit & ~4 for bit in row)
+                mask += row
+            offsets = [tuple(dy * w + dx for dx, dy in directions) for directions in MASK_DIRECTIONS]
+            local = self.local[cluster] = left, top, w, mask, offsets
+        return local
+
+    def _flood(self, source, cluster, goal=-1):
+        # breadth-first inside one cluster on cluster-local indices; stops early once goal is reached
+        left, top, w, mask, offsets = self._local(cluster)
+        source = self._index(source)
+        if goal >= 0:
+            goal = self._index(goal)
+        distance = [-1] * len(mask)
+        parent = [-1] * len(mask)
+        distance[source] = 0
+        frontier = [source]
+        steps = 0
+        while frontier:
+            steps += 1
+            reached = []
+            for node in frontier:
+                for offset in offsets[mask[node]]:
+                    neighbor = node + offset
+                    if distance[neighbor] < 0:
+                        distance[neighbor] = steps
+                        parent[neighbor] = node
+                        if neighbor == goal:
+                            return distance, parent
+                        reached.append(neighbor)
+            frontier = reached
+        return distance, parent
@@ -0,0 +1,111 @@
+import hashlib
+import mmap
+import struct
+import numpy as np
+from glob import glob
+from os import path, remove
+from settings import *
+
+PACK_MAGIC = b'LVLP'
+PACK_VERSION = 1
+# magic, version, width, height, number of spawns
+PACK_HEADER = struct.Struct('<4sHHHI')
+
+# spawn kinds and the pixel colour that marks them in a level image
+PLAYER_SPAWN = 0
+MOB_SPAWN = 1
+BOSS_SPAWN = 2
+SPAWN_COLORS = {PLAYER_SPAWN: GREY, MOB_SPAWN: RED, BOSS_SPAWN: PURPLE}
+
+
+def adjacency_mask(width, height, solid):
+    # one byte per tile, bit i set when the neighbour at (1, 0), (-1, 0), (0, 1), (0, -1) is walkable
+    open_ = np.frombuffer(solid, np.uint8).reshape(height, width) == 0
+    mask = np.zeros((height, width), np.uint8)
+    mask[:, :-1] |= open_[:, 1:] * np.uint8(1)
+    mask[:, 1:] |= open_[:, :-1] * np.uint8(2)
+    mask[:-1, :] |= open_[1:, :] * np.uint8(4)
+    mask[1:, :] |= open_[:-1, :] * np.uint8(8)
+    return bytearray(mask.tobytes())
+
+
+class LevelPack:
+    # a compiled level: wall bits, navigation adjacency and spawn points
+    def __init__(self, buffer):
+        magic, version, width, height, spawn_count = PACK_HEADER.unpack_from(buffer)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError('not a level pack of this version')
+        self.width = width
+        self.height = height
+
+        tiles = width * height
+        offset = PACK_HEADER.size
+        packed = np.frombuffer(buffer, np.uint8, (tiles + 7) // 8, offset)
+        # wall layer, one byte per tile, indexed by row * width + col
+        self.walls = bytearray(np.unpackbits(packed)[:tiles].tobytes())
+        offset += packed.size
+        self.mask = bytearray(buffer[offset:offset + tiles])
+        offset += tiles
+        # (kind, col, row) in the order the image is scanned, row by row
+        spawns = np.frombuffer(buffer, np.int16, spawn_count * 3, offset).reshape(-1, 3)
+        self.spawns = [tuple(spawn) for spawn in spawns.tolist()]
+
+
+def compile_level(filename):
+    # PIL is only needed when a pack has to be (re)built
+    from PIL import Image
+    with Image.open(filename) as image:
+        pixels = np.asarray(image.convert('RGB'))
+    height, width = pixels.shape[:2]
+
+    walls = np.all(pixels == BLACK, axis=2).astype(np.uint8)
+    kinds = np.full((height, width), -1, np.int16)
+    for kind, color in SPAWN_COLORS.items():
+        kinds[np.all(pixels == color, axis=2)] = kind
+    rows, cols = np.nonzero(kinds >= 0)
+    spawns = np.stack([kinds[rows, cols], cols, rows], axis=1).astype('<i2')
+
+    return b''.join([
+        PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, width, height, len(spawns)),
+        np.packbits(walls).tobytes(),
+        bytes(adjacency_mask(width, height, walls.tobytes())),
+        spawns.tobytes(),
+    ])
+
+
+def pack_path(filename, digest):
+    # packs live next to their source image, keyed by a hash of its content
+    root, _ = path.splitext(filename)
+    return f'{root}.{digest[:16]}.pack'
+
+
+def load_level(filename):
+    with open(filename, 'rb') as source:
+        digest = hashlib.sha1(source.read()).hexdigest()
+    packed = pack_path(filename, digest)
+
+    if path.exists(packed):
+        try:
+            with open(packed, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                return LevelPack(buffer)
+        except (ValueError, struct.error):
+            # truncated or written by another version, compile it again
+            pass
+
+    data = compile_level(filename)
+    try:
+        for stale in glob(pack_path(filename, '*')):
+            remove(stale)
+        with open(packed, 'wb') as file:
+            file.write(data)
+    except OSError:
+        # read-only install, use the pack without caching it
+        pass
+    return LevelPack(data)
+
+
+if __name__ == '__main__':
+    # compile every level ahead of time
+    for filename in sorted(glob(path.join(path.dirname(path.abspath(__file__)), 'levels', '*.png'))):
+        level = load_level(filename)
+        print(f'{path.basename(filename)}: {level.width}x{level.height}, {len(level.spawns)} spawns')
@@ -0,0 +1,292 @@
+from sprites import *
+
+# headings of a mob turned a multiple of 90 degrees, as vec(1, 0).rotate(-rot) has them
+HEADINGS = np.array([(1, 0), (0, -1), (-1, 0), (0, 1)], float)
+# side of a mob's hit_rect
+HIT_BOX = 20
+# mob attributes kept in the batch, and every per-slot array
+BATCHED = ('pos', 'vel', 'rot', 'health', 'last_shot', 'engaged')
+ARRAYS = BATCHED + ('box', 'span', 'mobs')
+# span of a mob not filed in the spatial hash yet
+UNFILED = -1 << 62
+
+
+def batch_field(name, kind):
+    # an attribute kept in the batch's arrays while the mob is in it and on the mob while it is not;
+    # vectors are read as copies, a changed one has to be assigned back
+    def get(self):
+        if self.slot is None:
+            return self.__dict__[name]
+        value = getattr(self.batch, name)[self.slot]
+        return vec(float(value[0]), float(value[1])) if kind is vec else kind(value)
+
+    def put(self, value):
+        if self.slot is None:
+            self.__dict__[name] = value
+        else:
+            getattr(self.batch, name)[self.slot] = tuple(value) if kind is vec else value
+
+    return property(get, put)
+
+
+class MobBatch:
+    # the plain mobs of a level as arrays packed in [0, count), all stepped by the same NumPy operations every
+    # tick: looking out for the player, wandering, moving, wrapping around the map edges and sliding along the
+    # walls. Only the mobs within DETECT_RADIUS of the player (line of sight, shooting) and the dying ones are
+    # handled one by one; the BatchedMob sprites are views on their slot for drawing, bullets and blasts.
+    def __init__(self, game, capacity=256):
+        self.game = game
+        self.rng = np.random.default_rng(game.rng.getrandbits(64))
+        self.count = 0
+        self.mobs = np.empty(capacity, object)
+        self.pos = np.zeros((capacity, 2))
+        self.vel = np.zeros((capacity, 2))
+        self.rot = np.zeros(capacity)
+        self.health = np.zeros(capacity)
+        self.last_shot = np.zeros(capacity, np.int64)
+        self.engaged = np.zeros(capacity, bool)
+        # centre of the hit_rect in whole pixels, and the cells of the spatial hash the rect is filed under
+        self.box = np.zeros((capacity, 2), np.int64)
+        self.span = np.full((capacity, 4), UNFILED, np.int64)
+        # the mobs in the batch, moved in the spatial hash by update
+        self.filed = {}
+        # mobs whose sight cells were filled in on the last update
+        self.sighted = []
+
+    def __len__(self):
+        return self.count
+
+    def add(self, mob):
+        # the mob's own attributes move into a new slot
+        if self.count == len(self.pos):
+            self._grow()
+        i = self.count
+        self.count += 1
+        self.mobs[i] = mob
+        self.span[i] = UNFILED
+        self.filed[mob] = None
+        state = mob.__dict__
+        mob.slot = i
+        for name in BATCHED:
+            if name in state:
+                setattr(mob, name, state.pop(name))
+        if 'hit_rect' in state:
+            self.box[i] = state['hit_rect'].center
+
+    def remove(self, mob):
+        # the mob takes its state back as plain attributes, the last slot fills the gap
+        i = mob.slot
+        if i is None:
+            return
+        state = {name: getattr(mob, name) for name in BATCHED + ('image', 'rect', 'hit_rect')}
+        mob.slot = None
+        mob.__dict__.update(state)
+        del self.filed[mob]
+        last = self.count - 1
+        if i != last:
+            for name in ARRAYS:
+                array = getattr(self, name)
+                array[i] = array[last]
+            self.mobs[i].slot = i
+        self.mobs[last] = None
+        self.count = last
+
+    def collide(self, bullets):
+        n = self.count
+        if n == 0:
+            return
+        targets = np.empty((n, 4), np.int64)
+        targets[:, :2] = self.box[:n] - HIT_BOX // 2
+        targets[:, 2:] = HIT_BOX
+        self.health[:n] -= BULLET_DAMAGE * bullets.collide_rects(targets)
+
+    def update(self):
+        n = self.count
+        if n == 0:
+            return
+        game = self.game
+        pos, vel, rot, box = self.pos[:n], self.vel[:n], self.rot[:n], self.box[:n]
+
+        # the player in sight: within DETECT_RADIUS first, the line of sight only for those
+        for mob in self.sighted:
+            mob.sight_cells.clear()
+        self.sighted = []
+        target = game.player.pos
+        offset = np.array((target.x, target.y)) - pos
+        engaged = self.engaged[:n]
+        engaged[:] = False
+        for i in np.flatnonzero(np.einsum('ij,ij->i', offset, offset) < DETECT_RADIUS ** 2).tolist():
+            cells = None
+            if game.draw_rects:
+                cells = self.mobs[i].sight_cells
+                self.sighted.append(self.mobs[i])
+            engaged[i] = game.sight.line_of_sight(pos[i].tolist(), target, cells)
+        spotted = np.flatnonzero(engaged)
+        rot[spotted] = -np.degrees(np.arctan2(offset[spotted, 1], offset[spotted, 0]))
+        for i in spotted.tolist():
+            shoot(self.mobs[i])
+
+        # a random quarter turn about every 50 ticks, then on along the nearest right angle
+        wandering = ~engaged
+        turn = wandering & (self.rng.integers(0, 50, n) == 49)
+        rot[turn] += self.rng.choice((-90, 90), int(turn.sum()))
+        rot[wandering] = np.round(rot[wandering] / 90) * 90
+        quarter = np.round(rot / 90).astype(np.int64) % 4
+        vel[wandering] = MOB_SPEED * HEADINGS[quarter[wandering]]
+        vel[engaged] = 0
+        pos += vel * game.dt
+
+        # off one edge of the map, back in at the other
+        width, height = game.mob_img.get_size()
+        upright = quarter % 2 == 1
+        half_w = np.where(upright, height, width) / 2
+        half_h = np.where(upright, width, height) / 2
+        x, y = pos[:, 0], pos[:, 1]
+        np.copyto(x, -half_w, where=x > game.map.width + half_w)
+        np.copyto(x, game.map.width + half_w, where=x < -half_w)
+        np.copyto(y, -half_h, where=y > game.map.height + half_h)
+        np.copyto(y, game.map.height + half_h, where=y < -half_h)
+
+        # the hit_rect against the walls, across and then down, pushed out of the first wall tile it overlaps
+        # in row-major order like collide_with_walls; a mob that hit a wall turns
+        blocked = np.zeros(n, bool)
+        half = HIT_BOX // 2
+        for axis in (0, 1):
+            box[:, axis] = whole_pixels(pos[:, axis])
+            cols = (box[:, 0] - half) // TILESIZE, (box[:, 0] + half - 1) // TILESIZE
+            rows = (box[:, 1] - half) // TILESIZE, (box[:, 1] + half - 1) // TILESIZE
+            # the four corner tiles in row-major order, one lookup for all of them
+            tiles = np.array([(col, row) for row in rows for col in cols])
+            solid = game.map.walls_at(tiles[:, 0], tiles[:, 1])
+            hit = solid.any(axis=0)
+            if not hit.any():
+                continue
+            wall = tiles[solid.argmax(axis=0), axis, np.arange(n)][hit] * TILESIZE
+            centre = box[hit, axis]
+            edge = np.where(wall + TILESIZE / 2 > centre, wall - half,
+                            np.where(wall + TILESIZE / 2 < centre, wall + TILESIZE + half, pos[hit, axis]))
+            pos[hit, axis] = edge
+            vel[hit, axis] = 0
+            box[hit, axis] = whole_pixels(edge)
+            blocked |= hit
+        rot[blocked] += self.rng.choice((-90, 90, 180), int(blocked.sum()))
+
+        for i in np.flatnonzero(self.health[:n] <= 0)[::-1].tolist():
+            self.mobs[i].die()
+        self.file()
+
+    def file(self):
+        # move the mobs whose rect crossed a cell border in the spatial hash; the rect is worked out from the
+        # unrotated image size, turned a quarter for the upright mobs and grown to the rotated box for the others
+        n = self.count
+        if n == 0:
+            return
+        width, height = self.game.mob_img.get_size()
+        angle = np.radians(self.rot[:n])
+        cos, sin = np.abs(np.cos(angle)), np.abs(np.sin(angle))
+        size = np.ceil(np.column_stack((width * cos + height * sin, width * sin + height * cos)) - 1e-9)
+        size = size.astype(np.int64)
+        left_top = self.box[:n] - size // 2
+        cell = self.game.grid.cell_size
+        span = np.column_stack((left_top // cell, np.maximum(left_top // cell, (left_top + size - 1) // cell)))
+        moved = np.flatnonzero((span != self.span[:n]).any(axis=1))
+        if len(moved) == 0:
+            return
+        self.span[moved] = span[moved]
+        grid = self.game.grid
+        for i, (x, y), (w, h) in zip(moved.tolist(), left_top[moved].tolist(), size[moved].tolist()):
+            grid.move(self.mobs[i], pg.Rect(x, y, w, h))
+
+    def _grow(self):
+        capacity = 2 * len(self.pos)
+        for name in ARRAYS:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], old.dtype) if old.dtype != object \
+                else np.empty(capacity, object)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+
+class BatchedMob(Mob):
+    # a Mob moved and steered by the level's MobBatch, drawn from its slot
+    batched = True
+    pos = batch_field('pos', vec)
+    vel = batch_field('vel', vec)
+    rot = batch_field('rot', float)
+    health = batch_field('health', float)
+    last_shot = batch_field('last_shot', int)
+    engaged = batch_field('engaged', bool)
+
+    def __init__(self, game, x, y):
+        self.batch = game.batch
+        self.reset_image = game.mob_img
+        super().__init__(game, x, y)
+        # Mob.__init__ took a rotated copy for reset_image and centred a copy of the hit_rect
+        self.reset_image = game.mob_img
+        self.batch.box[self.slot] = tuple(self.pos)
+
+    @property
+    def image(self):
+        if self.slot is None:
+            return self.__dict__['image']
+        return self.game.rotations.get(self.reset_image, self.batch.rot[self.slot])
+
+    @image.setter
+    def image(self, image):
+        # in the batch the image follows rot
+        self.__dict__['image'] = image
+
+    @property
+    def rect(self):
+        if self.slot is None:
+            return self.__dict__['rect']
+        rect = self.image.get_rect()
+        rect.center = self.batch.box[self.slot].tolist()
+        return rect
+
+    @rect.setter
+    def rect(self, rect):
+        self.__dict__['rect'] = rect
+
+    @property
+    def hit_rect(self):
+        if self.slot is None:
+            return self.__dict__['hit_rect']
+        rect = pg.Rect(0, 0, HIT_BOX, HIT_BOX)
+        rect.center = self.batch.box[self.slot].tolist()
+        return rect
+
+    @hit_rect.setter
+    def hit_rect(self, rect):
+        if self.slot is None:
+            self.__dict__['hit_rect'] = rect
+        else:
+            self.batch.box[self.slot] = rect.center
+
+    @property
+    def target(self):
+        return self.game.player
+
+    @target.setter
+    def target(self, target):
+        pass
+
+    @property
+    def target_dist(self):
+        return self.game.player.pos - self.pos
+
+    @target_dist.setter
+    def target_dist(self, target_dist):
+        pass
+
+    def die(self):
+        # out of the batch, the explosion plays on the sprite's own attributes
+        self.batch.remove(self)
+        self.dead = True
+        self.game.all_sprites.change_layer(self, EFFECT_LAYER)
+        explosion(self)
+        explode(self)
+
+    def update(self):
+        # moved by the batch, a dying one stands still and its explosion runs on the game's timers
+        pass
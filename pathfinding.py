@@ -0,0 +1,316 @@
+from array import array
+from collections import OrderedDict, deque
+from tilemap import *
+import heapq
+
+
+# neighbour order matches the old create_graph: right, left, down, up
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+OPPOSITE = (1, 0, 3, 2)
+# neighbour offsets for every 4-bit adjacency mask
+MASK_DIRECTIONS = [tuple(d for bit, d in enumerate(DIRECTIONS) if mask >> bit & 1) for mask in range(16)]
+
+
+class Obstacles:
+    # set-like view of the solid tiles of a nav grid
+    def __init__(self, nav):
+        self.nav = nav
+
+    def __contains__(self, tile):
+        return tile in self.nav and self.nav.solid[tile[1] * self.nav.width + tile[0]] == 1
+
+    def __iter__(self):
+        width = self.nav.width
+        return ((int(i) % width, int(i) // width) for i in np.flatnonzero(np.frombuffer(self.nav.solid, np.uint8)))
+
+    def __len__(self):
+        return self.nav.solid.count(1)
+
+
+class NavGrid:
+    def __init__(self, width, height, solid, mask=None):
+        self.width = width
+        self.height = height
+        # own copy of the wall layer, one byte per tile
+        self.solid = bytearray(solid)
+        self.obstacles = Obstacles(self)
+        # one byte per tile, bit i set when the neighbour in DIRECTIONS[i] is walkable
+        self.mask = adjacency_mask(width, height, solid) if mask is None else mask
+        # flat index offsets of the walkable neighbours for every mask
+        self.offsets = [tuple(dy * width + dx for dx, dy in directions) for directions in MASK_DIRECTIONS]
+        self.version = 0
+        # objects with a nav_changed(tile, blocked) method, told about every change
+        self.listeners = []
+
+    @classmethod
+    def from_map(cls, game_map):
+        mask = bytearray(game_map.nav_mask) if game_map.nav_mask is not None else None
+        return cls(game_map.tilewidth, game_map.tileheight, game_map.walls, mask)
+
+    def __contains__(self, tile):
+        return 0 <= tile[0] < self.width and 0 <= tile[1] < self.height
+
+    def __getitem__(self, tile):
+        x, y = tile
+        return [(x + dx, y + dy) for dx, dy in MASK_DIRECTIONS[self.mask[y * self.width + x]]]
+
+    def tiles(self):
+        return [(x, y) for y in range(self.height) for x in range(self.width)]
+
+    def remove_obstacle(self, tile):
+        if tile not in self.obstacles:
+            return False
+        self.solid[tile[1] * self.width + tile[0]] = 0
+        self._patch(tile, True)
+        return True
+
+    def add_obstacle(self, tile):
+        if tile not in self or tile in self.obstacles:
+            return False
+        self.solid[tile[1] * self.width + tile[0]] = 1
+        self._patch(tile, False)
+        return True
+
+    def _patch(self, tile, walkable):
+        # only the four neighbours see a different adjacency
+        x, y = tile
+        mask = self.mask
+        for bit, (dx, dy) in enumerate(DIRECTIONS):
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.width and 0 <= ny < self.height:
+                index = ny * self.width + nx
+                if walkable:
+                    mask[index] |= 1 << OPPOSITE[bit]
+                else:
+                    mask[index] &= ~(1 << OPPOSITE[bit]) & 0xF
+        self.version += 1
+        for listener in self.listeners:
+            listener.nav_changed(tile, not walkable)
+
+
+class PathCache:
+    def __init__(self, size=PATH_CACHE_SIZE, margin=PATH_CACHE_MARGIN):
+        self.size = size
+        # paths are kept when a wall opens further than this many tiles from their bounding box
+        self.margin = margin
+        self.paths = OrderedDict()
+        self.bounds = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        path = self.paths.get(key)
+        if path is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.paths.move_to_end(key)
+        return list(path)
+
+    def put(self, key, path):
+        self.paths[key] = tuple(path)
+        self.paths.move_to_end(key)
+        nodes = list(path) + [key[0], key[1]]
+        self.bounds[key] = (min(x for x, y in nodes), min(y for x, y in nodes),
+                            max(x for x, y in nodes), max(y for x, y in nodes))
+        if len(self.paths) > self.size:
+            old, _ = self.paths.popitem(last=False)
+            del self.bounds[old]
+
+    def clear(self):
+        self.paths.clear()
+        self.bounds.clear()
+
+    def nav_changed(self, tile, blocked):
+        # a new obstacle only breaks the paths through it; an opening can only shorten paths
+        # that pass close to it, but may connect the ends of an unreachable result anywhere
+        x, y = tile
+        margin = 0 if blocked else self.margin
+        stale = [key for key, (left, top, right, bottom) in self.bounds.items()
+                 if (left - margin <= x <= right + margin and top - margin <= y <= bottom + margin
+                     and (not blocked or tile in self.paths[key]))
+                 or (not blocked and not self.paths[key])]
+        for key in stale:
+            del self.paths[key]
+            del self.bounds[key]
+
+    def area_changed(self, left, top, right, bottom):
+        # step costs changed inside the rectangle: drop the paths whose bounding box overlaps it
+        stale = [key for key, (x0, y0, x1, y1) in self.bounds.items()
+                 if x0 <= right and left <= x1 and y0 <= bottom and top <= y1]
+        for key in stale:
+            del self.paths[key]
+            del self.bounds[key]
+
+
+class Pathfinder:
+    def __init__(self, graph, obstacles, heuristic, cache=None, danger=None):
+        self.graph = graph
+        self.obstacles = obstacles
+        self.heuristic = heuristic
+        self.cache = cache
+        # a DangerField whose mine danger is paid on top of every step
+        self.danger = danger
+
+    def search(self, start, end, max_size=100):
+        start = (int(start[0]), int(start[1]))
+        end = (int(end[0]), int(end[1]))
+        if start not in self.graph or end not in self.graph:
+            return []
+
+        key = (start, end, max_size)
+        if self.cache is not None:
+            path = self.cache.get(key)
+            if path is not None:
+                return path
+
+        path = self.astar(start, end, max_size)
+        if self.cache is not None:
+            self.cache.put(key, path)
+        return path
+
+    def astar(self, start, end, max_size):
+        # runs on flat tile indices straight off the nav grid's adjacency masks
+        nav = self.graph
+        width = nav.width
+        mask = nav.mask
+        offsets = nav.offsets
+        heuristic = self.heuristic
+        danger = self.danger.cost if self.danger is not None and self.danger.stamps else None
+        source = start[1] * width + start[0]
+        goal = end[1] * width + end[0]
+
+        # cost so far, steps taken and best parent per node; the path is only built once at the end
+        g_score = {source: 0}
+        depth = {source: 0}
+        parent = {source: -1}
+        closed = set()
+        # ties on f prefer the deeper node, which is usually closer to the goal
+        queue = [(heuristic(start, end), 0, source)]
+
+        while queue:
+            node = heapq.heappop(queue)[2]
+            if node in closed:
+                continue
+            closed.add(node)
+            cost = g_score[node]
+            steps = depth[node] + 1
+
+            # a path of max_size nodes is returned as is, like the old search did
+            if node == goal or steps >= max_size:
+                path = []
+                while node >= 0:
+                    path.append((node % width, node // width))
+                    node = parent[node]
+                path.reverse()
+                return path
+
+            for offset in offsets[mask[node]]:
+                neighbor = node + offset
+                if neighbor in closed:
+                    continue
+                step = cost + 1 if danger is None else cost + 1 + DANGER_COST * danger[neighbor]
+                if step < g_score.get(neighbor, step + 1):
+                    g_score[neighbor] = step
+                    depth[neighbor] = steps
+                    parent[neighbor] = node
+                    f = step + heuristic((neighbor % width, neighbor // width), end)
+                    heapq.heappush(queue, (f, -step, neighbor))
+
+        return []
+
+
+class FlowField:
+    def __init__(self, nav, interval=FLOW_REBUILD_MS):
+        self.nav = nav
+        # minimum time between two rebuilds while the target keeps moving
+        self.interval = interval
+        self.target = None
+        self.built_at = None
+        self.dirty = False
+        # per tile index: index of the next tile on a shortest path to the target, and the
+        # distance in steps, -1 where the target cannot be reached
+        self.next_step = array('i', [-1]) * (nav.width * nav.height)
+        self.distance = array('i', [-1]) * (nav.width * nav.height)
+
+    def update(self, target, now):
+        target = (int(target[0]), int(target[1]))
+        if target == self.target and not self.dirty:
+            return False
+        if self.built_at is not None and now - self.built_at < self.interval and not self.dirty:
+            return False
+        self.build(target)
+        self.built_at = now
+        return True
+
+    def build(self, target):
+        # breadth-first from the target; every tile points at the tile it was reached from
+        nav = self.nav
+        width = nav.width
+        self.target = target
+        self.dirty = False
+        next_step = self.next_step = array('i', [-1]) * (width * nav.height)
+        distance = self.distance = array('i', [-1]) * (width * nav.height)
+        if target not in nav or target in nav.obstacles:
+            return
+        start = target[1] * width + target[0]
+        distance[start] = 0
+        offsets = nav.offsets
+        mask = nav.mask
+        frontier = [start]
+        steps = 0
+        while frontier:
+            steps += 1
+            reached = []
+            for node in frontier:
+                for offset in offsets[mask[node]]:
+                    neighbor = node + offset
+                    if distance[neighbor] < 0:
+                        distance[neighbor] = steps
+                        next_step[neighbor] = node
+                        reached.append(neighbor)
+            frontier = reached
+
+    def step(self, tile):
+        x, y = int(tile[0]), int(tile[1])
+        if not (0 <= x < self.nav.width and 0 <= y < self.nav.height):
+            return None
+        node = self.next_step[y * self.nav.width + x]
+        if node < 0:
+            return None
+        return node % self.nav.width, node // self.nav.width
+
+    def invalidate(self):
+        self.dirty = True
+
+    def nav_changed(self, tile, blocked):
+        if blocked or self.target is None:
+            # distances can only grow, which a local repair cannot do cheaply
+            self.dirty = True
+            return
+        # an opening only shortens distances: relax outward from it
+        nav = self.nav
+        width = nav.width
+        distance, next_step, mask = self.distance, self.next_step, nav.mask
+        offsets = nav.offsets
+        node = tile[1] * width + tile[0]
+        for offset in offsets[mask[node]]:
+            neighbor = node + offset
+            if distance[neighbor] >= 0 and (distance[node] < 0 or distance[neighbor] + 1 < distance[node]):
+                distance[node] = distance[neighbor] + 1
+                next_step[node] = neighbor
+        queue = deque([node])
+        while queue:
+            node = queue.popleft()
+            if distance[node] < 0:
+                continue
+            for offset in offsets[mask[node]]:
+                neighbor = node + offset
+                if distance[neighbor] < 0 or distance[node] + 1 < distance[neighbor]:
+                    distance[neighbor] = distance[node] + 1
+                    next_step[neighbor] = node
+                    queue.append(neighbor)
+
+
+def manhattan_distance(node, target):
+    return abs(node[0] - target[0]) + abs(node[1] - target[1])
@@ -0,0 +1,237 @@
+import atexit
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from pathfinding import *
+
+# worker side: name of the shared grid in use -> segment, views on it, nav grid and mine costs
+attached = {}
+
+
+class SharedDanger:
+    # the mine costs of a DangerField as a worker sees them
+    def __init__(self, cost):
+        self.cost = cost
+        self.stamps = True
+
+
+def detach():
+    # let go of the shared grid in use, views before the segment
+    for shm, views, _, _ in attached.values():
+        for view in views:
+            view.release()
+        shm.close()
+    attached.clear()
+
+
+atexit.register(detach)
+
+
+def shared_grid(name, width, height):
+    grid = attached.get(name)
+    if grid is None:
+        detach()
+        shm = SharedMemory(name)
+        size = width * height
+        raw = shm.buf[:8 * size]
+        cost = raw.cast('d')
+        mask = shm.buf[8 * size:9 * size]
+        nav = NavGrid(width, height, bytes(size), mask)
+        grid = attached[name] = shm, (cost, raw, mask), nav, SharedDanger(cost)
+    return grid
+
+
+def search_shared(name, width, height, start, end, max_size, mined):
+    _, _, nav, danger = shared_grid(name, width, height)
+    finder = Pathfinder(nav, nav.obstacles, manhattan_distance, None, danger if mined else None)
+    return finder.search(start, end, max_size)
+
+
+def serve(conn):
+    # a worker: answer the requests coming down the pipe until it is closed. Everything waiting is read
+    # before searching, so only the latest request of each boss gets searched.
+    while True:
+        try:
+            jobs = {}
+            jobs.update([conn.recv()])
+            while conn.poll():
+                jobs.update([conn.recv()])
+        except EOFError:
+            break
+        if None in jobs:
+            break
+        for boss, (serial, job) in jobs.items():
+            try:
+                path = search_shared(*job)
+            except OSError:
+                # the grid was released and unlinked before this worker got to it, the request is stale
+                path = []
+            conn.send((serial, path))
+    detach()
+
+
+class PathPool:
+    # boss A* on worker processes. The workers map the level's adjacency masks and mine costs from shared
+    # memory, which follows the nav grid and the danger field as walls go and mines arm. A request is
+    # answered on a later tick; a boss asking again drops its earlier request. Each worker has a pipe of its
+    # own, written and polled from the game loop only, so nothing ever waits on a worker. A worker that goes
+    # away leaves its bosses to search in-process, on the boss's own path finder.
+    def __init__(self, workers=PATH_WORKERS):
+        context = get_context('spawn')
+        self.conns = []
+        self.workers = []
+        for _ in range(workers):
+            conn, child = context.Pipe()
+            worker = context.Process(target=serve, args=(child,), daemon=True)
+            worker.start()
+            child.close()
+            self.conns.append(conn)
+            self.workers.append(worker)
+        self.shm = None
+        self.views = ()
+        self.nav = None
+        self.danger = None
+        self.cache = None
+        # nav and danger changes so far, results searched on an older grid are not cached
+        self.changes = 0
+        # boss -> worker it is sent to
+        self.route = {}
+        # serial of the request -> boss, cache key, changes when asked; boss -> serial of its latest request
+        self.pending = {}
+        self.latest = {}
+        self.serial = 0
+        self.served = 0
+        self.dropped = 0
+
+    def attach(self, nav, danger, cache=None):
+        # share a new level's grid; the old one goes with the requests still out on it
+        self.release()
+        size = nav.width * nav.height
+        self.shm = SharedMemory(create=True, size=9 * size)
+        raw = self.shm.buf[:8 * size]
+        self.cost = raw.cast('d')
+        self.mask = self.shm.buf[8 * size:9 * size]
+        self.views = self.cost, raw, self.mask
+        self.mask[:] = nav.mask
+        self.cost[:] = danger.cost
+        self.nav, self.danger, self.cache = nav, danger, cache
+        nav.listeners.append(self)
+        danger.listeners.append(self)
+
+    def nav_changed(self, tile, blocked):
+        # the tile and its four neighbours have new adjacency masks
+        width = self.nav.width
+        x, y = tile
+        for dx, dy in ((0, 0),) + DIRECTIONS:
+            if 0 <= x + dx < width and 0 <= y + dy < self.nav.height:
+                index = (y + dy) * width + x + dx
+                self.mask[index] = self.nav.mask[index]
+        self.changes += 1
+
+    def area_changed(self, left, top, right, bottom):
+        width = self.nav.width
+        cost = self.danger.cost
+        for row in range(top, bottom + 1):
+            self.cost[row * width + left:row * width + right + 1] = cost[row * width + left:row * width + right + 1]
+        self.changes += 1
+
+    def request(self, boss, start, end, max_size=100):
+        start = (int(start[0]), int(start[1]))
+        end = (int(end[0]), int(end[1]))
+        old = self.latest.pop(boss, None)
+        if old is not None:
+            del self.pending[old]
+            self.dropped += 1
+        if start not in self.nav or end not in self.nav:
+            boss.path = []
+            return
+        key = (start, end, max_size)
+        if self.cache is not None:
+            path = self.cache.get(key)
+            if path is not None:
+                boss.path = path
+                return
+        worker = self.route.get(boss)
+        if worker is None or self.conns[worker] is None:
+            live = [index for index, conn in enumerate(self.conns) if conn is not None]
+            if not live:
+                boss.path = boss.path_finder.search(start, end, max_size)
+                return
+            worker = self.route[boss] = live[len(self.route) % len(live)]
+        self.serial += 1
+        try:
+            self.conns[worker].send((id(boss), (self.serial, (self.shm.name, self.nav.width, self.nav.height,
+                                                               start, end, max_size, bool(self.danger.stamps)))))
+        except OSError:
+            self.lost(worker)
+            boss.path = boss.path_finder.search(start, end, max_size)
+            return
+        self.pending[self.serial] = boss, key, self.changes
+        self.latest[boss] = self.serial
+
+    def update(self):
+        # hand out the paths that came back since the last tick
+        for worker, conn in enumerate(self.conns):
+            if conn is None:
+                continue
+            try:
+                while conn.poll():
+                    self.receive(*conn.recv())
+            except (EOFError, OSError):
+                self.lost(worker)
+        # bosses killed with no request out are answered by nothing, forget them here
+        for boss in [boss for boss in self.route if boss not in self.latest and not boss.alive()]:
+            del self.route[boss]
+
+    def receive(self, serial, path):
+        request = self.pending.pop(serial, None)
+        if request is None:
+            # dropped, or asked on a level since left
+            return
+        boss, key, changes = request
+        del self.latest[boss]
+        if self.cache is not None and changes == self.changes:
+            self.cache.put(key, path)
+        if boss.alive():
+            boss.path = path
+        else:
+            del self.route[boss]
+        self.served += 1
+
+    def lost(self, worker):
+        # the worker died or its pipe broke: its requests still out are searched here and now
+        self.conns[worker].close()
+        self.conns[worker] = None
+        for serial, (boss, key, _) in list(self.pending.items()):
+            if self.route.get(boss) != worker:
+                continue
+            del self.pending[serial]
+            del self.latest[boss]
+            if boss.alive():
+                boss.path = boss.path_finder.search(*key)
+        for boss in [boss for boss, routed in self.route.items() if routed == worker]:
+            del self.route[boss]
+
+    def release(self):
+        self.pending.clear()
+        self.latest.clear()
+        self.route.clear()
+        if self.shm is not None:
+            for view in self.views:
+                view.release()
+            self.views = ()
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def close(self):
+        self.release()
+        for conn in self.conns:
+            if conn is None:
+                continue
+            try:
+                conn.send((None, None))
+            except OSError:
+                pass
+            conn.close()
+        for worker in self.workers:
+            worker.join(1)
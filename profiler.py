@@ -0,0 +1,184 @@
+import csv
+import gc
+import json
+import tracemalloc
+import numpy as np
+from time import perf_counter
+from settings import *
+
+
+class FrameProfiler:
+    # milliseconds spent per section in each of the last frames, kept in ring buffers; while disabled
+    # every hook is a flag test and a plain call
+    unit = 'ms'
+    buckets = PROFILE_BUCKETS
+
+    def __init__(self, font_name=None, frames=PROFILE_FRAMES):
+        self.enabled = False
+        self.overlay = True
+        self.font_name = font_name
+        self.size = frames
+        # section -> amount (in unit) per frame, the slot of frame n is n % size
+        self.samples = {}
+        self.current = {}
+        self.frames = 0
+        self.panel = None
+
+    def reading(self):
+        # what a section is charged for is the difference of two readings
+        return perf_counter() * 1e3
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.current.clear()
+        self.panel = None
+
+    def call(self, name, function, *args):
+        if not self.enabled:
+            return function(*args)
+        start = self.reading()
+        result = function(*args)
+        self.add(name, self.reading() - start)
+        return result
+
+    def add(self, name, amount):
+        self.current[name] = self.current.get(name, 0.0) + amount
+
+    def update_sprites(self, group):
+        # group.update() with every sprite booked under its class
+        current = self.current
+        reading = self.reading
+        for sprite in group.sprites():
+            start = reading()
+            sprite.update()
+            name = type(sprite).__name__
+            current[name] = current.get(name, 0.0) + reading() - start
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        slot = self.frames % self.size
+        for name in self.current:
+            if name not in self.samples:
+                self.samples[name] = np.zeros(self.size)
+        for name, samples in self.samples.items():
+            samples[slot] = self.current.get(name, 0.0)
+        self.current.clear()
+        self.frames += 1
+
+    def window(self):
+        # recorded samples per section, oldest frame first
+        count = min(self.frames, self.size)
+        start = self.frames - count
+        slots = np.arange(start, self.frames) % self.size
+        return {name: samples[slots] for name, samples in self.samples.items()}
+
+    def stats(self):
+        stats = {}
+        for name, samples in self.window().items():
+            if len(samples):
+                counts, _ = np.histogram(samples, self.buckets)
+                stats[name] = {'mean': float(samples.mean()), 'median': float(np.median(samples)),
+                               'p99': float(np.percentile(samples, 99)), 'max': float(samples.max()),
+                               'histogram': counts.tolist()}
+        return stats
+
+    def export(self, filename):
+        # .csv: one row per frame, one column per section; anything else: summary and samples as JSON
+        window = self.window()
+        if filename.endswith('.csv'):
+            with open(filename, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(['frame'] + list(window))
+                first = self.frames - min(self.frames, self.size)
+                for row, values in enumerate(zip(*window.values())):
+                    writer.writerow([first + row] + [f'{value:.4f}' for value in values])
+        else:
+            stats = self.stats()
+            for name, samples in window.items():
+                stats[name]['samples'] = [round(value, 4) for value in samples.tolist()]
+            with open(filename, 'w') as file:
+                json.dump(self.summary(stats), file, indent=2)
+
+    def summary(self, stats):
+        return {'frames': self.frames, 'unit': self.unit, 'buckets': list(self.buckets), 'sections': stats}
+
+    def draw(self, screen):
+        # the overlay in the top right corner, re-rendered every few frames
+        if self.panel is None or self.frames % PROFILE_REFRESH == 0:
+            self.panel = self.render()
+        screen.blit(self.panel, (WIDTH - self.panel.get_width() - 10, 10))
+
+    def render(self):
+        font = pg.font.Font(self.font_name, 16)
+        lines = [f"{'section ' + self.unit:10s} {'mean':>6s} {'p99':>6s} {'max':>6s}"]
+        for name, stat in self.stats().items():
+            lines.append(f"{name:10s} {stat['mean']:6.2f} {stat['p99']:6.2f} {stat['max']:6.2f}")
+        height = font.get_linesize()
+        panel = pg.Surface((230, height * len(lines) + 10), pg.SRCALPHA)
+        panel.fill((0, 0, 0, 160))
+        for row, line in enumerate(lines):
+            for column, text in enumerate([line[:10]] + line[10:].split()):
+                surface = font.render(text, True, WHITE)
+                x = 5 if column == 0 else 80 + 50 * column - surface.get_width()
+                panel.blit(surface, (x, 5 + row * height))
+        return panel
+
+
+class AllocationProfiler(FrameProfiler):
+    # kilobytes a section leaves allocated, per frame, through tracemalloc; besides the sections every
+    # frame records its net growth (tick), how far memory peaked above the frame start (peak) and the
+    # garbage collections it triggered (gc, a count)
+    unit = 'KB'
+    buckets = ALLOC_BUCKETS
+
+    def __init__(self, font_name=None, frames=PROFILE_FRAMES):
+        super().__init__(font_name, frames)
+        self.baseline = None
+        self.frame_start = 0
+        self.collections = 0
+
+    def reading(self):
+        return tracemalloc.get_traced_memory()[0] / 1024
+
+    def collected(self, phase, info):
+        if phase == 'start':
+            self.collections += 1
+
+    def toggle(self):
+        super().toggle()
+        if self.enabled:
+            tracemalloc.start(ALLOC_TRACEBACK)
+            gc.callbacks.append(self.collected)
+            self.baseline = tracemalloc.take_snapshot()
+            self.frame_start = self.reading()
+            tracemalloc.reset_peak()
+        else:
+            gc.callbacks.remove(self.collected)
+            tracemalloc.stop()
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        self.add('tick', current / 1024 - self.frame_start)
+        self.add('peak', (peak - current) / 1024)
+        self.add('gc', self.collections)
+        self.collections = 0
+        super().end_frame()
+        self.frame_start = self.reading()
+        tracemalloc.reset_peak()
+
+    def sites(self, limit=ALLOC_SITES):
+        # source lines holding the most memory allocated since profiling started
+        if not self.enabled:
+            return []
+        ignore = [tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, '<frozen importlib._bootstrap*>')]
+        stats = tracemalloc.take_snapshot().filter_traces(ignore).compare_to(self.baseline, 'lineno')
+        return [{'site': str(stat.traceback[0]), 'KB': stat.size_diff / 1024, 'blocks': stat.count_diff}
+                for stat in stats[:limit]]
+
+    def summary(self, stats):
+        summary = super().summary(stats)
+        summary['sites'] = self.sites()
+        return summary
@@ -0,0 +1,220 @@
+from collections import OrderedDict
+from math import ceil
+from tilemap import *
+
+
+class MapLayer:
+    # the wall layer pre-rendered into chunk surfaces, repainted only where walls are destroyed
+    def __init__(self, game_map, chunk_size=LAYER_CHUNK, cache_size=LAYER_CACHE):
+        self.map = game_map
+        self.span = chunk_size * TILESIZE
+        self.cache_size = cache_size
+        # rendered chunks, least recently drawn first
+        self.surfaces = OrderedDict()
+
+    def surface(self, cx, cy):
+        key = (cx, cy)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            rect = pg.Rect(cx * self.span, cy * self.span, self.span, self.span)
+            rect = rect.clip(pg.Rect(0, 0, self.map.width, self.map.height))
+            surface = pg.Surface(rect.size).convert()
+            surface.fill(BGCOLOR)
+            for wall in self.map.wall_rects(rect):
+                surface.fill(BLACK, wall.move(-rect.x, -rect.y))
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.cache_size:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+    def draw(self, screen, camera, areas=None):
+        # the whole view, or only the given screen areas, in one blits call
+        x, y = camera.camera.topleft
+        bounds = pg.Rect(0, 0, self.map.width, self.map.height)
+        span = self.span
+        blits = []
+        if areas is None:
+            areas = [pg.Rect(0, 0, WIDTH, HEIGHT)]
+        for area in areas:
+            view = area.move(-x, -y).clip(bounds)
+            for cy in range(view.top // span, (view.bottom - 1) // span + 1):
+                for cx in range(view.left // span, (view.right - 1) // span + 1):
+                    part = view.clip(cx * span, cy * span, span, span)
+                    blits.append((self.surface(cx, cy), (part.x + x, part.y + y),
+                                  part.move(-cx * span, -cy * span)))
+        screen.blits(blits, False)
+
+    def walls_removed(self, tiles):
+        span = self.span
+        for col, row in tiles:
+            x, y = col * TILESIZE, row * TILESIZE
+            surface = self.surfaces.get((x // span, y // span))
+            if surface is not None:
+                surface.fill(BGCOLOR, (x % span, y % span, TILESIZE, TILESIZE))
+
+
+class RotationCache:
+    # rotated copies of sprite images: the snapped angles are rendered up front, free-aim angles
+    # are quantized to step degrees and kept in an LRU
+    def __init__(self, step=ROTATION_STEP, cache_size=ROTATION_CACHE):
+        self.step = step
+        self.cache_size = cache_size
+        self.fixed = {}
+        self.recent = OrderedDict()
+        self.misses = 0
+
+    def quantize(self, angle):
+        return round(angle / self.step) * self.step % 360
+
+    def add(self, image, angles=range(0, 360, 45)):
+        for angle in angles:
+            angle = self.quantize(angle)
+            self.fixed[(image, angle)] = pg.transform.rotate(image, angle)
+
+    def get(self, image, angle):
+        key = (image, self.quantize(angle))
+        rotated = self.fixed.get(key)
+        if rotated is not None:
+            return rotated
+        rotated = self.recent.get(key)
+        if rotated is None:
+            rotated = self.recent[key] = pg.transform.rotate(image, key[1])
+            self.misses += 1
+            if len(self.recent) > self.cache_size:
+                self.recent.popitem(last=False)
+        else:
+            self.recent.move_to_end(key)
+        return rotated
+
+
+class DirtyRenderer:
+    # presents only the screen cells touched by something that changed since the last frame;
+    # a scrolled camera or a change covering most of the screen asks for a full redraw instead
+    def __init__(self, game, cell=DIRTY_CELL, max_coverage=DIRTY_MAX):
+        self.game = game
+        self.cell = cell
+        self.max_coverage = max_coverage
+        self.cells = np.zeros((ceil(HEIGHT / cell), ceil(WIDTH / cell)), bool)
+        # what the screen shows: camera offset (None until a full frame is presented),
+        # sprite -> (area, image, health), bullet areas and the player health in the HUD
+        self.offset = None
+        self.drawn = {}
+        self.bullets = None
+        self.health = None
+
+    def mark(self, rect):
+        rect = rect.clip(0, 0, WIDTH, HEIGHT)
+        if rect.width and rect.height:
+            cell = self.cell
+            self.cells[rect.top // cell:(rect.bottom - 1) // cell + 1,
+                       rect.left // cell:(rect.right - 1) // cell + 1] = True
+
+    def mark_small(self, left, top, right, bottom):
+        # arrays of areas no bigger than a cell, so their corners cover every cell they touch
+        on_screen = (right > 0) & (left < WIDTH) & (bottom > 0) & (top < HEIGHT)
+        cell = self.cell
+        left = np.clip(left[on_screen], 0, WIDTH - 1) // cell
+        top = np.clip(top[on_screen], 0, HEIGHT - 1) // cell
+        right = np.clip(right[on_screen] - 1, 0, WIDTH - 1) // cell
+        bottom = np.clip(bottom[on_screen] - 1, 0, HEIGHT - 1) // cell
+        for rows in (top, bottom):
+            for cols in (left, right):
+                self.cells[rows, cols] = True
+
+    def touches(self, rect):
+        rect = rect.clip(0, 0, WIDTH, HEIGHT)
+        if not (rect.width and rect.height):
+            return False
+        cell = self.cell
+        return self.cells[rect.top // cell:(rect.bottom - 1) // cell + 1,
+                          rect.left // cell:(rect.right - 1) // cell + 1].any()
+
+    def rects(self):
+        # marked cells merged into runs along each row, and runs spanning the same columns
+        # on consecutive rows merged into one rect
+        cell = self.cell
+        edges = np.diff(np.pad(self.cells.view(np.int8), ((0, 0), (1, 1))), axis=1)
+        starts = np.argwhere(edges == 1).tolist()
+        ends = np.argwhere(edges == -1)[:, 1].tolist()
+        rects = []
+        below = {}
+        for (row, start), end in zip(starts, ends):
+            rect = below.get((start, end))
+            if rect is not None and rect.bottom == row * cell:
+                rect.height += cell
+            else:
+                rect = below[(start, end)] = pg.Rect(start * cell, row * cell, (end - start) * cell, cell)
+                rects.append(rect)
+        return rects
+
+    def snapshot(self):
+        game = self.game
+        drawn = {}
+        x, y = game.camera.camera.topleft
+        for sprite in game.visible_sprites():
+            area = pg.Rect(sprite.rect.x + x, sprite.rect.y + y, *sprite.image.get_size())
+            drawn[sprite] = (area, sprite.image, getattr(sprite, 'health', None))
+        return drawn
+
+    def present(self):
+        # after a full redraw: remember what is on screen and flip
+        game = self.game
+        self.offset = game.camera.camera.topleft
+        self.drawn = self.snapshot()
+        self.bullets = game.bullets.screen_rects(self.offset)
+        self.health = game.player.health
+        self.cells[:] = False
+        pg.display.flip()
+
+    def update(self):
+        # redraw and present the changed areas, False when the frame needs a full redraw
+        game = self.game
+        offset = game.camera.camera.topleft
+        if offset != self.offset:
+            return False
+
+        drawn = self.snapshot()
+        for sprite, state in drawn.items():
+            old = self.drawn.pop(sprite, None)
+            if old != state:
+                self.mark(state[0])
+                if old:
+                    self.mark(old[0])
+        for old in self.drawn.values():
+            self.mark(old[0])
+        bullets = game.bullets.screen_rects(offset)
+        self.mark_small(*self.bullets)
+        self.mark_small(*bullets)
+        if game.player.health != self.health:
+            self.mark(game.hud_rect)
+
+        # sprites overlapping a marked cell are drawn whole, so none is blended over itself
+        redraw = set()
+        grown = True
+        while grown:
+            grown = False
+            for sprite, state in drawn.items():
+                if sprite not in redraw and self.touches(state[0]):
+                    redraw.add(sprite)
+                    self.mark(state[0])
+                    grown = True
+        if self.cells.mean() > self.max_coverage:
+            return False
+
+        rects = self.rects()
+        screen = game.screen
+        if game.map.width < WIDTH or game.map.height < HEIGHT:
+            for rect in rects:
+                screen.fill(BGCOLOR, rect)
+        game.layer.draw(screen, game.camera, rects)
+        game.draw_sprites([sprite for sprite in drawn if sprite in redraw])
+        game.draw_hud()
+        pg.display.update(rects)
+
+        self.drawn = drawn
+        self.bullets = bullets
+        self.health = game.player.health
+        self.cells[:] = False
+        return True
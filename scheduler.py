@@ -0,0 +1,129 @@
+from collections import deque
+from time import perf_counter
+from settings import *
+
+# next think of a mob that came due and waits on the budget
+QUEUED = -1
+
+
+class MobGroup(pg.sprite.Group):
+    # the mobs group, telling the AI scheduler, or the mob batch for batched mobs, about every mob that joins
+    # or leaves it
+    def __init__(self, scheduler, batch=None):
+        super().__init__()
+        self.scheduler = scheduler
+        self.batch = batch
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        (self.batch if sprite.batched else self.scheduler).add(sprite)
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        (self.batch if sprite.batched else self.scheduler).remove(sprite)
+
+
+class AIScheduler:
+    # decides which mobs think (look for the player, shoot, pick a heading) on a tick: on screen or close
+    # to the player every tick, further away every few ticks, each mob in a fixed slot so every tick gets an
+    # even share. Thinks and boss path searches over the budget, or past the limit on thinks off screen, wait
+    # for the next tick, oldest first; mobs on screen are never held back. Movement is not scheduled, every
+    # mob moves every tick.
+    def __init__(self, game, budget=AI_BUDGET_MS, tiers=AI_TIERS, limit=AI_THINKS):
+        self.game = game
+        # milliseconds per tick, None for no limit
+        self.budget = budget
+        # thinks of mobs off screen per tick, None for no limit; unlike the budget it holds headless too
+        self.limit = limit
+        self.tiers = tiers
+        # mob -> tick of its next think (or QUEUED), tick of its last think, slot
+        self.next = {}
+        self.last = {}
+        self.phase = {}
+        self.serial = 0
+        # tick -> mobs to think on it
+        self.wake = {}
+        self.queue = deque()
+        self.replans = deque()
+        self.planning = set()
+        self.view = None
+        # updates run so far
+        self.tick = 0
+        # thinks run and mobs left waiting by the last update
+        self.thinks = 0
+        self.held = 0
+
+    def add(self, mob):
+        # a mob thinks on the next update
+        tick = self.tick + 1
+        self.phase[mob] = self.serial
+        self.serial += 1
+        self.next[mob] = tick
+        self.wake.setdefault(tick, []).append(mob)
+
+    def remove(self, mob):
+        # entries left in wake and the queue are skipped once next no longer points at them
+        self.next.pop(mob, None)
+        self.last.pop(mob, None)
+        self.phase.pop(mob, None)
+
+    def replan(self, boss):
+        if boss not in self.planning:
+            self.planning.add(boss)
+            self.replans.append(boss)
+
+    def interval(self, mob):
+        if self.view.collidepoint(mob.pos):
+            return 1
+        distance = (mob.pos - self.game.player.pos).length_squared()
+        for reach, interval in self.tiers:
+            if reach is None or distance < reach * reach:
+                return interval
+        return self.tiers[-1][1]
+
+    def think(self, mob, tick):
+        last = self.last.get(mob)
+        mob.think(1 if last is None else tick - last)
+        self.last[mob] = tick
+        self.thinks += 1
+        if mob not in self.next:
+            # killed while thinking
+            return
+        interval = self.interval(mob)
+        slot = tick + interval - (tick + self.phase[mob]) % interval
+        self.next[mob] = slot
+        self.wake.setdefault(slot, []).append(mob)
+
+    def update(self):
+        start = perf_counter()
+        self.tick += 1
+        tick = self.tick
+        self.view = self.game.camera.view()
+        self.thinks = 0
+        nexts = self.next
+        for mob in self.wake.pop(tick, ()):
+            if nexts.get(mob) != tick:
+                continue
+            if self.view.collidepoint(mob.pos):
+                self.think(mob, tick)
+            else:
+                nexts[mob] = QUEUED
+                self.queue.append(mob)
+
+        queue, budget, limit = self.queue, self.budget, self.limit
+        queued = 0
+        while queue and (limit is None or queued < limit) and \
+                (budget is None or (perf_counter() - start) * 1e3 < budget):
+            mob = queue.popleft()
+            if nexts.get(mob) == QUEUED:
+                self.think(mob, tick)
+                queued += 1
+        self.held = len(queue)
+
+        searches = 0
+        while self.replans and searches < AI_REPLANS and (budget is None or (perf_counter() - start) * 1e3 < budget):
+            boss = self.replans.popleft()
+            self.planning.discard(boss)
+            if boss.alive():
+                boss.find_path()
+                searches += 1
@@ -25,6 +25,7 @@ BGCOLOR = WHITE
 TILESIZE = 32
 GRIDWIDTH = WIDTH / TILESIZE
 GRIDHEIGHT = HEIGHT / TILESIZE
+SPATIAL_CELL = 2 * TILESIZE
 
 # Player Settings
 PLAYER_SPEED = 500
@@ -33,14 +34,78 @@ PLAYER_HEALTH = 10
 
 # Mob settings
 DETECT_RADIUS = 250
+PRECOMPUTE_VISIBILITY = False  # per-tile sets of surely seen tiles in front of the exact line-of-sight walk
 MOB_SPEED = 300
 MOB_HEALTH = 10
+MOB_BATCH = False  # plain mobs as NumPy arrays stepped all at once, for levels with thousands of them
 
 # shoot settings
 BARREL_OFFSET = vec(35, 0)
 BULLET_SPEED = 1500
 BULLET_DAMAGE = 1
+BULLET_LIFETIME = 2000
 RATE = 150
 
+# AI scheduler settings: mobs on screen think every tick, the others every few ticks by distance to the player
+AI_LOD = True
+AI_TIERS = ((DETECT_RADIUS, 1), (1500, 4), (None, 16))  # (distance from the player or None, think every n ticks)
+AI_BUDGET_MS = 4  # thinking past this many milliseconds a tick waits for the next tick, not used headless
+AI_THINKS = 64  # thinks of mobs off screen per tick, the rest wait for the next tick; None for no limit
+AI_REPLANS = 2  # boss path searches per tick at most
+
+# Boss settings
+PATH_CACHE_SIZE = 256
+PATH_CACHE_MARGIN = 4
+# 'astar': every boss plans its own path, 'flow': shared flow field, 'hpa': hierarchical A* for big maps
+BOSS_NAVIGATION = 'astar'
+FLOW_REBUILD_MS = 100
+HPA_CLUSTER_SIZE = 16
+HPA_SPLIT = 6
+ASYNC_PATHS = True  # 'astar' bosses search on PATH_WORKERS worker processes, not used headless
+PATH_WORKERS = 2
+
 # Mine settings
 BLAST_RADIUS = 125
+
+# Danger field settings, in danger per tile: an armed mine peaks at DANGER_MINE under itself and falls off
+# like its blast, walls push with DANGER_WALL / distance ** 2 out to DANGER_WALL_REACH tiles
+DANGER_MINE = 1.0
+DANGER_WALL = 0.1
+DANGER_WALL_REACH = 2
+DANGER_COST = 2  # extra A* step cost per unit of mine danger
+DANGER_PULL = 0.3  # how hard a boss dodging a mine is pulled towards its path
+DANGER_PRUNE = DANGER_MINE * (1 - 0.75 ** 2)  # path tiles this deep in a blast are skipped while dodging
+
+# World settings
+WORLD_FILE = None  # a .world file made with world.py, streamed instead of the levels
+CHUNK_SIZE = 64
+CHUNK_CACHE = 64
+ACTIVE_CHUNKS = 2  # mobs further than this many chunks from the player sleep
+WORLD_PATH_MARGIN = 16
+
+# Render settings
+LAYER_CHUNK = 16  # tiles per side of a pre-rendered wall surface
+LAYER_CACHE = 24
+ROTATION_STEP = 5  # degrees between cached rotations of a sprite image
+ROTATION_CACHE = 256  # free-aim rotations kept besides the multiples of 45 degrees
+DIRTY_RECTS = False  # present only the changed parts of the screen while the camera stands still
+DIRTY_CELL = 32
+DIRTY_MAX = 0.5  # fraction of the screen changed above which the whole frame is redrawn
+# draw layers above the wall layer, the bullet pool is drawn between units and effects
+MINE_LAYER = 1
+UNIT_LAYER = 2
+BULLET_LAYER = 3
+EFFECT_LAYER = 4
+DRAW_MARGIN = 2 * BLAST_RADIUS  # how far an exploding mob's image reaches right of and below its 1x1 rect
+
+# Timer settings
+TIMER_BITS = (10, 8, 6, 6)  # slots per timer wheel as powers of two, 1 ms each on the first
+
+# Profiler settings
+PROFILE_FRAMES = 300  # frames kept per section
+PROFILE_REFRESH = 15  # frames between overlay refreshes
+PROFILE_BUCKETS = (0, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 33, 1000)  # histogram edges in ms
+PROFILE_FILE = 'profile.json'  # written by the o key while profiling, a .csv name gives one row per frame
+ALLOC_BUCKETS = (0, 1, 4, 16, 64, 256, 1024, 1 << 20)  # histogram edges in KB for the allocation profiler
+ALLOC_TRACEBACK = 1  # frames kept per allocation, more makes the m key slower
+ALLOC_SITES = 10
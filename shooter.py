@@ -1,6 +1,21 @@
+import os
+from itertools import groupby
+from operator import attrgetter
 from os import path
+from random import Random
 from sprites import *
 from tilemap import *
+from spatial import *
+from bullets import *
+from visibility import *
+from render import *
+from simulation import *
+from profiler import *
+from danger import *
+from scheduler import *
+from pathpool import *
+from mobbatch import *
+from timers import *
 
 
 def draw_player_health(surf, x, y, pct):
@@ -23,17 +38,30 @@ def draw_player_health(surf, x, y, pct):
 
 class Game:
 
-    def __init__(self):
-        # initialize game window
+    def __init__(self, headless=False, seed=None, clock=None, controls=None, max_ticks=None):
+        # initialize game window, a headless game simulates fixed steps on the dummy drivers and never draws
+        self.headless = headless
+        if headless:
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            os.environ['SDL_AUDIODRIVER'] = 'dummy'
         pg.init()
         pg.mixer.init()
         self.screen = pg.display.set_mode((WIDTH, HEIGHT))
         pg.display.set_caption(TITLE)
-        self.clock = pg.time.Clock()
+        self.clock = clock or (SimClock() if headless else WallClock())
+        self.rng = Random(seed)
+        self.controls = controls or (idle_controls if headless else live_controls)
+        self.max_ticks = max_ticks
+        self.ticks = 0
         self.running = True
-        self.maps = []
+        self.maps = {}
+        self.map = None
         self.level = 0#randrange(0, 7)
         self.font_name = pg.font.match_font(FONT)
+        self.profiler = FrameProfiler(self.font_name)
+        # worker processes for boss searches, started with the first level that uses them
+        self.path_pool = None
+        self.hud_rect = pg.Rect(10, 10, 100, 20)
         self.load_data()
 
     def load_data(self):
@@ -42,9 +70,9 @@ class Game:
         img_dir = path.join(game_dir, 'img')
         map_dir = path.join(game_dir, 'levels')
 
-        # Load map levels
-        for level in range(7):
-            self.maps.append(Map(path.join(map_dir, f"level{level+1}.png")))
+        # map levels are loaded when first entered
+        self.map_files = [path.join(map_dir, f"level{level+1}.png") for level in range(7)]
+        self.world_file = path.join(game_dir, WORLD_FILE) if WORLD_FILE else None
 
         # Load imgs
         self.player_img = pg.image.load(path.join(img_dir, 'player.png')).convert_alpha()
@@ -56,6 +84,10 @@ class Game:
         self.boss_img = pg.image.load(path.join(img_dir, 'boss.png')).convert_alpha()
         self.boss_img = pg.transform.scale(self.boss_img, (30, 15))
 
+        self.rotations = RotationCache()
+        for image in (self.player_img, self.mob_img, self.boss_img):
+            self.rotations.add(image)
+
         self.bullet_imgs = {}
 
         self.green_surface = pg.Surface((6, 6), pg.SRCALPHA)
@@ -97,29 +129,61 @@ class Game:
     def new(self):
         # initiate sprite groups
         self.all_sprites = pg.sprite.LayeredUpdates()
-        self.walls = pg.sprite.Group()
-        self.bullets = pg.sprite.Group()
-        self.mobs = pg.sprite.Group()
+        self.timers = TimerWheel(self.clock.get_ticks())
+        self.bullets = BulletPool(self)
+        self.ai = AIScheduler(self, None if self.headless else AI_BUDGET_MS, AI_TIERS if AI_LOD else ((None, 1),))
+        self.batch = MobBatch(self) if MOB_BATCH else None
+        self.mobs = MobGroup(self.ai, self.batch)
         self.mines = pg.sprite.Group()
+        self.grid = SpatialHash()
 
         self.draw_rects = False
-        self.map = self.maps[self.level]
-
-        # setup graph for boss mobs
-        self.graph, self.obstacles = create_graph(self.map.data)
-
-        # create map from map_data
-        for row in range(self.map.data.height):
-            for col in range(self.map.data.width):
-                pixel = self.map.data.getpixel((col, row))
-                if pixel == BLACK:
-                    self.wall = Wall(self, col, row)
-                elif pixel == GREY:
-                    self.player = Player(self, col, row)
-                elif pixel == RED:
-                    self.mob = Mob(self, col, row)
-                elif pixel == PURPLE:
-                    self.boss = Boss(self, col, row)
+        if self.world_file:
+            # the world is read afresh, its chunks were edited and its sprites spawned by the last game
+            if self.map is not None:
+                self.map.close()
+            self.map = World(self.world_file)
+        else:
+            if self.level not in self.maps:
+                self.maps[self.level] = Map(self.map_files[self.level])
+            self.map = self.maps[self.level]
+        streaming = isinstance(self.map, World)
+        self.visibility = VisibilityMap(self.map) if PRECOMPUTE_VISIBILITY and not streaming else None
+        self.sight = self.visibility or self.map
+        self.layer = MapLayer(self.map)
+        self.renderer = DirtyRenderer(self) if DIRTY_RECTS else None
+
+        # setup navigation for boss mobs, streamed worlds plan on the tiles around each boss instead
+        self.nav = None
+        self.flow_field = None
+        self.hierarchy = None
+        self.danger = None
+        if not streaming:
+            self.nav = NavGrid.from_map(self.map)
+            self.path_cache = PathCache()
+            self.flow_field = FlowField(self.nav) if BOSS_NAVIGATION == 'flow' else None
+            self.hierarchy = HierarchicalPathfinder(self.nav, manhattan_distance, self.path_cache) \
+                if BOSS_NAVIGATION == 'hpa' else None
+            self.nav.listeners.append(self.path_cache)
+            if self.flow_field:
+                self.nav.listeners.append(self.flow_field)
+            self.danger = DangerField(self.map, self.path_cache)
+            self.nav.listeners.append(self.danger)
+        self.paths = None
+        if self.nav is not None and BOSS_NAVIGATION == 'astar' and ASYNC_PATHS and not self.headless:
+            if self.path_pool is None:
+                self.path_pool = PathPool()
+            self.path_pool.attach(self.nav, self.danger, self.path_cache)
+            self.paths = self.path_pool
+
+        # spawn sprites from the level pack
+        for kind, col, row in self.map.spawns:
+            self.spawn(kind, col, row)
+        self.streamer = ChunkStreamer(self) if streaming else None
+        if self.streamer:
+            self.streamer.update()
+
+        self.grid.sync(self.all_sprites)
 
         #set player health based on amount of enemies
         self.player.health = len(self.mobs) * PLAYER_HEALTH
@@ -128,15 +192,31 @@ class Game:
         self.camera = Camera(self.map.width, self.map.height)
         self.run()
 
+    def spawn(self, kind, col, row):
+        if kind == PLAYER_SPAWN:
+            self.player = Player(self, col, row)
+        elif kind == MOB_SPAWN:
+            self.mob = (Mob if self.batch is None else BatchedMob)(self, col, row)
+        elif kind == BOSS_SPAWN:
+            self.boss = Boss(self, col, row)
+
     def run(self):
         # game loop
         self.playing = True
         while self.playing:
-            self.clock.tick(FPS)
             self.dt = self.clock.tick(FPS) / 1000
-            self.events()
-            self.update()
-            self.draw()
+            profiler = self.profiler
+            profiler.call('events', self.events)
+            if not self.playing:
+                break
+            profiler.call('update', self.update)
+            self.ticks += 1
+            if self.ticks == self.max_ticks:
+                self.playing = False
+                self.running = False
+            if not self.headless:
+                profiler.call('draw', self.draw)
+            profiler.end_frame()
 
     def events(self):
         # game loop events
@@ -152,47 +232,96 @@ class Game:
                     self.running = False
                 if event.key == pg.K_h:
                     self.draw_rects = not self.draw_rects
+                if event.key == pg.K_p:
+                    self.toggle_profiler(FrameProfiler)
+                if event.key == pg.K_m:
+                    self.toggle_profiler(AllocationProfiler)
+                if event.key == pg.K_o and self.profiler.enabled:
+                    self.profiler.export(path.join(path.dirname(__file__), PROFILE_FILE))
 
         # bullet hits
-        hits = pg.sprite.groupcollide(self.mobs, self.bullets, False, True, collide_hit_rect)
-        for hit in hits:
-            hit.health -= BULLET_DAMAGE * len(hits[hit])
+        mobs = list(self.mobs) if self.batch is None else [mob for mob in self.mobs if mob.slot is None]
+        for mob, hits in zip(mobs, self.bullets.collide(mobs)):
+            mob.health -= BULLET_DAMAGE * int(hits)
+        if self.batch is not None:
+            self.batch.collide(self.bullets)
 
-        hits = pg.sprite.spritecollide(self.player, self.bullets, True, collide_hit_rect)
-        for hit in hits:
-            self.player.health -= BULLET_DAMAGE
+        hits = self.bullets.collide([self.player])
+        self.player.health -= BULLET_DAMAGE * int(hits[0])
 
-        if len(self.mobs) == 0:
+        if len(self.mobs) == 0 and (self.streamer is None or self.streamer.cleared()):
             self.playing = False
             self.level += 1
-            self.new()
+            # a world is the only level there is, clearing it ends the game
+            if self.streamer:
+                self.running = False
 
         if self.player not in self.all_sprites:
             self.playing = False
             self.running = False
 
+    def toggle_profiler(self, kind):
+        # p profiles time and m allocations, one at a time; the same key again stops profiling
+        profiler = self.profiler
+        if profiler.enabled:
+            profiler.toggle()
+            if type(profiler) is kind:
+                return
+        if type(profiler) is not kind:
+            self.profiler = kind(self.font_name)
+        self.profiler.toggle()
+
+    def destroy_walls(self, tiles):
+        tiles = [(col, row) for col, row in tiles if self.map.remove_wall(col, row)]
+        if self.nav is not None:
+            for tile in tiles:
+                self.nav.remove_obstacle(tile)
+        if self.visibility:
+            self.visibility.walls_removed(tiles)
+        self.layer.walls_removed(tiles)
+        if self.renderer:
+            for col, row in tiles:
+                self.renderer.mark(self.camera.apply_rect(pg.Rect(col * TILESIZE, row * TILESIZE, TILESIZE, TILESIZE)))
+
     def update(self):
         # game loop update
         self.player_pos = self.camera.apply(self.player)
         self.offset = self.player_pos.center
-        self.all_sprites.update()
+        if self.streamer:
+            self.streamer.update()
+        if self.flow_field:
+            self.flow_field.update(self.player.pos // TILESIZE, self.clock.get_ticks())
+        if self.paths:
+            self.paths.update()
+        self.profiler.call('AI', self.ai.update)
+        if self.batch is not None:
+            self.profiler.call('MobBatch', self.batch.update)
+        self.profiler.call('Timers', self.timers.update, self.clock.get_ticks())
+        if self.profiler.enabled:
+            self.profiler.update_sprites(self.all_sprites)
+        else:
+            self.all_sprites.update()
+        self.profiler.call('Bullet', self.bullets.update)
+        self.grid.sync(self.all_sprites, () if self.batch is None else self.batch.filed)
         self.camera.update(self.player)
 
     def draw(self):
         # pg.display.set_caption("{:.2f}".format(self.offset.length()))
         # game loop draw
-        self.screen.fill(BGCOLOR)
-        for sprite in self.all_sprites:
-            if isinstance(sprite, Mob):
-                sprite.draw_health()
-            self.screen.blit(sprite.image, self.camera.apply(sprite))
+        if self.renderer and not self.draw_rects and not self.profiler.enabled and self.renderer.update():
+            return
+
+        # the wall layer is opaque, only maps smaller than the screen leave a border to clear
+        if self.map.width < WIDTH or self.map.height < HEIGHT:
+            self.screen.fill(BGCOLOR)
+        self.layer.draw(self.screen, self.camera)
+        self.draw_sprites(self.visible_sprites())
 
         if self.draw_rects:
             pg.draw.rect(self.screen, DARKGREY, self.camera.apply_rect(self.player.rect), 2)
             pg.draw.rect(self.screen, GREY, self.camera.apply_rect(self.player.hit_rect), 2)
 
-            camera_offset = self.camera.apply(list(self.walls)[0]).center
-            camera_offset -= vec(TILESIZE //2, TILESIZE // 2)
+            camera_offset = vec(self.camera.camera.topleft)
 
 
             
@@ -200,12 +329,13 @@ class Game:
                 pg.draw.rect(self.screen, RED, self.camera.apply_rect(mob.hit_rect), 2)
                 pg.draw.circle(self.screen, BLUE, self.camera.apply(mob).center, DETECT_RADIUS, 2)
 
-                for wall in mob.close_walls:
-                    for pair in wall.diagonals:
-                        pg.draw.line(self.screen, GREEN, pair[0] + camera_offset, pair[1] + camera_offset)
+                for col, row in mob.sight_cells:
+                    cell = pg.Rect(col * TILESIZE, row * TILESIZE, TILESIZE, TILESIZE)
+                    pg.draw.rect(self.screen, GREEN, self.camera.apply_rect(cell), 1)
 
 
-                if mob.target_dist.length() < DETECT_RADIUS:
+                # a mob the AI scheduler has not got to yet has no target
+                if mob.target is not None and mob.target_dist.length() < DETECT_RADIUS:
                     pg.draw.line(self.screen, YELLOW, self.camera.apply(mob).center,
                                  self.camera.apply(mob.target).center)
 
@@ -217,10 +347,43 @@ class Game:
             for mine in self.mines:
                 pg.draw.circle(self.screen, LIGHTBLUE, self.camera.apply_rect(mine.rect).center, BLAST_RADIUS, 1)
 
-        draw_player_health(self.screen, 10, 10, self.player.health / self.player_health_bar)
+        self.draw_hud()
+        if self.profiler.enabled and self.profiler.overlay:
+            self.profiler.draw(self.screen)
 
         # AFTER drawing
-        pg.display.flip()
+        if self.renderer:
+            self.renderer.present()
+        else:
+            pg.display.flip()
+
+    def visible_sprites(self):
+        # sprites whose image may reach into the view, by layer and then in the order they appeared
+        view = self.camera.view()
+        view = pg.Rect(view.x - DRAW_MARGIN, view.y - DRAW_MARGIN, view.width + DRAW_MARGIN, view.height + DRAW_MARGIN)
+        sprites = self.grid.query_rect(view, self.all_sprites)
+        order = self.grid.order
+        sprites.sort(key=lambda sprite: (sprite.layer, order[sprite]))
+        return sprites
+
+    def draw_sprites(self, sprites):
+        # one blits call per layer, the bullet pool goes between the units and the effects
+        x, y = self.camera.camera.topleft
+        bullets = True
+        for layer, group in groupby(sprites, attrgetter('layer')):
+            if bullets and layer > BULLET_LAYER:
+                self.bullets.draw(self.screen, (x, y))
+                bullets = False
+            group = list(group)
+            self.screen.blits([(sprite.image, (sprite.rect.x + x, sprite.rect.y + y)) for sprite in group], False)
+            for sprite in group:
+                if isinstance(sprite, Mob):
+                    sprite.draw_health(self.screen, (sprite.rect.x + x, sprite.rect.y + y))
+        if bullets:
+            self.bullets.draw(self.screen, (x, y))
+
+    def draw_hud(self):
+        draw_player_health(self.screen, *self.hud_rect.topleft, self.player.health / self.player_health_bar)
 
     def show_start_scr(self):
         # game start screen
@@ -260,10 +423,32 @@ class Game:
         self.screen.blit(text_surface, text_rect)
 
 
-g = Game()
-# g.show_start_scr()
-while g.running:
-    g.new()
-    g.show_go_scr()
-
-pg.quit()
+if __name__ == '__main__':
+    # python shooter.py
+    # python shooter.py headless <ticks> [seed] [level] [profile.json|profile.csv]
+    import sys
+    import time
+    if len(sys.argv) > 1 and sys.argv[1] == 'headless':
+        g = Game(headless=True, seed=int(sys.argv[3]) if len(sys.argv) > 3 else 0, max_ticks=int(sys.argv[2]))
+        g.level = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+        if len(sys.argv) > 5:
+            g.profiler.toggle()
+    else:
+        g = Game()
+    start = time.perf_counter()
+    # g.show_start_scr()
+    while g.running:
+        g.new()
+        g.show_go_scr()
+    if g.headless:
+        elapsed = time.perf_counter() - start
+        print(f"{g.ticks} ticks in {elapsed:.2f} s ({g.ticks / elapsed:.0f} per second): level {g.level}, "
+              f"{len(g.mobs)} mobs left, player health {g.player.health:.1f} at {tuple(g.player.pos)}")
+        if g.profiler.enabled:
+            g.profiler.export(sys.argv[5])
+
+    if g.path_pool:
+        g.path_pool.close()
+    if g.world_file:
+        g.map.close()
+    pg.quit()
@@ -0,0 +1,42 @@
+from collections import namedtuple
+from settings import *
+
+# what the player is told to do this tick: aim point on the screen, fire, drop a mine
+Controls = namedtuple('Controls', 'aim shoot mine')
+
+
+class WallClock:
+    # frame limiter and tick source of the windowed game
+    def __init__(self):
+        self.clock = pg.time.Clock()
+
+    def tick(self, framerate=0):
+        return self.clock.tick(framerate)
+
+    def get_ticks(self):
+        return pg.time.get_ticks()
+
+
+class SimClock:
+    # simulated time: every tick advances a fixed step, nothing waits on the wall clock
+    def __init__(self, fps=FPS):
+        self.fps = fps
+        self.frames = 0
+
+    def tick(self, framerate=0):
+        self.frames += 1
+        return 1000 / self.fps
+
+    def get_ticks(self):
+        return self.frames * 1000 // self.fps
+
+
+def live_controls(game):
+    keys = pg.key.get_pressed()
+    left, _, right = pg.mouse.get_pressed()
+    return Controls(pg.mouse.get_pos(), keys[pg.K_SPACE] or left, right)
+
+
+def idle_controls(game):
+    # aim at the player itself: stand still, never fire
+    return Controls(game.offset, False, False)
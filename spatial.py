@@ -0,0 +1,182 @@
+import math
+import numpy as np
+from settings import *
+
+
+class SpatialHash:
+    def __init__(self, cell_size=SPATIAL_CELL):
+        self.cell_size = cell_size
+        # (cx, cy) -> {sprite: None}, dicts keep insertion order so queries are repeatable
+        self.cells = {}
+        # sprite -> (left, top, right, bottom) cell span it is currently filed under
+        self.spans = {}
+        # sprite -> serial given when it was first filed, a stable order for sprites from different cells
+        self.order = {}
+        self.serial = 0
+
+    def __len__(self):
+        return len(self.spans)
+
+    def __contains__(self, sprite):
+        return sprite in self.spans
+
+    def span(self, rect):
+        size = self.cell_size
+        left = rect.left // size
+        top = rect.top // size
+        return (left, top,
+                max(left, (rect.right - 1) // size),
+                max(top, (rect.bottom - 1) // size))
+
+    def insert(self, sprite, rect=None):
+        span = self.span(sprite.rect if rect is None else rect)
+        if sprite not in self.spans:
+            self._enter(sprite)
+        self.spans[sprite] = span
+        self._add(sprite, span)
+
+    def remove(self, sprite):
+        span = self.spans.pop(sprite, None)
+        if span is not None:
+            del self.order[sprite]
+            self._discard(sprite, span)
+
+    def move(self, sprite, rect=None):
+        # only touch the cells if the sprite crossed a cell border
+        span = self.span(sprite.rect if rect is None else rect)
+        old = self.spans.get(sprite)
+        if old == span:
+            return
+        if old is not None:
+            self._discard(sprite, old)
+        else:
+            self._enter(sprite)
+        self.spans[sprite] = span
+        self._add(sprite, span)
+
+    def sync(self, sprites, filed=()):
+        # bring the hash up to date with a group, dropping sprites that left it; the sprites in filed are
+        # moved by their owner and only kept
+        seen = set()
+        for sprite in sprites:
+            seen.add(sprite)
+            if sprite not in filed:
+                self.move(sprite)
+        if len(seen) != len(self.spans):
+            for sprite in [sprite for sprite in self.spans if sprite not in seen]:
+                self.remove(sprite)
+
+    def clear(self):
+        self.cells.clear()
+        self.spans.clear()
+        self.order.clear()
+
+    def query_rect(self, rect, group=None):
+        # sprites filed in the cells overlapped by rect (broad-phase, rects not tested)
+        left, top, right, bottom = self.span(rect)
+        found = {}
+        cells = self.cells
+        for cy in range(top, bottom + 1):
+            for cx in range(left, right + 1):
+                cell = cells.get((cx, cy))
+                if cell:
+                    found.update(cell)
+        if group is None:
+            return list(found)
+        members = members_of(group)
+        return [sprite for sprite in found if sprite in members]
+
+    def query_radius(self, pos, radius, group=None):
+        # sprites whose pos lies within radius of pos
+        x, y = pos
+        size = self.cell_size
+        left, top = int((x - radius) // size), int((y - radius) // size)
+        right, bottom = int((x + radius) // size), int((y + radius) // size)
+        found = {}
+        cells = self.cells
+        for cy in range(top, bottom + 1):
+            for cx in range(left, right + 1):
+                cell = cells.get((cx, cy))
+                if cell:
+                    found.update(cell)
+        hits = []
+        r2 = radius * radius
+        members = found if group is None else members_of(group)
+        for sprite in found:
+            if sprite not in members:
+                continue
+            dx = sprite.pos[0] - x
+            dy = sprite.pos[1] - y
+            if dx * dx + dy * dy <= r2:
+                hits.append(sprite)
+        return hits
+
+    def near_points(self, points, radius, group=None):
+        # radius queries around many points at once: the sprites filed near any of them and an array of
+        # squared distances, one row per point, to compare against radius ** 2
+        size = self.cell_size
+        # the cells holding a point, then everything within reach of those
+        reach = range(-math.ceil(radius / size), math.ceil(radius / size) + 1)
+        keys = {}
+        for cx, cy in dict.fromkeys((int(x // size), int(y // size)) for x, y in points):
+            for dy in reach:
+                for dx in reach:
+                    keys[(cx + dx, cy + dy)] = None
+        found = {}
+        cells = self.cells
+        for key in keys:
+            cell = cells.get(key)
+            if cell:
+                found.update(cell)
+        members = found if group is None else members_of(group)
+        sprites = [sprite for sprite in found if sprite in members]
+        pos = np.array([(sprite.pos[0], sprite.pos[1]) for sprite in sprites], float).reshape(-1, 2)
+        centres = np.array([(x, y) for x, y in points], float).reshape(-1, 2)
+        dx = pos[:, 0] - centres[:, 0, None]
+        dy = pos[:, 1] - centres[:, 1, None]
+        return sprites, dx * dx + dy * dy
+
+    def spritecollide(self, sprite, group, dokill, collided=None, rect=None):
+        # drop-in for pg.sprite.spritecollide that only looks at nearby sprites
+        if rect is None:
+            rect = sprite.rect
+        hits = []
+        for hit in self.query_rect(rect, group):
+            if hit is sprite:
+                continue
+            if collided(sprite, hit) if collided else rect.colliderect(hit.rect):
+                hits.append(hit)
+                if dokill:
+                    hit.kill()
+        return hits
+
+    def _enter(self, sprite):
+        self.order[sprite] = self.serial
+        self.serial += 1
+
+    def _add(self, sprite, span):
+        left, top, right, bottom = span
+        cells = self.cells
+        for cy in range(top, bottom + 1):
+            for cx in range(left, right + 1):
+                cell = cells.get((cx, cy))
+                if cell is None:
+                    cells[(cx, cy)] = {sprite: None}
+                else:
+                    cell[sprite] = None
+
+    def _discard(self, sprite, span):
+        left, top, right, bottom = span
+        cells = self.cells
+        for cy in range(top, bottom + 1):
+            for cx in range(left, right + 1):
+                cell = cells.get((cx, cy))
+                if cell is not None:
+                    cell.pop(sprite, None)
+                    if not cell:
+                        del cells[(cx, cy)]
+
+
+def members_of(group):
+    # pygame groups answer `in` through Python-level methods, their sprite dict answers it directly
+    return getattr(group, 'spritedict', group)
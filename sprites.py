@@ -1,6 +1,6 @@
-from random import randrange, choice
 from tilemap import *
-import heapq
+from pathfinding import *
+from world import *
 
 
 class Player(pg.sprite.Sprite):
@@ -11,6 +11,7 @@ class Player(pg.sprite.Sprite):
         self.health = None
 
         self.groups = game.all_sprites
+        self._layer = UNIT_LAYER
         pg.sprite.Sprite.__init__(self, self.groups)
         self.game = game
         self.image = self.game.player_img
@@ -25,7 +26,8 @@ class Player(pg.sprite.Sprite):
         self.mines = 1
 
     def update(self):
-        self.mouse_pos = vec(pg.mouse.get_pos())
+        controls = self.game.controls(self.game)
+        self.mouse_pos = vec(controls.aim)
         self.mouse_dist = self.mouse_pos - self.game.offset
         self.mouse_dir = self.mouse_dist.angle_to(vec(1, 0))
 
@@ -36,21 +38,19 @@ class Player(pg.sprite.Sprite):
             self.move()
             self.pos += self.vel * self.game.dt
 
-        self.image = pg.transform.rotate(self.game.player_img, self.rot)
+        self.image = self.game.rotations.get(self.game.player_img, self.rot)
         self.rect = self.image.get_rect()
         self.rect.center = self.pos
 
         self.hit_rect.centerx = self.pos.x
-        collide_with_walls(self, self.game.walls, 'x')
+        collide_with_walls(self, self.game.map, 'x')
         self.hit_rect.centery = self.pos.y
-        collide_with_walls(self, self.game.walls, 'y')
+        collide_with_walls(self, self.game.map, 'y')
         self.rect.center = self.hit_rect.center
 
-        keys = pg.key.get_pressed()
-        left, _, right = pg.mouse.get_pressed()
-        if keys[pg.K_SPACE] or left:
+        if controls.shoot:
             shoot(self)
-        if right and self.mines > 0:
+        if controls.mine and self.mines > 0:
             Mine(self.game, self, self.pos.x, self.pos.y)
             self.mines -= 1
 
@@ -65,53 +65,21 @@ class Player(pg.sprite.Sprite):
         self.vel = self.vel.rotate((-self.rot))
 
 
-class Wall(pg.sprite.Sprite):
-
-    def __init__(self, game, x, y):
-        self.groups = game.all_sprites, game.walls
-        pg.sprite.Sprite.__init__(self, self.groups)
-        self.game = game
-        self.image = pg.Surface((TILESIZE, TILESIZE))
-        self.image.fill(BLACK)
-        self.rect = self.image.get_rect()
-        self.pos = vec(x, y) * TILESIZE
-        self.rect.x = self.pos.x
-        self.rect.y = self.pos.y
-        self.diagonals = [[self.pos, self.pos + vec(TILESIZE, TILESIZE)],
-                          [self.pos + vec(TILESIZE, 0), self.pos + vec(0, TILESIZE)]]
-
-
-class Bullet(pg.sprite.Sprite):
-
-    def __init__(self, game, pos, direction, color):
-        self.groups = game.all_sprites, game.bullets
-        pg.sprite.Sprite.__init__(self, self.groups)
-        self.game = game
-        self.image = game.bullet_imgs[color]
-        self.rect = self.image.get_rect()
-        self.pos = vec(pos)
-        self.rect.center = pos
-        self.vel = direction * BULLET_SPEED
-        self.spawn_time = pg.time.get_ticks()
-
-    def update(self):
-        self.pos += self.vel * self.game.dt
-        self.rect.center = self.pos
-        if pg.sprite.spritecollideany(self, self.game.walls):
-            self.kill()
-        if pg.time.get_ticks() - self.spawn_time > 2000:
-            self.kill()
-
-
 class Mob(pg.sprite.Sprite):
+    # moved by a MobBatch instead of by update and think, see mobbatch.py; its slot there while it is in it
+    batched = False
+    slot = None
 
     def __init__(self, game, x, y):
         self.target = None
+        self.target_dist = vec(0, 0)
         self.rot_choice = None
-        self.check_walls = True
-        self.close_walls = []
+        self.sight_cells = []
+        # whether the last think saw the player
+        self.engaged = False
 
         self.groups = game.all_sprites, game.mobs
+        self._layer = UNIT_LAYER
         pg.sprite.Sprite.__init__(self, self.groups)
         self.game = game
 
@@ -132,51 +100,41 @@ class Mob(pg.sprite.Sprite):
 
         self.bullet_color = 'RED'
 
-    def move(self):
-        self.rot_choice = randrange(0, 50)
-        if self.rot_choice < 49:
-            pass
-        else:
-            self.rot += choice([-1, 1]) * 90
-
-        self.rot = round(self.rot / 90) * 90
-        self.vel = vec(MOB_SPEED, 0)
-
-    def update(self):
+    def think(self, ticks=1):
+        # perception and decisions, run by the AI scheduler; ticks have passed since the last think
         self.target = self.game.player
         self.target_dist = self.target.pos - self.pos
 
+        self.sight_cells.clear()
+        self.engaged = False
         if self.target_dist.length() < DETECT_RADIUS:
-            ray = [self.pos, self.target.pos]
-
-            if self.check_walls:
-                self.check_walls = False
-                self.close_walls = get_close_walls(self, self.game.walls, DETECT_RADIUS)
-                # self.close_walls = get_close_walls(self.target, self.close_walls, DETECT_RADIUS)
-
-            blind = False
-            for wall in self.close_walls:
-                for pair in wall.diagonals:
-                    blind = intersect(pair, ray)
-                    if blind:
-                        break
-                if blind:
-                    break
-
-            if not blind:
+            cells = self.sight_cells if self.game.draw_rects else None
+            if self.game.sight.line_of_sight(self.pos, self.target.pos, cells):
+                self.engaged = True
                 self.target_dir = self.target_dist.angle_to(vec(1, 0))
                 self.rot = self.target_dir
-                self.vel = vec(0, 0)
                 shoot(self)
+        if not self.engaged:
+            self.wander(ticks)
 
-            else:
-                self.check_walls = True
-                self.move()
+    def wander(self, ticks):
+        # a random quarter turn about every 50 ticks
+        self.rot_choice = self.game.rng.randrange(0, 50)
+        if self.rot_choice >= 50 - ticks:
+            self.rot += self.game.rng.choice([-1, 1]) * 90
+
+    def move(self):
+        self.rot = round(self.rot / 90) * 90
+        self.vel = vec(MOB_SPEED, 0)
+
+    def update(self):
+        # movement, every tick; where to go is decided in think
+        if self.engaged:
+            self.vel = vec(0, 0)
         else:
-            self.check_walls = True
             self.move()
 
-        self.image = pg.transform.rotate(self.reset_image, self.rot)
+        self.image = self.game.rotations.get(self.reset_image, self.rot)
         self.rect = self.image.get_rect()
         self.rect.center = self.pos
 
@@ -192,22 +150,24 @@ class Mob(pg.sprite.Sprite):
             self.pos.y = self.game.map.height + self.rect.height/2
 
         self.hit_rect.centerx = self.pos.x
-        collisionx = collide_with_walls(self, self.game.walls, 'x')
+        collisionx = collide_with_walls(self, self.game.map, 'x')
         self.hit_rect.centery = self.pos.y
-        collisiony = collide_with_walls(self, self.game.walls, 'y')
+        collisiony = collide_with_walls(self, self.game.map, 'y')
         self.rect.center = self.hit_rect.center
 
         if collisionx or collisiony:
-            self.rot += choice([-90, 90, 180])
+            self.rot += self.game.rng.choice([-90, 90, 180])
 
         if self.health <= 0:
             if self.dead:
                 explosion(self)
             else:
-                self.last_frame = pg.time.get_ticks()
                 self.dead = True
+                self.game.all_sprites.change_layer(self, EFFECT_LAYER)
+                explode(self)
 
-    def draw_health(self):
+    def draw_health(self, surface, topleft):
+        # drawn on the screen over the sprite, the image may be shared with other sprites
         if self.health > 6:
             col = GREEN
         elif self.health > 3:
@@ -216,10 +176,10 @@ class Mob(pg.sprite.Sprite):
             col = RED
 
         width = int(50 * self.health / MOB_HEALTH)
-        self.health_bar = pg.Rect(0, 0, width, 7)
+        self.health_bar = pg.Rect(topleft, (width, 7)).clip(pg.Rect(topleft, self.image.get_size()))
 
         if self.health < MOB_HEALTH:
-            pg.draw.rect(self.image, col, self.health_bar)
+            pg.draw.rect(surface, col, self.health_bar)
 
 
 class Boss(Mob):
@@ -227,28 +187,44 @@ class Boss(Mob):
     def __init__(self, game, x, y):
         super().__init__(game, x, y)
         self.path = []
+        self.following_path = False
         self.image = self.game.boss_img
         self.reset_image = self.image
         self.reset_path = 0
-        self.path_finder = Pathfinder(self.game.graph, self.game.obstacles, manhattan_distance)
+        if self.game.hierarchy is not None:
+            self.path_finder = self.game.hierarchy
+        elif self.game.nav is None:
+            self.path_finder = WindowPathfinder(self.game.map)
+        else:
+            self.path_finder = Pathfinder(self.game.nav, self.game.nav.obstacles, manhattan_distance,
+                                          self.game.path_cache, self.game.danger)
         self.bullet_color = 'PURPLE'
         self.mines = 1
 
+    def think(self, ticks=1):
+        super().think(ticks)
+        if self.mines > 0 and self.following_path:
+            lay_mine = self.game.rng.randrange(0, 300)
+            if lay_mine < ticks:
+                Mine(self.game, self, self.pos.x, self.pos.y)
+                self.mines -= 1
+
     def update(self):
         super().update()
         self.reset_path += 1
 
-        if self.reset_path > 3 * FPS:
+        if self.reset_path > 3 * FPS and self.game.flow_field is None:
             self.reset_path = 0
-            self.find_path()
-
-        if self.mines > 0 and self.following_path:
-            lay_mine = randrange(0, 300)
-            if lay_mine == 1:
-                Mine(self.game, self, self.pos.x, self.pos.y)
-                self.mines -= 1
+            self.game.ai.replan(self)
 
     def move(self):
+        if len(self.path) == 0 and self.game.flow_field is not None:
+            step = self.game.flow_field.step(self.pos // TILESIZE)
+            if step is not None:
+                self.path = [step]
+
+        if len(self.path) <= 1 and isinstance(self.path, LazyPath):
+            self.path.refine()
 
         if not len(self.path) == 0:
             self.following_path = True
@@ -258,64 +234,82 @@ class Boss(Mob):
             self.rot = round(direction / 45) * 45
 
             if (point - self.pos).length() < (0.33 * self.rect.width):
-                self.path = self.path[1:]
+                del self.path[0]
 
         else:
             self.following_path = False
             super().move()
 
-        for mine in self.game.mines:
+        if self.game.mines:
             self.following_path = False
-            if (self.pos - mine.pos).length() < BLAST_RADIUS and mine.armed:
-                self.avoid_mines(mine)
+        tile = self.pos // TILESIZE
+        if self.game.danger is not None:
+            if self.game.danger.in_blast(tile):
+                self.avoid_mines(self.game.danger, tile)
+        else:
+            # streamed worlds have no danger field, every armed mine in reach is dodged on its own
+            for mine in self.game.mines:
+                if mine.armed and (self.pos - mine.pos).length_squared() < BLAST_RADIUS * BLAST_RADIUS:
+                    self.avoid_mine(mine)
 
         self.vel = vec(MOB_SPEED, 0)
 
     def find_path(self):
+        # with worker processes the path arrives on a later tick, the old one is followed until then
         start = tuple(self.pos // TILESIZE)
         end = tuple(self.target.pos // TILESIZE)
-        self.path = self.path_finder.search(start, end)
-
-    def avoid_mines(self, mine=None):
-        walls = get_close_walls(self, self.game.walls, BLAST_RADIUS)
-        sink = self.target.pos
+        if self.game.paths is not None:
+            self.game.paths.request(self, start, end)
+        else:
+            self.path = self.game.profiler.call('search', self.path_finder.search, start, end)
 
+    def avoid_mines(self, danger, tile):
+        # head down the danger field, pulled towards the first tile of the path clear of the blast
+        while len(self.path) != 0 and danger.blast_at(self.path[0]) > DANGER_PRUNE:
+            del self.path[0]
         if len(self.path) != 0:
-            for point in self.path:
-                if (TILESIZE * vec(point) + vec(TILESIZE/2, TILESIZE/2) - mine.pos).length() <= 0.75*BLAST_RADIUS:
-                    self.path.remove(point)
-                else:
-                    sink = vec(point) * TILESIZE + vec(TILESIZE / 2, TILESIZE / 2)
-                    break
-
-        F_push = vec(0, 0)  # force vector of collective push forces from walls and mines
-
-        # the push force from all the wall obstacles
+            sink = vec(self.path[0]) * TILESIZE + vec(TILESIZE / 2, TILESIZE / 2)
+        else:
+            sink = self.target.pos
+
+        force = -danger.gradient(tile)
+        pull = sink - self.pos
+        if pull.length_squared() > 0:
+            force += DANGER_PULL * pull.normalize()
+        if force.length_squared() > 0:
+            self.rot = round(force.angle_to(vec(1, 0)) / 45) * 45
+
+    def avoid_mine(self, mine):
+        # pushed off the mine and the walls around, pulled towards the first tile of the path clear of the blast
+        walls = get_close_walls(self, self.game.map, BLAST_RADIUS)
+        centre = vec(TILESIZE / 2, TILESIZE / 2)
+        while len(self.path) != 0 and \
+                (vec(self.path[0]) * TILESIZE + centre - mine.pos).length() <= 0.75 * BLAST_RADIUS:
+            del self.path[0]
+        sink = vec(self.path[0]) * TILESIZE + centre if len(self.path) != 0 else self.target.pos
+
+        push = vec(0, 0)
         for wall in walls:
-            r_vec_wall = (self.pos - wall.pos)
-            push_magnitude = 1 / (r_vec_wall.length() - TILESIZE / 2) ** 2
-            F_push += push_magnitude * (r_vec_wall / r_vec_wall.length())
+            away = self.pos - wall
+            if away.length() > TILESIZE / 2:
+                push += away.normalize() / (away.length() - TILESIZE / 2) ** 2
+        away = self.pos - mine.pos
+        if away.length() > TILESIZE / 2:
+            push += 3 * away.normalize() / (away.length() - TILESIZE / 2) ** 2
 
-        if mine is not None:
-            r_vec_mine = (self.pos - mine.pos)
-            push_magnitude = 3 / (r_vec_mine.length() - TILESIZE / 2) ** 2
-            F_push += push_magnitude * (r_vec_mine / r_vec_mine.length())
-
-        pull_vec = (sink - self.pos)
-        pull = (30 + 5 * len(walls)) / pull_vec.length() ** 2
-        F_pull = pull * pull_vec / pull_vec.length()
-
-        F = F_pull + F_push
-        angle = F.angle_to(vec(1, 0))
-        angle = round(angle / 45) * 45
-
-        self.rot = angle
+        force = push
+        pull = sink - self.pos
+        if pull.length_squared() > 0:
+            force += (30 + 5 * len(walls)) / pull.length_squared() * pull.normalize()
+        if force.length_squared() > 0:
+            self.rot = round(force.angle_to(vec(1, 0)) / 45) * 45
 
 
 class Mine(pg.sprite.Sprite):
 
     def __init__(self, game, sprite, x, y):
         self.groups = game.all_sprites, game.mines
+        self._layer = MINE_LAYER
         pg.sprite.Sprite.__init__(self, self.groups)
         self.game = game
         self.sprite = sprite
@@ -323,7 +317,6 @@ class Mine(pg.sprite.Sprite):
         self.mine_frames = game.mine_imgs
         self.image = self.mine_frames[0]
         self.img_index = 0
-        self.flick = 0
 
         self.boom_frames = game.boom_imgs
         self.boom_frame = 0
@@ -334,233 +327,147 @@ class Mine(pg.sprite.Sprite):
 
         self.armed = False
         self.detonated = False
-        self.placed_time = pg.time.get_ticks()
-        self.timer = randrange(20000, 120000, 2000)
+        self.placed_time = self.game.clock.get_ticks()
+        self.timer = self.game.rng.randrange(20000, 120000, 2000)
+        # armed more than 3000 ms after it was placed, flickering over the last 3000 ms of its fuse
+        timers = game.timers
+        self.alarms = [timers.at(self.placed_time + 3001, self.arm),
+                       timers.at(self.placed_time + self.timer - 3000, self.flicker),
+                       timers.at(self.placed_time + self.timer, self.boom)]
 
     def update(self):
-        now = pg.time.get_ticks()
+        # a bullet or a sprite touching it sets it off; arming, the fuse and the explosion run on the game's timers
+        if self.armed and not self.detonated:
+            if self.game.bullets.any_in_rect(self.rect) or \
+                    self.game.grid.spritecollide(self, self.game.all_sprites, False):
+                self.boom()
+
+    def show(self, image):
+        self.image = image
+        self.rect = self.image.get_rect()
+        self.rect.center = self.pos
 
-        if not self.armed and (now - self.placed_time) > 3000:
+    def arm(self):
+        # walls only ever go, a mine clear of them when it arms stays clear
+        if self.game.map.collide_rect(self.rect):
+            self.kill()
+            self.sprite.mines += 1
+            self.disarm()
+        elif not self.armed:
             self.armed = True
-            self.image = self.mine_frames[1]
-
-        if self.detonated:
-            explosion(self)
-
-        elif self.armed and not self.detonated:
-            if now - self.placed_time >= (self.timer - 3000):
-                self.flicker()
-                if now - self.placed_time >= self.timer:
-                    self.boom()
-
-            hits = pg.sprite.spritecollide(self, self.game.all_sprites, False)
-            if len(hits) > 1:
-                if True in [isinstance(hit, Wall) for hit in hits]:
-                    self.kill()
-                    self.sprite.mines += 1
-                else:
-                    self.boom()
+            self.show(self.mine_frames[1])
+            if self.game.danger is not None:
+                self.game.danger.stamp(self)
 
-        self.rect = self.image.get_rect()
-        self.rect.center = self.pos
+    def disarm(self):
+        for alarm in self.alarms:
+            alarm.cancel()
 
     def flicker(self):
-        self.flick += 1
-        if self.flick % 10 == 0:
-            self.img_index += 1
-            self.img_index = self.img_index % 2
-            self.image = self.mine_frames[self.img_index]
+        # every 10 frames' worth of time until it goes off
+        self.img_index = (self.img_index + 1) % 2
+        self.show(self.mine_frames[self.img_index])
+        self.alarms[1] = self.game.timers.after(10 * 1000 // FPS, self.flicker)
 
     def boom(self):
-        self.sprite.mines += 1
+        # the chain reaction breadth-first: the mines caught by one wave of blasts go off together in the next;
+        # walls and bullets play no part in the chain, they are cleared for all of it in one pass at the end
+        game = self.game
         self.detonated = True
-        for hit in self.game.all_sprites:
-            if hit == self:
-                continue
-
-            distance = (self.pos - hit.pos).length()
-
-            if isinstance(hit, Wall):
-                if distance <= BLAST_RADIUS / 2:
-                    hit.kill()
-                continue
-
-            if distance <= BLAST_RADIUS:
+        chain = []
+        wave = [self]
+        while wave:
+            chain.extend(wave)
+            for mine in wave:
+                mine.sprite.mines += 1
+                mine.disarm()
+                explosion(mine)
+                explode(mine)
+                game.all_sprites.change_layer(mine, EFFECT_LAYER)
+                if game.danger is not None:
+                    game.danger.erase(mine)
+
+            sprites, distances = game.grid.near_points([mine.pos for mine in wave], BLAST_RADIUS, game.all_sprites)
+            within = distances <= BLAST_RADIUS * BLAST_RADIUS
+            caught = []
+            for column in np.flatnonzero(within.any(axis=0)).tolist():
+                hit = sprites[column]
                 if isinstance(hit, Mine):
                     if not hit.detonated:
-                        hit.boom()
-                elif isinstance(hit, Bullet):
-                    hit.kill()
+                        hit.detonated = True
+                        caught.append(hit)
                 else:
-                    damage = self.game.player_health_bar * (1 - (distance / BLAST_RADIUS) ** 2)
-                    hit.health -= damage
-
-        self.last_frame = pg.time.get_ticks()
-
-
-class Pathfinder:
-    def __init__(self, graph, obstacles, heuristic):
-        self.graph = graph
-        self.obstacles = obstacles
-        self.heuristic = heuristic
-
-    def search(self, start, end, max_size=100):
-        # initialize the priority queue with the start node
-        queue = [(0, start, [start])]
-        # keep track of which nodes have been visited
-        visited = set()
-
-        # continue searching while there are still nodes in the queue
-        while queue:
-            # get the next node to search
-            cost, node, path = heapq.heappop(queue)
-            # mark the node as visited
-            visited.add(node)
+                    for distance in np.sqrt(distances[within[:, column], column]).tolist():
+                        hit.health -= game.player_health_bar * (1 - (distance / BLAST_RADIUS) ** 2)
+            wave = caught
 
-            # check if we have reached the end
-            if node == end or len(path) >= max_size:
-                return path
+        centres = [mine.pos for mine in chain]
+        game.destroy_walls(game.map.walls_near_points(centres, BLAST_RADIUS / 2))
+        game.bullets.clear_radii(centres, BLAST_RADIUS)
 
-            # add all unvisited, non-obstacle neighbors to the queue
-            for neighbor in self.graph[node]:
-                if neighbor not in visited and neighbor not in self.obstacles:
-                    # compute the heuristic value for the neighbor
-                    heuristic_value = self.heuristic(neighbor, end)
-                    # add the neighbor to the queue with the cost, heuristic value, and path
-                    heapq.heappush(queue, (heuristic_value + 0.5 * len(path), neighbor, path + [neighbor]))
 
-        # if the end was not reached, return an empty path
-        return []
-
-
-def manhattan_distance(node, target):
-    return abs(node[0] - target[0]) + abs(node[1] - target[1])
-
-
-def create_graph(map_data):
-    # create an empty graph
-    graph = {}
-    obstacles = []
-
-    # add a key for each tile in the map
-    for y in range(map_data.height):
-        for x in range(map_data.width):
-            graph[(x, y)] = []
-
-    # add neighbors for each tile
-    for y in range(map_data.height):
-        for x in range(map_data.width):
-            # skip obstacles
-            if map_data.getpixel((x, y)) == (0, 0, 0):
-                obstacles.append((x, y))
-            # add neighbors to the right, left, above, and below
-            for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
-                if 0 <= x + dx < map_data.width and 0 <= y + dy < map_data.height:
-                    neighbor = (x + dx, y + dy)
-                    # only add non-obstacle neighbors to the graph
-                    if map_data.getpixel(neighbor) != (0, 0, 0):
-                        graph[(x, y)].append(neighbor)
-    return graph, obstacles
-
-
-def get_close_walls(sprite, walls, radius):
-    position = sprite.pos
-    close_walls = []
-
-    for wall in walls:
-        if (wall.pos - position).length() < radius:
-            close_walls.append(wall)
-
-    return close_walls
+def get_close_walls(sprite, game_map, radius):
+    # top-left corners of the wall tiles within radius of the sprite
+    return [vec(col, row) * TILESIZE for col, row in game_map.walls_near(sprite.pos, radius)]
 
 
 def explosion(sprite):
-    now = pg.time.get_ticks()
+    # the current frame of the sprite's explosion; an exploding mine keeps the whole rect and sets off the
+    # armed mines it reaches, a dying mob only shows it
     sprite.image = sprite.game.boom_imgs[sprite.boom_frame]
     sprite.rect = sprite.image.get_rect()
     sprite.rect.center = sprite.pos
-    sprite.rect.width, sprite.rect.height = 1, 1
-    if (now - sprite.last_frame) > 75:
-        sprite.last_frame = pg.time.get_ticks()
-        sprite.boom_frame += 1
-        if sprite.boom_frame >= len(sprite.game.boom_imgs):
-            sprite.kill()
+    if not isinstance(sprite, Mine):
+        sprite.rect.width, sprite.rect.height = 1, 1
+
+
+def explode(sprite):
+    # on to the next frame more than 75 ms after this one showed, the sprite goes after the last one
+    sprite.game.timers.at(sprite.game.clock.get_ticks() + 76, next_frame, sprite)
+
+
+def next_frame(sprite):
+    sprite.boom_frame += 1
+    if sprite.boom_frame >= len(sprite.game.boom_imgs):
+        sprite.kill()
+    else:
+        explosion(sprite)
+        explode(sprite)
 
 
 def shoot(sprite):
-    now = pg.time.get_ticks()
+    now = sprite.game.clock.get_ticks()
     if now - sprite.last_shot > RATE:
         sprite.last_shot = now
         dir = vec(1, 0).rotate(-sprite.rot)
         pos = sprite.pos + BARREL_OFFSET.rotate(-sprite.rot)
-        Bullet(sprite.game, pos, dir.rotate(randrange(-1, 1)), sprite.bullet_color)
+        spread = sprite.game.rng.randrange(-1, 1)
+        sprite.game.bullets.spawn(pos, dir.rotate(spread), sprite.bullet_color, sprite)
 
 
 def collide_hit_rect(one, two):
     return one.hit_rect.colliderect(two.rect)
 
 
-def collide_with_walls(sprite, group, dir):
+def collide_with_walls(sprite, game_map, dir):
     if dir == 'x':
-        hits = pg.sprite.spritecollide(sprite, group, False, collide_hit_rect)
+        hits = game_map.wall_rects(sprite.hit_rect)
         if hits:
-            if hits[0].rect.centerx > sprite.hit_rect.centerx:
-                sprite.pos.x = hits[0].rect.left - sprite.hit_rect.width / 2
-            if hits[0].rect.centerx < sprite.hit_rect.centerx:
-                sprite.pos.x = hits[0].rect.right + sprite.hit_rect.width / 2
+            if hits[0].centerx > sprite.hit_rect.centerx:
+                sprite.pos.x = hits[0].left - sprite.hit_rect.width / 2
+            if hits[0].centerx < sprite.hit_rect.centerx:
+                sprite.pos.x = hits[0].right + sprite.hit_rect.width / 2
             sprite.vel.x = 0
             sprite.hit_rect.centerx = sprite.pos.x
             return True
 
     if dir == 'y':
-        hits = pg.sprite.spritecollide(sprite, group, False, collide_hit_rect)
+        hits = game_map.wall_rects(sprite.hit_rect)
         if hits:
-            if hits[0].rect.centery > sprite.hit_rect.centery:
-                sprite.pos.y = hits[0].rect.top - sprite.hit_rect.height / 2
-            if hits[0].rect.centery < sprite.hit_rect.centery:
-                sprite.pos.y = hits[0].rect.bottom + sprite.hit_rect.height / 2
+            if hits[0].centery > sprite.hit_rect.centery:
+                sprite.pos.y = hits[0].top - sprite.hit_rect.height / 2
+            if hits[0].centery < sprite.hit_rect.centery:
+                sprite.pos.y = hits[0].bottom + sprite.hit_rect.height / 2
             sprite.vel.y = 0
             sprite.hit_rect.centery = sprite.pos.y
             return True
-
-
-def intersect(segment1, segment2):
-    start1, end1 = segment1
-    start2, end2 = segment2
-
-    # Calculate the slope and intercept of the first line
-    if end1[0] - start1[0] == 0:
-        slope1 = float('inf')
-        intercept1 = start1[0]
-    else:
-        slope1 = (end1[1] - start1[1]) / (end1[0] - start1[0])
-        intercept1 = start1[1] - slope1 * start1[0]
-
-    # Calculate the slope and intercept of the second line
-    if end2[0] - start2[0] == 0:
-        slope2 = float('inf')
-        intercept2 = start2[0]
-    else:
-        slope2 = (end2[1] - start2[1]) / (end2[0] - start2[0])
-        intercept2 = start2[1] - slope2 * start2[0]
-
-    # Check whether the lines are parallel
-    if slope1 == slope2:
-        return False  # Line segments do not intersect
-
-    # Calculate the point of intersection of the two lines
-    if slope1 == float('inf'):
-        x = intercept1
-        y = slope2 * x + intercept2
-    elif slope2 == float('inf'):
-        x = intercept2
-        y = slope1 * x + intercept1
-    else:
-        x = (intercept2 - intercept1) / (slope1 - slope2)
-        y = slope1 * x + intercept1
-
-    # Check whether the point of intersection is within the range of both line segments
-    return (min(start1[0], end1[0]) <= x <= max(start1[0], end1[0])) and (
-            min(start2[0], end2[0]) <= x <= max(start2[0], end2[0])) and (
-            min(start1[1], end1[1]) <= y <= max(start1[1], end1[1])) and (
-            min(start2[1], end2[1]) <= y <= max(start2[1], end2[1]))
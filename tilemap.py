@@ -1,14 +1,155 @@
+import numpy as np
 from settings import *
-from PIL import Image
+from levelpack import *
 
 
 class Map:
     def __init__(self, filename):
-        self.data = Image.open(filename)
-        self.tilewidth = self.data.width
-        self.tileheight = self.data.height
+        level = load_level(filename)
+        self.tilewidth = level.width
+        self.tileheight = level.height
         self.width = self.tilewidth * TILESIZE
         self.height = self.tileheight * TILESIZE
+        self.spawns = level.spawns
+        # navigation adjacency from the pack, dropped once a wall is removed
+        self.nav_mask = level.mask
+
+        # wall layer: one byte per tile, indexed by row * tilewidth + col
+        self.walls = level.walls
+        # (row, col) view sharing memory with self.walls, for bulk lookups
+        self.wall_grid = np.frombuffer(self.walls, np.uint8).reshape(self.tileheight, self.tilewidth)
+
+    def is_wall(self, col, row):
+        if 0 <= col < self.tilewidth and 0 <= row < self.tileheight:
+            return self.walls[row * self.tilewidth + col] == 1
+        return False
+
+    def walls_at(self, cols, rows):
+        # is_wall for arrays of tile coordinates
+        inside = (cols >= 0) & (cols < self.tilewidth) & (rows >= 0) & (rows < self.tileheight)
+        solid = np.zeros(cols.shape, bool)
+        solid[inside] = self.wall_grid[rows[inside], cols[inside]] == 1
+        return solid
+
+    def remove_wall(self, col, row):
+        if not self.is_wall(col, row):
+            return False
+        self.walls[row * self.tilewidth + col] = 0
+        self.nav_mask = None
+        return True
+
+    def tile_span(self, rect):
+        # range of tiles overlapped by rect, clipped to the map
+        left = max(0, rect.left // TILESIZE)
+        top = max(0, rect.top // TILESIZE)
+        right = min(self.tilewidth - 1, (rect.right - 1) // TILESIZE)
+        bottom = min(self.tileheight - 1, (rect.bottom - 1) // TILESIZE)
+        return left, top, right, bottom
+
+    def wall_rects(self, rect):
+        # solid tiles overlapping rect, in row-major order
+        rects = []
+        if rect.width <= 0 or rect.height <= 0:
+            return rects
+        left, top, right, bottom = self.tile_span(rect)
+        for row in range(top, bottom + 1):
+            base = row * self.tilewidth
+            for col in range(left, right + 1):
+                if self.walls[base + col]:
+                    rects.append(pg.Rect(col * TILESIZE, row * TILESIZE, TILESIZE, TILESIZE))
+        return rects
+
+    def collide_rect(self, rect):
+        if rect.width <= 0 or rect.height <= 0:
+            return False
+        left, top, right, bottom = self.tile_span(rect)
+        for row in range(top, bottom + 1):
+            base = row * self.tilewidth
+            if any(self.walls[base + left:base + right + 1]):
+                return True
+        return False
+
+    def line_of_sight(self, start, end, cells=None):
+        return walk_tiles(start, end, self.walls, self.tilewidth, self.tileheight, cells)
+
+    def walls_near(self, pos, radius):
+        # solid tiles whose top-left corner lies within radius of pos
+        tiles = []
+        left = max(0, int((pos[0] - radius) // TILESIZE))
+        top = max(0, int((pos[1] - radius) // TILESIZE))
+        right = min(self.tilewidth - 1, int((pos[0] + radius) // TILESIZE))
+        bottom = min(self.tileheight - 1, int((pos[1] + radius) // TILESIZE))
+        for row in range(top, bottom + 1):
+            base = row * self.tilewidth
+            for col in range(left, right + 1):
+                if self.walls[base + col]:
+                    dx = col * TILESIZE - pos[0]
+                    dy = row * TILESIZE - pos[1]
+                    if dx * dx + dy * dy <= radius * radius:
+                        tiles.append((col, row))
+        return tiles
+
+    def walls_near_points(self, points, radius):
+        # walls_near around many points at once, every tile listed once, row by row
+        centres = np.array([(x, y) for x, y in points], float).reshape(-1, 2)
+        reach = np.arange(-int(radius // TILESIZE) - 1, int(radius // TILESIZE) + 2)
+        base = np.floor(centres / TILESIZE).astype(int)
+        cols, rows = np.broadcast_arrays(base[:, 0, None, None] + reach, base[:, 1, None, None] + reach[:, None])
+        dx = cols * TILESIZE - centres[:, 0, None, None]
+        dy = rows * TILESIZE - centres[:, 1, None, None]
+        close = dx * dx + dy * dy <= radius * radius
+        cols, rows = cols[close], rows[close]
+        solid = self.walls_at(cols, rows)
+        keys = np.unique(rows[solid] * self.tilewidth + cols[solid])
+        return [(key % self.tilewidth, key // self.tilewidth) for key in keys.tolist()]
+
+
+def whole_pixels(values):
+    # float coordinates rounded like pg.Rect rounds them, halves away from zero
+    return np.trunc(values + np.copysign(0.5, values)).astype(np.int64)
+
+
+def walk_tiles(start, end, walls=b'', width=0, height=0, cells=None):
+    # Amanatides-Woo walk over the tiles the segment crosses, stopping at the first wall.
+    # Traversed tiles are appended to cells when a list is given.
+    x0, y0 = start
+    x1, y1 = end
+    col, row = int(x0 // TILESIZE), int(y0 // TILESIZE)
+    end_col, end_row = int(x1 // TILESIZE), int(y1 // TILESIZE)
+    dx, dy = x1 - x0, y1 - y0
+
+    if dx > 0:
+        step_col, t_max_x, t_delta_x = 1, ((col + 1) * TILESIZE - x0) / dx, TILESIZE / dx
+    elif dx < 0:
+        step_col, t_max_x, t_delta_x = -1, (col * TILESIZE - x0) / dx, -TILESIZE / dx
+    else:
+        step_col, t_max_x, t_delta_x = 0, float('inf'), float('inf')
+    if dy > 0:
+        step_row, t_max_y, t_delta_y = 1, ((row + 1) * TILESIZE - y0) / dy, TILESIZE / dy
+    elif dy < 0:
+        step_row, t_max_y, t_delta_y = -1, (row * TILESIZE - y0) / dy, -TILESIZE / dy
+    else:
+        step_row, t_max_y, t_delta_y = 0, float('inf'), float('inf')
+
+    for _ in range(abs(end_col - col) + abs(end_row - row) + 1):
+        if cells is not None:
+            cells.append((col, row))
+        if 0 <= col < width and 0 <= row < height and walls[row * width + col]:
+            return False
+        if t_max_x < t_max_y:
+            col += step_col
+            t_max_x += t_delta_x
+        else:
+            row += step_row
+            t_max_y += t_delta_y
+    return True
+
+
+def ray_tiles(start, end):
+    # tiles crossed by the segment from start to end, in order, ignoring walls
+    cells = []
+    walk_tiles(start, end, cells=cells)
+    return cells
 
 
 class Camera:
@@ -23,6 +164,10 @@ class Camera:
     def apply_rect(self, rect):
         return rect.move(self.camera.topleft)
 
+    def view(self):
+        # the part of the map currently on screen, in map coordinates
+        return pg.Rect(-self.camera.x, -self.camera.y, WIDTH, HEIGHT)
+
     def update(self, target):
         x = -target.rect.centerx + int(WIDTH / 2)
         y = -target.rect.centery + int(HEIGHT / 2)
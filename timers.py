@@ -0,0 +1,97 @@
+from settings import *
+
+
+class Timer:
+    # a callback due at a game time; a cancelled timer stays in its slot and is skipped when its time comes
+    def __init__(self, due, callback, args):
+        self.due = due
+        self.callback = callback
+        self.args = args
+
+    def cancel(self):
+        self.callback = None
+
+
+class TimerWheel:
+    # callbacks at game times, in the milliseconds of the game's clock so it runs headless too. Timers sit in
+    # a hierarchy of wheels: the first has a slot per millisecond, every next one a slot per turn of the one
+    # below, and a timer moves down a wheel each time its slot comes round. A tick walks the milliseconds
+    # since the last one and fires what is due, the live timers further out are not looked at.
+    def __init__(self, now=0, bits=TIMER_BITS):
+        # the last millisecond gone through
+        self.time = now
+        self.shifts = [sum(bits[:level]) for level in range(len(bits))]
+        self.masks = [(1 << b) - 1 for b in bits]
+        self.spans = [1 << (shift + b) for shift, b in zip(self.shifts, bits)]
+        self.wheels = [[[] for _ in range(1 << b)] for b in bits]
+        # timers beyond the last wheel, looked at once per turn of it
+        self.overflow = []
+        # timers in the wheels, cancelled ones included
+        self.pending = 0
+        self.fired = 0
+
+    def __len__(self):
+        return self.pending
+
+    def at(self, due, callback, *args):
+        # callback(*args) on the first tick the clock reads due or later; a time already gone through
+        # fires on the next millisecond
+        timer = Timer(max(due, self.time + 1), callback, args)
+        self._insert(timer)
+        self.pending += 1
+        return timer
+
+    def after(self, delay, callback, *args):
+        return self.at(self.time + delay, callback, *args)
+
+    def update(self, now):
+        if self.pending == 0:
+            self.time = max(self.time, now)
+            return
+        first, mask = self.wheels[0], self.masks[0]
+        while self.time < now:
+            self.time += 1
+            t = self.time
+            if t & mask == 0:
+                self._cascade(t)
+            slot = first[t & mask]
+            if not slot:
+                continue
+            first[t & mask] = []
+            self.pending -= len(slot)
+            for timer in slot:
+                if timer.callback is not None:
+                    self.fired += 1
+                    timer.callback(*timer.args)
+            if self.pending == 0:
+                self.time = max(self.time, now)
+
+    def _insert(self, timer):
+        due = timer.due
+        delta = due - self.time
+        for wheel, shift, mask, span in zip(self.wheels, self.shifts, self.masks, self.spans):
+            if delta < span:
+                wheel[(due >> shift) & mask].append(timer)
+                return
+        self.overflow.append(timer)
+
+    def _cascade(self, t):
+        # the first wheel came round: the slot of the next one up that starts now is spread over the wheels
+        # below, and so on up for as long as the wheel emptied came round too
+        for level in range(1, len(self.wheels)):
+            index = (t >> self.shifts[level]) & self.masks[level]
+            slot = self.wheels[level][index]
+            self.wheels[level][index] = []
+            for timer in slot:
+                if timer.callback is None:
+                    self.pending -= 1
+                else:
+                    self._insert(timer)
+            if index != 0:
+                return
+        overflow, self.overflow = self.overflow, []
+        for timer in overflow:
+            if timer.callback is None:
+                self.pending -= 1
+            else:
+                self._insert(timer)
@@ -0,0 +1,127 @@
+from math import ceil, hypot
+from tilemap import *
+
+
+def corridor(dc, dr):
+    # tiles, relative to the source, that a segment from any point of the source tile to any point of the
+    # tile at (dc, dr) can cross: those overlapping the convex hull of the two tiles, touching its long sides
+    # included for segments through a tile corner
+    return [(col, row) for row in range(min(0, dr), max(0, dr) + 1) for col in range(min(0, dc), max(0, dc) + 1)
+            if (col or row) and abs(dc * row - dr * col) <= abs(dc) + abs(dr)]
+
+
+class VisibilityMap:
+    # per tile, which tiles around it are seen from it whatever the points on the two tiles: every tile a
+    # sighting between them can cross is open. line_of_sight answers from the sets when they say so and walks
+    # the exact segment otherwise, so it gives the same answers as Map.line_of_sight, only faster in the open.
+    def __init__(self, game_map, radius=DETECT_RADIUS):
+        self.map = game_map
+        # a sighting shorter than radius can join any two points of tiles this far apart
+        self.reach = ceil(radius / TILESIZE + 2 ** 0.5)
+        self.side = 2 * self.reach + 1
+
+        # the corridor of tiles for each offset, relative to the source, padded with the source tile
+        # itself so every ray has the same length
+        bits, rays = [], []
+        for dr in range(-self.reach, self.reach + 1):
+            for dc in range(-self.reach, self.reach + 1):
+                if (dc or dr) and hypot(dc, dr) <= self.reach:
+                    bits.append(self.bit(dc, dr))
+                    rays.append(corridor(dc, dr))
+        self.rays = rays
+        self.ray_bits = np.array(bits)
+        length = max(len(cells) for cells in rays)
+        self.ray_cols = np.zeros((length, len(rays)), np.int64)
+        self.ray_rows = np.zeros((length, len(rays)), np.int64)
+        for i, cells in enumerate(rays):
+            for step, (dc, dr) in enumerate(cells):
+                self.ray_cols[step, i] = dc
+                self.ray_rows[step, i] = dr
+
+        # every (ray, tile on it) pair, to find the rays a changed tile lies on
+        self.crossings = np.array([(i, dc, dr) for i, cells in enumerate(rays) for dc, dr in cells]).T
+
+        # one bitset per tile: bit (dr + reach) * side + (dc + reach) is set if the tile at
+        # offset (dc, dr) is seen from every point of it
+        self.nbytes = (self.side * self.side + 7) // 8
+        self.bits = np.zeros((game_map.tileheight, game_map.tilewidth, self.nbytes), np.uint8)
+        self.flat = memoryview(self.bits).cast('B')
+        self.build(0, 0, game_map.tilewidth, game_map.tileheight)
+
+    def bit(self, dc, dr):
+        return (dr + self.reach) * self.side + dc + self.reach
+
+    def build(self, left, top, right, bottom):
+        # recompute the bitsets of the source tiles in [left, right) x [top, bottom)
+        reach = self.reach
+        width, height = right - left, bottom - top
+        if width <= 0 or height <= 0:
+            return
+        walls = np.zeros((height + 2 * reach, width + 2 * reach), bool)
+        grid = self.map.wall_grid
+        src = grid[max(0, top - reach):bottom + reach, max(0, left - reach):right + reach]
+        row0 = reach - (top - max(0, top - reach))
+        col0 = reach - (left - max(0, left - reach))
+        walls[row0:row0 + src.shape[0], col0:col0 + src.shape[1]] = src == 1
+
+        visible = np.zeros((height, width, self.side * self.side), bool)
+        for bit, cells in zip(self.ray_bits, self.rays):
+            blocked = walls[reach:reach + height, reach:reach + width].copy()
+            for dc, dr in cells:
+                blocked |= walls[reach + dr:reach + dr + height, reach + dc:reach + dc + width]
+            visible[:, :, bit] = ~blocked
+        self.bits[top:bottom, left:right] = np.packbits(visible, axis=2)
+
+    def walls_removed(self, tiles):
+        # only the (source, ray) pairs whose ray crosses a destroyed wall can change, plus every
+        # ray of the destroyed walls themselves, which are walkable sources now
+        if not tiles:
+            return
+        game_map = self.map
+        reach = self.reach
+        nrays = len(self.rays)
+        changed = np.array(tiles)
+        ray, dc, dr = self.crossings
+        cols = np.concatenate([(changed[:, 0:1] - dc).ravel(), changed[:, 0].repeat(nrays)])
+        rows = np.concatenate([(changed[:, 1:2] - dr).ravel(), changed[:, 1].repeat(nrays)])
+        ray = np.concatenate([np.tile(ray, len(changed)), np.tile(np.arange(nrays), len(changed))])
+        inside = (cols >= 0) & (cols < game_map.tilewidth) & (rows >= 0) & (rows < game_map.tileheight)
+        key = np.sort((rows[inside] * game_map.tilewidth + cols[inside]) * nrays + ray[inside])
+        key = key[np.concatenate([[True], key[1:] != key[:-1]])]
+        source, ray = np.divmod(key, nrays)
+        rows, cols = np.divmod(source, game_map.tilewidth)
+
+        # walls around the affected sources, padded with open ground outside the map
+        left, top = cols.min() - reach, rows.min() - reach
+        width, height = cols.max() + reach + 1 - left, rows.max() + reach + 1 - top
+        walls = np.zeros((height, width), bool)
+        src = game_map.wall_grid[max(0, top):top + height, max(0, left):left + width]
+        walls[max(0, top) - top:max(0, top) - top + src.shape[0],
+              max(0, left) - left:max(0, left) - left + src.shape[1]] = src == 1
+        walls = walls.ravel()
+        origin = (rows - top) * width + cols - left
+
+        blocked = walls[origin]
+        for step_cols, step_rows in zip(self.ray_cols, self.ray_rows):
+            blocked |= walls[origin + step_rows[ray] * width + step_cols[ray]]
+
+        bit = self.ray_bits[ray]
+        index = source * self.nbytes + (bit >> 3)
+        mask = (0x80 >> (bit & 7)).astype(np.uint8)
+        flat = self.bits.reshape(-1)
+        np.bitwise_and.at(flat, index, ~mask)
+        np.bitwise_or.at(flat, index[~blocked], mask[~blocked])
+
+    def line_of_sight(self, start, end, cells=None):
+        # a clear corridor answers at once; a wall in it may or may not block these two points, the exact
+        # walk decides, as it does whenever the sets cannot answer
+        col, row = int(start[0] // TILESIZE), int(start[1] // TILESIZE)
+        dc, dr = int(end[0] // TILESIZE) - col, int(end[1] // TILESIZE) - row
+        if cells is not None or not (0 <= col < self.map.tilewidth and 0 <= row < self.map.tileheight) \
+                or dc * dc + dr * dr > self.reach * self.reach:
+            return self.map.line_of_sight(start, end, cells)
+        if dc or dr:
+            bit = self.bit(dc, dr)
+            if self.flat[(row * self.map.tilewidth + col) * self.nbytes + (bit >> 3)] & (0x80 >> (bit & 7)):
+                return True
+        return self.map.line_of_sight(start, end)
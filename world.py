@@ -0,0 +1,280 @@
+import mmap
+import struct
+from collections import OrderedDict
+from math import ceil
+from hpa import *
+
+WORLD_MAGIC = b'WRLD'
+WORLD_VERSION = 1
+# magic, version, width, height, chunk size, player col, player row, number of mobs
+WORLD_HEADER = struct.Struct('<4sHIIHIII')
+# one entry per chunk, row by row: where its data starts and how many spawns follow the wall bits
+CHUNK_INDEX = np.dtype([('offset', '<u8'), ('spawns', '<u4')])
+
+
+class ChunkWalls:
+    # flat row * tilewidth + col view over the chunks of a world, so the tile loops of Map work unchanged
+    def __init__(self, world):
+        self.world = world
+
+    def __len__(self):
+        return self.world.tilewidth * self.world.tileheight
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        row, col = divmod(index, self.world.tilewidth)
+        size = self.world.chunk_size
+        return self.world.chunk(col // size, row // size)[row % size * size + col % size]
+
+    def __setitem__(self, index, value):
+        row, col = divmod(index, self.world.tilewidth)
+        size = self.world.chunk_size
+        self.world.edit(col // size, row // size)[row % size * size + col % size] = value
+
+
+class World(Map):
+    # a map streamed from a chunked world file, keeping only recently used chunks in memory
+    def __init__(self, filename, cache_size=CHUNK_CACHE):
+        self.file = open(filename, 'rb')
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, width, height, size, col, row, mobs = WORLD_HEADER.unpack_from(self.buffer)
+        if magic != WORLD_MAGIC or version != WORLD_VERSION:
+            raise ValueError(f'{filename} is not a world file of this version')
+
+        self.tilewidth = width
+        self.tileheight = height
+        self.width = width * TILESIZE
+        self.height = height * TILESIZE
+        self.chunk_size = size
+        self.chunk_cols = ceil(width / size)
+        self.chunk_rows = ceil(height / size)
+        self.index = np.frombuffer(self.buffer, CHUNK_INDEX, self.chunk_cols * self.chunk_rows, WORLD_HEADER.size)
+
+        # only the player spawns up front, everything else spawns when its chunk is first streamed in
+        self.spawns = [(PLAYER_SPAWN, col, row)]
+        self.mob_count = mobs
+        self.nav_mask = None
+        self.walls = ChunkWalls(self)
+
+        self.cache_size = cache_size
+        # loaded chunks, least recently used first
+        self.chunks = OrderedDict()
+        # chunks with removed walls, kept out of the cache so the changes survive eviction
+        self.edited = {}
+        self.loads = 0
+
+    def close(self):
+        self.index = None
+        self.buffer.close()
+        self.file.close()
+
+    def chunk(self, cx, cy):
+        # wall bytes of a chunk, row by row, loading it (and evicting the oldest) when needed
+        key = (cx, cy)
+        walls = self.edited.get(key)
+        if walls is not None:
+            return walls
+        walls = self.chunks.get(key)
+        if walls is None:
+            walls = self.chunks[key] = self.read_chunk(cx, cy)
+            if len(self.chunks) > self.cache_size:
+                self.chunks.popitem(last=False)
+        else:
+            self.chunks.move_to_end(key)
+        return walls
+
+    def read_chunk(self, cx, cy):
+        size = self.chunk_size
+        offset = int(self.index['offset'][cy * self.chunk_cols + cx])
+        packed = np.frombuffer(self.buffer, np.uint8, (size * size + 7) // 8, offset)
+        self.loads += 1
+        return bytearray(np.unpackbits(packed)[:size * size].tobytes())
+
+    def chunk_spawns(self, cx, cy):
+        # (kind, col, row) of the sprites placed in a chunk
+        size = self.chunk_size
+        entry = self.index[cy * self.chunk_cols + cx]
+        offset = int(entry['offset']) + (size * size + 7) // 8
+        spawns = np.frombuffer(self.buffer, '<i4', int(entry['spawns']) * 3, offset).reshape(-1, 3)
+        return [tuple(spawn) for spawn in spawns.tolist()]
+
+    def edit(self, cx, cy):
+        walls = self.chunk(cx, cy)
+        if (cx, cy) not in self.edited:
+            self.edited[(cx, cy)] = walls
+            self.chunks.pop((cx, cy), None)
+        return walls
+
+    def chunk_of(self, pos):
+        span = self.chunk_size * TILESIZE
+        return int(pos[0] // span), int(pos[1] // span)
+
+    def walls_at(self, cols, rows):
+        inside = (cols >= 0) & (cols < self.tilewidth) & (rows >= 0) & (rows < self.tileheight)
+        solid = np.zeros(cols.shape, bool)
+        if not inside.any():
+            return solid
+        size = self.chunk_size
+        cols, rows = cols[inside], rows[inside]
+        keys = rows // size * self.chunk_cols + cols // size
+        hits = np.zeros(keys.shape, bool)
+        for key in np.unique(keys).tolist():
+            chosen = keys == key
+            cy, cx = divmod(key, self.chunk_cols)
+            grid = np.frombuffer(self.chunk(cx, cy), np.uint8).reshape(size, size)
+            hits[chosen] = grid[rows[chosen] % size, cols[chosen] % size] == 1
+        solid[inside] = hits
+        return solid
+
+    def window(self, left, top, right, bottom):
+        # wall bytes of a tile rectangle (inclusive), as a (rows, cols) array
+        size = self.chunk_size
+        out = np.zeros((bottom - top + 1, right - left + 1), np.uint8)
+        for cy in range(top // size, bottom // size + 1):
+            for cx in range(left // size, right // size + 1):
+                grid = np.frombuffer(self.chunk(cx, cy), np.uint8).reshape(size, size)
+                x0, x1 = max(left, cx * size), min(right, cx * size + size - 1)
+                y0, y1 = max(top, cy * size), min(bottom, cy * size + size - 1)
+                out[y0 - top:y1 - top + 1, x0 - left:x1 - left + 1] = \
+                    grid[y0 - cy * size:y1 - cy * size + 1, x0 - cx * size:x1 - cx * size + 1]
+        return out
+
+
+class WindowPathfinder:
+    # A* on a nav grid cut from the tiles around start and end, for worlds too big for one NavGrid
+    def __init__(self, world, heuristic=manhattan_distance, margin=WORLD_PATH_MARGIN):
+        self.world = world
+        self.heuristic = heuristic
+        self.margin = margin
+
+    def search(self, start, end, max_size=100):
+        world = self.world
+        start = (int(start[0]), int(start[1]))
+        end = (int(end[0]), int(end[1]))
+        for x, y in (start, end):
+            if not (0 <= x < world.tilewidth and 0 <= y < world.tileheight):
+                return []
+        left = max(0, min(start[0], end[0]) - self.margin)
+        top = max(0, min(start[1], end[1]) - self.margin)
+        right = min(world.tilewidth - 1, max(start[0], end[0]) + self.margin)
+        bottom = min(world.tileheight - 1, max(start[1], end[1]) + self.margin)
+
+        solid = world.window(left, top, right, bottom)
+        nav = NavGrid(right - left + 1, bottom - top + 1, solid.tobytes())
+        finder = Pathfinder(nav, nav.obstacles, self.heuristic)
+        path = finder.search((start[0] - left, start[1] - top), (end[0] - left, end[1] - top), max_size)
+        return [(x + left, y + top) for x, y in path]
+
+
+class ChunkStreamer:
+    # spawns sprites as their chunks are first reached and puts mobs far from the player to sleep
+    def __init__(self, game):
+        self.game = game
+        self.world = game.map
+        self.center = None
+        self.visited = set()
+        # chunk -> mobs sleeping in it
+        self.sleeping = {}
+        self.spawned = 0
+
+    def update(self):
+        world = self.world
+        center = world.chunk_of(self.game.player.pos)
+        if center == self.center:
+            return
+        self.center = center
+        cx, cy = center
+        active = [(x, y) for y in range(max(0, cy - ACTIVE_CHUNKS), min(world.chunk_rows, cy + ACTIVE_CHUNKS + 1))
+                  for x in range(max(0, cx - ACTIVE_CHUNKS), min(world.chunk_cols, cx + ACTIVE_CHUNKS + 1))]
+        awake = set(active)
+
+        for mob in list(self.game.mobs):
+            key = world.chunk_of(mob.pos)
+            # a dying mob plays out its explosion, its frames are on the game's timers
+            if key not in awake and not mob.dead:
+                mob.kill()
+                self.sleeping.setdefault(key, []).append(mob)
+
+        for key in active:
+            world.chunk(*key)
+            if key not in self.visited:
+                self.visited.add(key)
+                for kind, col, row in world.chunk_spawns(*key):
+                    self.game.spawn(kind, col, row)
+                    self.spawned += 1
+            for mob in self.sleeping.pop(key, ()):
+                mob.add(mob.groups)
+
+    def cleared(self):
+        # every mob in the world has been spawned and none is left asleep
+        return not self.sleeping and self.spawned >= self.world.mob_count
+
+
+def write_world(filename, width, height, chunk_size, player, chunk_source):
+    # chunk_source(cx, cy) gives the (chunk_size, chunk_size) walls of a chunk and its (kind, col, row) spawns
+    cols, rows = ceil(width / chunk_size), ceil(height / chunk_size)
+    index = np.zeros(cols * rows, CHUNK_INDEX)
+    mobs = 0
+    with open(filename, 'wb') as file:
+        file.write(bytes(WORLD_HEADER.size + index.nbytes))
+        for cy in range(rows):
+            for cx in range(cols):
+                walls, spawns = chunk_source(cx, cy)
+                spawns = np.array(spawns, '<i4').reshape(-1, 3)
+                index[cy * cols + cx] = file.tell(), len(spawns)
+                mobs += int(np.count_nonzero(spawns[:, 0] != PLAYER_SPAWN))
+                file.write(np.packbits(walls.astype(np.uint8)).tobytes())
+                file.write(spawns.tobytes())
+        file.seek(0)
+        file.write(WORLD_HEADER.pack(WORLD_MAGIC, WORLD_VERSION, width, height, chunk_size, player[0], player[1], mobs))
+        file.write(index.tobytes())
+
+
+def compile_world(level_file, filename, chunk_size=CHUNK_SIZE):
+    # turn a level image into a world file, mostly to play the shipped levels through the streamer
+    level = load_level(level_file)
+    walls = np.zeros((ceil(level.height / chunk_size) * chunk_size, ceil(level.width / chunk_size) * chunk_size),
+                     np.uint8)
+    walls[:level.height, :level.width] = np.frombuffer(level.walls, np.uint8).reshape(level.height, level.width)
+    player = next((col, row) for kind, col, row in level.spawns if kind == PLAYER_SPAWN)
+
+    def chunk_source(cx, cy):
+        spawns = [(kind, col, row) for kind, col, row in level.spawns
+                  if kind != PLAYER_SPAWN and col // chunk_size == cx and row // chunk_size == cy]
+        return walls[cy * chunk_size:(cy + 1) * chunk_size, cx * chunk_size:(cx + 1) * chunk_size], spawns
+
+    write_world(filename, level.width, level.height, chunk_size, player, chunk_source)
+
+
+def generate_world(filename, width, height, seed=0, chunk_size=CHUNK_SIZE):
+    # random world with scattered wall blocks, a few mobs per chunk and the player in the middle
+    player = (width // 2, height // 2)
+
+    def chunk_source(cx, cy):
+        rng = np.random.default_rng((seed, cx, cy))
+        blocks = rng.random((chunk_size // 2, chunk_size // 2)) < 0.12
+        walls = blocks.repeat(2, axis=0).repeat(2, axis=1)
+        cols = np.arange(cx * chunk_size, (cx + 1) * chunk_size)
+        rows = np.arange(cy * chunk_size, (cy + 1) * chunk_size)[:, None]
+        walls |= (cols == 0) | (cols == width - 1) | (rows == 0) | (rows == height - 1)
+        walls &= (abs(cols - player[0]) > 3) | (abs(rows - player[1]) > 3)
+
+        spawns = []
+        for kind in [MOB_SPAWN] * int(rng.integers(0, 3)) + [BOSS_SPAWN] * int(rng.random() < 0.1):
+            col, row = (int(value) for value in rng.integers(1, chunk_size - 1, 2))
+            if not walls[row, col] and col + cx * chunk_size < width - 1 and row + cy * chunk_size < height - 1:
+                spawns.append((kind, col + cx * chunk_size, row + cy * chunk_size))
+        return walls, spawns
+
+    write_world(filename, width, height, chunk_size, player, chunk_source)
+
+
+if __name__ == '__main__':
+    # python world.py generate <out.world> <width> <height> [seed]
+    # python world.py compile <level.png> <out.world>
+    import sys
+    if sys.argv[1] == 'generate':
+        generate_world(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), int(sys.argv[5]) if len(sys.argv) > 5 else 0)
+    else:
+        compile_world(sys.argv[2], sys.argv[3])